@@ -0,0 +1,110 @@
+"""
+Проверка чтения с реплик.
+
+Запускает db_manager с основной базой SQLite и репликой — вторым файлом SQLite,
+после чего проверяет, что `db_manager:ro_uow_factory` читает из реплики,
+а запись в его сессии отклоняется защитой read_only (`ReadOnlyError`).
+Репликацию изображает запись напрямую в файл реплики.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.replicas
+"""
+import asyncio
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import func, insert, select
+
+from plugins.db_manager import Base, ReadOnlyError
+from plugins.db_manager.fsm import FSMStateModel
+from zuki.app import App
+from zuki.config_manager import ConfigManager
+from zuki.plugin_manager import PluginManager
+
+
+def state_row(key: str) -> dict:
+    return {"key": key, "state": key, "data": "{}", "updated_at": datetime.now(timezone.utc)}
+
+
+async def build_app(root: Path):
+    config_manager = ConfigManager(project_root=root, configs_dir="configs")
+
+    db_config_dir = config_manager.get_plugin_config_path("db_manager")
+    db_config_dir.mkdir(parents=True, exist_ok=True)
+    (db_config_dir / "config.toml").write_text("\n".join([
+        "[database]",
+        f'sqlite_path = "{root}/primary.db"',
+        f'replicas = ["sqlite+aiosqlite:///{root}/replica.db"]',
+        "[fsm]",
+        "enabled = false",
+    ]) + "\n")
+
+    app = App(bot_token="42:REPLICAS", bot_storage=MemoryStorage())
+    pm = PluginManager(app=app, config_manager=config_manager)
+    await pm.bootstrap(["plugins"], enabled=["db_manager"])
+    return app, pm
+
+
+async def check(app: App) -> list:
+    uow_factory = app.get_service("db_manager:uow_factory")
+    ro_uow_factory = app.get_service("db_manager:ro_uow_factory")
+    replica, = app.get_service("db_manager:replica_engines")
+
+    # Схему реплики и её данные в реальной установке переносит репликация
+    async with replica.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(FSMStateModel).values(**state_row("replica")))
+
+    async with uow_factory() as uow:
+        await uow.session.execute(insert(FSMStateModel).values(**state_row("primary")))
+
+    results = []
+    async with ro_uow_factory() as uow:
+        results.append(("read from replica", await uow.session.get(FSMStateModel, "replica") is not None))
+        results.append(("primary row not visible", await uow.session.get(FSMStateModel, "primary") is None))
+
+    async with ro_uow_factory() as uow:
+        try:
+            await uow.session.execute(insert(FSMStateModel).values(**state_row("statement")))
+        except ReadOnlyError:
+            results.append(("insert statement rejected", True))
+        else:
+            results.append(("insert statement rejected", False))
+
+    async with ro_uow_factory() as uow:
+        uow.session.add(FSMStateModel(**state_row("flush")))
+        try:
+            await uow.session.flush()
+        except ReadOnlyError:
+            results.append(("flush rejected", True))
+        else:
+            results.append(("flush rejected", False))
+
+    async with replica.connect() as connection:
+        written = await connection.scalar(
+            select(func.count()).where(FSMStateModel.key.in_(["statement", "flush"]))
+        )
+    results.append(("replica unchanged", written == 0))
+    return results
+
+
+async def main() -> int:
+    with tempfile.TemporaryDirectory() as root:
+        app, pm = await build_app(Path(root))
+        try:
+            results = await check(app)
+        finally:
+            await pm.shutdown_all(timeout=5)
+
+    print()
+    for name, passed in results:
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+    return 0 if all(passed for _, passed in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
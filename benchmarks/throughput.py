@@ -0,0 +1,366 @@
+"""
+Сквозной бенчмарк пропускной способности.
+
+Собирает настоящее приложение (`App` + `PluginManager.bootstrap(["plugins"])`)
+поверх временного файла SQLite и сессии бота без сети, после чего прогоняет
+синтетические апдейты через `Dispatcher.feed_update` и для каждого сценария
+выводит апдейты/сек, задержку p50/p99, число SQL-запросов и соединений из пула на апдейт,
+а затем — запросы по хэндлерам и повторяющиеся формы запросов (N+1).
+
+Запуск из корня проекта:
+
+    python -m benchmarks.throughput
+    python -m benchmarks.throughput --iterations 1000 --scenario message --scenario call
+
+С `--query-budget` трекер запросов работает в строгом режиме:
+апдейт, хэндлер которого превысил бюджет, завершается ошибкой.
+
+    python -m benchmarks.throughput --query-budget plugins.rests.handler.rest_list_handler=10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from zuki.api_cache import ApiCacheConfig
+from zuki.app import App
+from zuki.config_manager import ConfigManager
+from zuki.plugin_manager import PluginManager
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+AVATAR_PATH = PROJECT_ROOT / "plugins/quotes/default_configs/src/img/photo_img_default.png"
+
+CHAT_ID = -1001000000001
+OWNER_ID = 1000
+ENABLED_PLUGINS = ["telegram_info_collect", "quotes", "call", "rests"]
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота без сети: отвечает на запросы Bot API заготовленными данными.
+    Ответ проходит ту же валидацию, что и ответ настоящего сервера
+    """
+    def __init__(self, owner_id: int, avatar: bytes):
+        super().__init__()
+        self.owner_id = owner_id
+        self.avatar = avatar
+        self.requests = 0
+        self._message_ids = itertools.count(1_000_000)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.requests += 1
+        content = self.json_dumps({"ok": True, "result": self._result(method)})
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result
+
+    async def stream_content(self, url: str, headers=None, timeout: int = 30, chunk_size: int = 65536, raise_for_status: bool = True):
+        yield self.avatar
+
+    async def close(self):
+        pass
+
+    def _result(self, method: TelegramMethod) -> Any:
+        api_method = method.__api_method__
+
+        if api_method == "getChatMember":
+            if method.user_id == self.owner_id:
+                return {"status": "creator", "user": user_dict(method.user_id), "is_anonymous": False}
+            return {"status": "member", "user": user_dict(method.user_id)}
+
+        if api_method == "getUserProfilePhotos":
+            photo = {"file_id": "avatar", "file_unique_id": "avatar", "width": 160, "height": 160}
+            return {"total_count": 1, "photos": [[photo]]}
+
+        if api_method == "getFile":
+            return {"file_id": "avatar", "file_unique_id": "avatar", "file_path": "photos/avatar.png"}
+
+        if api_method in ("sendMessage", "sendPhoto", "editMessageText"):
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id or CHAT_ID, "type": "supergroup"},
+                "text": getattr(method, "text", None)
+            }
+
+        if api_method == "getUpdates":
+            return []
+
+        return True
+
+
+def user_dict(user_id: int) -> Dict[str, Any]:
+    return {
+        "id": user_id,
+        "is_bot": False,
+        "first_name": f"User {user_id}",
+        "username": f"user{user_id}"
+    }
+
+
+class UpdateFactory:
+    """
+    Строит синтетические апдейты группового чата
+    """
+    def __init__(self, bot: Bot, chat_id: int):
+        self.bot = bot
+        self.chat = {"id": chat_id, "type": "supergroup", "title": "Benchmark"}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def message_dict(self, user_id: int, text: str, reply_to: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": user_dict(user_id),
+            "text": text
+        }
+        if reply_to is not None:
+            message["reply_to_message"] = reply_to
+        return message
+
+    def message(self, user_id: int, text: str, reply_to: Optional[Dict[str, Any]] = None) -> Update:
+        return self._update({"message": self.message_dict(user_id, text, reply_to)})
+
+    def callback(self, user_id: int, data: str) -> Update:
+        return self._update({
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": user_dict(user_id),
+                "chat_instance": "benchmark",
+                "message": self.message_dict(OWNER_ID, "🧉 Оформление реста"),
+                "data": data
+            }
+        })
+
+    def _update(self, payload: Dict[str, Any]) -> Update:
+        return Update.model_validate(
+            {"update_id": next(self._update_ids), **payload},
+            context={"bot": self.bot}
+        )
+
+
+class Benchmark:
+    def __init__(self, app: App, session: FakeSession, users: List[int]):
+        self.app = app
+        self.session = session
+        self.users = users
+        self.users_without_rests = users
+        self.updates = UpdateFactory(app.bot, CHAT_ID)
+        self.sql_statements = app.metrics.counter(
+            "db_manager_queries_total",
+            "SQL statements executed",
+            ("operation",)
+        )
+        self.checkouts = app.metrics.counter("db_manager_pool_checkouts_total", "Connection checkouts")
+
+        self.scenarios: Dict[str, Callable[[int], List[Update]]] = {
+            "message": self.plain_message,
+            "quote": self.quote,
+            "call": self.call,
+            "restlist": self.rest_list,
+            "rest_wizard": self.rest_wizard,
+        }
+
+    def plain_message(self, i: int) -> List[Update]:
+        return [self.updates.message(self.user(i), "просто сообщение в чате")]
+
+    def quote(self, i: int) -> List[Update]:
+        original = self.updates.message_dict(self.user(i), "цитируемое сообщение для картинки")
+        return [self.updates.message(OWNER_ID, ".цитата", reply_to=original)]
+
+    def call(self, i: int) -> List[Update]:
+        return [self.updates.message(OWNER_ID, "калл сбор")]
+
+    def rest_list(self, i: int) -> List[Update]:
+        return [self.updates.message(OWNER_ID, "рестлист все")]
+
+    def rest_wizard(self, i: int) -> List[Update]:
+        # Выданный рест блокирует следующий период, поэтому мастер
+        # проходят только участники без рестов
+        user_id = self.users_without_rests[i % len(self.users_without_rests)]
+        return [
+            self.updates.message(user_id, "!взять рест"),
+            self.updates.callback(user_id, "rest:s1s"),
+            self.updates.callback(user_id, "rest:d1s"),
+            self.updates.callback(user_id, "rest:cancel"),
+        ]
+
+    def user(self, i: int) -> int:
+        return self.users[i % len(self.users)]
+
+    async def prepare(self, rests: int):
+        """
+        Наполняет базу: участники чата, включённый калл и выданные ресты
+        """
+        await self.app.feed_update(self.updates.message(OWNER_ID, "всем привет"))
+        for user_id in self.users:
+            await self.app.feed_update(self.updates.message(user_id, "привет"))
+
+        await self.app.feed_update(self.updates.message(OWNER_ID, "+калл"))
+
+        self.users_without_rests = self.users[rests:] or self.users
+        for user_id in self.users[:rests]:
+            reply_to = self.updates.message_dict(user_id, "привет")
+            await self.app.feed_update(
+                self.updates.message(OWNER_ID, "!выдать рест 0 1", reply_to=reply_to)
+            )
+
+    async def run(self, name: str, iterations: int, warmup: int) -> Dict[str, float]:
+        scenario = self.scenarios[name]
+        for i in range(warmup):
+            for update in scenario(i):
+                await self.app.feed_update(update)
+
+        latencies = []
+        sql_before = self.total_sql_statements()
+        requests_before = self.session.requests
+        checkouts_before = self.checkouts.get()
+
+        start = time.perf_counter()
+        for i in range(iterations):
+            for update in scenario(i):
+                update_start = time.perf_counter()
+                await self.app.feed_update(update)
+                latencies.append(time.perf_counter() - update_start)
+        elapsed = time.perf_counter() - start
+
+        count = len(latencies)
+        return {
+            "updates": count,
+            "updates_per_second": count / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "sql_per_update": (self.total_sql_statements() - sql_before) / count,
+            "api_per_update": (self.session.requests - requests_before) / count,
+            "checkouts_per_update": (self.checkouts.get() - checkouts_before) / count,
+        }
+
+    def total_sql_statements(self) -> float:
+        return sum(self.sql_statements.values.values())
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def print_query_report(stats: Dict[str, Dict[str, Any]]):
+    header = f"{'handler':<64} {'updates':>8} {'avg sql':>8} {'max sql':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, handler_stats in sorted(stats.items()):
+        print(
+            f"{name:<64} {handler_stats['updates']:>8} "
+            f"{handler_stats['avg_queries']:>8.1f} {handler_stats['max_queries']:>8}"
+        )
+        for shape, count in handler_stats["repeated"].items():
+            print(f"    {count:>4} x {shape[:160]}")
+
+
+def print_report(results: Dict[str, Dict[str, float]]):
+    header = f"{'scenario':<12} {'updates':>8} {'upd/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'sql/upd':>8} {'api/upd':>8} {'conn/upd':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        print(
+            f"{name:<12} {result['updates']:>8} {result['updates_per_second']:>9.1f} "
+            f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['sql_per_update']:>8.1f} {result['api_per_update']:>8.1f} "
+            f"{result['checkouts_per_update']:>8.1f}"
+        )
+
+
+async def build_app(configs_root: Path, session: FakeSession, query_budgets: Dict[str, int]):
+    config_manager = ConfigManager(project_root=configs_root, configs_dir="configs")
+
+    db_config_dir = config_manager.get_plugin_config_path("db_manager")
+    db_config_dir.mkdir(parents=True, exist_ok=True)
+    db_config = [
+        "[database]",
+        f'sqlite_path = "{configs_root}/bench.db"',
+        "[query_tracker]",
+        f"strict = {'true' if query_budgets else 'false'}",
+        "[query_tracker.budgets]",
+    ]
+    db_config += [f"{json.dumps(handler)} = {budget}" for handler, budget in query_budgets.items()]
+    (db_config_dir / "config.toml").write_text("\n".join(db_config) + "\n")
+
+    app = App(
+        bot_token="42:BENCHMARK",
+        bot_storage=MemoryStorage(),
+        bot_session=session,
+        api_cache=ApiCacheConfig()
+    )
+    pm = PluginManager(app=app, config_manager=config_manager)
+    await pm.bootstrap(["plugins"], enabled=ENABLED_PLUGINS)
+    # Без измерения хэндлеров запросы относятся только к типу апдейта
+    app.instrument_handlers()
+    return app, pm
+
+
+async def main(args: argparse.Namespace):
+    session = FakeSession(OWNER_ID, AVATAR_PATH.read_bytes())
+
+    with tempfile.TemporaryDirectory() as configs_root:
+        app, pm = await build_app(Path(configs_root), session, args.query_budget)
+        try:
+            users = list(range(OWNER_ID + 1, OWNER_ID + 1 + args.users))
+            benchmark = Benchmark(app, session, users)
+            await benchmark.prepare(rests=min(args.rests, args.users))
+
+            results = {}
+            for name in args.scenario or list(benchmark.scenarios):
+                results[name] = await benchmark.run(name, args.iterations, args.warmup)
+            print_report(results)
+            print()
+            print_query_report(app.get_service("db_manager:query_tracker").stats())
+        finally:
+            await pm.shutdown_all(timeout=5)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end update throughput benchmark")
+    parser.add_argument("--iterations", type=int, default=300, help="measured iterations per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured iterations per scenario")
+    parser.add_argument("--users", type=int, default=50, help="chat members besides the owner")
+    parser.add_argument("--rests", type=int, default=10, help="members with an issued rest")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=["message", "quote", "call", "restlist", "rest_wizard"],
+        help="scenario to run, can be repeated (default: all)"
+    )
+    parser.add_argument(
+        "--query-budget",
+        action="append",
+        type=query_budget,
+        default=[],
+        metavar="HANDLER=N",
+        help="fail updates of HANDLER that execute more than N SQL statements, can be repeated"
+    )
+    args = parser.parse_args()
+    args.query_budget = dict(args.query_budget)
+    return args
+
+
+def query_budget(value: str):
+    handler, separator, budget = value.rpartition("=")
+    if not separator or not handler or not budget.isdigit():
+        raise argparse.ArgumentTypeError(f"expected HANDLER=N, got {value!r}")
+    return handler, int(budget)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
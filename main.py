@@ -1,36 +1,132 @@
 import asyncio
 from pathlib import Path
+from typing import Optional
 
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from zuki.app import App
+from zuki.webhook import WebhookConfig
 from zuki.plugin_manager import PluginManager
 from zuki.config_manager import ConfigManager
+from zuki.sharding import ShardSupervisor
+from zuki.scheduler import SchedulerConfig
+from zuki.sender import SenderConfig
+from zuki.api_cache import ApiCacheConfig
 from settings import settings
 
-async def main():
+def build_app(workers: int = 1, **kwargs) -> App:
+    # Лимит Bot API общий для токена: каждый воркер получает свою долю
+    global_rate = settings.sender_global_rate / workers
+    return App(
+        bot_token=settings.bot_token,
+        bot_storage=MemoryStorage(),
+        timezone=settings.timezone,
+        api_server=settings.bot_api_server,
+        metrics_host=settings.metrics_host,
+        sender=SenderConfig(
+            global_rate=global_rate,
+            global_burst=int(global_rate),
+            group_rate=settings.sender_group_per_minute / 60,
+        ),
+        api_cache=ApiCacheConfig(
+            chat_member_ttl=settings.api_cache_member_ttl,
+            chat_administrators_ttl=settings.api_cache_administrators_ttl,
+        ),
+        **kwargs
+    )
+
+def build_scheduler_config() -> Optional[SchedulerConfig]:
+    if settings.scheduler_concurrency is None:
+        return None
+
+    return SchedulerConfig(
+        concurrency=settings.scheduler_concurrency,
+        per_chat_concurrency=settings.scheduler_per_chat_concurrency,
+        queue_size=settings.scheduler_queue_size,
+        max_pending=settings.scheduler_max_pending,
+        overflow=settings.scheduler_overflow,
+    )
+
+async def build_worker(worker_index: Optional[int] = None):
+    """
+    Приложение с загруженными плагинами: единственное в обычном режиме
+    или одно из воркеров в режиме нескольких процессов
+    """
     config_manager = ConfigManager(
         project_root=Path("."),
         configs_dir="configs"
     )
 
-    app = App(
-        bot_token=settings.bot_token,
-        bot_storage=MemoryStorage(),
-        timezone=settings.timezone,
+    metrics_port = settings.metrics_port
+    if worker_index is not None and metrics_port is not None:
+        metrics_port += worker_index + 1
+
+    app = build_app(
+        workers=settings.workers if worker_index is not None else 1,
+        worker_index=worker_index,
+        checkpoint_path=Path(".zuki_cache") / "update_offset" if worker_index is None else None,
+        metrics_port=metrics_port,
+        scheduler=build_scheduler_config(),
     )
 
     pm = PluginManager(
         app=app,
-        config_manager=config_manager
+        config_manager=config_manager,
+        manifest_path=Path(".zuki_cache") / "plugins_manifest.json"
     )
 
-    await pm.bootstrap(["plugins"])
+    await pm.bootstrap(["plugins"], enabled=settings.enabled_plugins)
+    return app, pm
+
+def build_webhook_config() -> Optional[WebhookConfig]:
+    if not settings.webhook_url:
+        return None
+
+    return WebhookConfig(
+        url=settings.webhook_url,
+        path=settings.webhook_path,
+        secret_token=settings.webhook_secret,
+        host=settings.webhook_host,
+        port=settings.webhook_port,
+        workers=settings.webhook_workers,
+    )
+
+async def main():
+    webhook = build_webhook_config()
+
+    if settings.workers > 1:
+        await run_supervisor(webhook)
+        return
+
+    app, pm = await build_worker()
+    try:
+        print("Start bot", "webhook" if webhook else "polling")
+        await app.run(webhook=webhook)
+    except KeyboardInterrupt:
+        print("Bot was stopped")
+    finally:
+        await pm.shutdown_all(timeout=settings.shutdown_timeout)
+
+async def run_supervisor(webhook: Optional[WebhookConfig]):
+    app = build_app(
+        checkpoint_path=Path(".zuki_cache") / "update_offset",
+        metrics_port=settings.metrics_port,
+    )
+    supervisor = ShardSupervisor(
+        app,
+        workers=settings.workers,
+        worker_factory=build_worker,
+        shutdown_timeout=settings.shutdown_timeout
+    )
 
+    await supervisor.start()
     try:
-        print("Start bot polling")
-        await app.run()
+        print("Start bot", "webhook" if webhook else "polling", f"with {settings.workers} workers")
+        await app.run(webhook=webhook, allowed_updates=supervisor.allowed_updates)
     except KeyboardInterrupt:
         print("Bot was stopped")
+    finally:
+        await supervisor.shutdown()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
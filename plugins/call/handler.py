@@ -6,6 +6,8 @@ from aiogram import F
 from aiogram.filters import Command, or_f
 from aiogram.types import Message, ChatMemberAdministrator, ChatMemberOwner
 
+from zuki.sender import bulk_sends
+
 from plugins.db_manager import UnitOfWork
 from plugins.telegram_info_collect.factories.chat_member import ChatMemberServiceFactory
 from plugins.telegram_info_collect.factories.chat import ChatServiceFactory
@@ -22,7 +24,7 @@ from .factories.call import (
 @router.message(F.text.regexp(r"(?is)^калл(.+)?$"), F.chat.type.in_({"group", "supergroup"}))
 async def call_handler(
     message: Message,
-    uow_factory: UnitOfWork,
+    ro_uow_factory: UnitOfWork,
     users_tag_per_line: int,
     emojies: List[str],
     default_call_message: str,
@@ -48,8 +50,13 @@ async def call_handler(
     first_message = call_message or default_call_message.format(full_name=message.from_user.full_name)
     last_message = call_message + call_footer.format(full_name=message.from_user.full_name)
 
-    # Check if call is enabled in chat
-    async with uow_factory() as uow:
+    is_preview_disabled = False
+    if message.link_preview_options and message.link_preview_options.is_disabled == True:
+        is_preview_disabled = True
+
+    # Check if call is enabled in chat and build call messages
+    call_messages = []
+    async with ro_uow_factory() as uow:
         chat_service = ChatServiceFactory(uow.session).create()
         chat = await chat_service.get_by_tg_id(chat_tg_id)
         if chat is None:
@@ -64,16 +71,9 @@ async def call_handler(
         if is_enabled is None:
             return None
 
-    is_preview_disabled = False
-    if message.link_preview_options and message.link_preview_options.is_disabled == True:
-        is_preview_disabled = True
-
-    # Send call messages
-    async with uow_factory() as uow:
-        chat_member_service = ChatMemberServiceFactory(uow.session).create()
         unreg_service = CallPluginChatMemberUnregServiceFactory(uow.session).create()
 
-        chat_members = await unreg_service.list_not_unreg_by_chat_ids(
+        chat_members = await unreg_service.list_not_unreg_by_chat_ids_with_users(
             [chat.id],
             statuses = [
                 "administrator",
@@ -92,7 +92,7 @@ async def call_handler(
             several_chat_members = chat_members[users_tag_per_line*i:users_tag_per_line*(i+1)]
             chat_member_links = []
             for chat_member in several_chat_members:
-                user = await chat_member_service.get_user(chat_member)
+                user = chat_member.user
                 user_link = await get_user_link_with_notification(
                     user_id=user.tg_id,
                     call_sign=CallDomain.get_user_emoji(
@@ -108,8 +108,14 @@ async def call_handler(
             elif i == number_of_messages - 1:
                 current_call_message =  last_message
 
+            call_messages.append(f"{current_call_message}\n\n{' '.join(chat_member_links)}")
+
+    # Send call messages. Sending is rate limited; leaving the read-only block
+    # released the database connection, and the call yields to interactive replies
+    with bulk_sends():
+        for text in call_messages:
             await message.answer(
-                f"{current_call_message}\n\n{' '.join(chat_member_links)}",
+                text,
                 disable_web_page_preview=is_preview_disabled,
                 parse_mode="HTML"
             )
@@ -6,8 +6,6 @@ from plugins.skip_updates import MessagesUpdateSkipper
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
-from plugins.telegram_info_collect.factories.chat_member import ChatMemberServiceFactory
-
 from ..factories.call import CallPluginChatMemberUnregServiceFactory
 
 class CallMiddleware(BaseMiddleware):
@@ -20,6 +18,23 @@ class CallMiddleware(BaseMiddleware):
         call_footer: str = "",
     ):
         self.message_skipper = message_skipper
+        self.configure(
+            users_tag_per_line=users_tag_per_line,
+            emojies=emojies,
+            default_call_message=default_call_message,
+            call_footer=call_footer
+        )
+
+    def configure(
+        self,
+        users_tag_per_line: int,
+        emojies: List[str],
+        default_call_message: str,
+        call_footer: str = "",
+    ):
+        """
+        Применяет настройки калла, в том числе при изменении конфига
+        """
         self.users_tag_per_line = users_tag_per_line
         self.emojies = emojies
         self.default_call_message = default_call_message
@@ -32,6 +47,7 @@ class CallMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         data["uow_factory"] = data.get("db_manager:uow_factory")
+        data["ro_uow_factory"] = data.get("db_manager:ro_uow_factory")
 
         data["users_tag_per_line"] = self.users_tag_per_line
         data["emojies"] = self.emojies
@@ -42,19 +58,21 @@ class CallMiddleware(BaseMiddleware):
             return
 
         uow_factory: Callable[[], UnitOfWork] = data.get("db_manager:uow_factory")
+        ro_uow_factory: Callable[[], UnitOfWork] = data.get("db_manager:ro_uow_factory")
 
-        async with uow_factory() as uow:
-            chat_member_service = ChatMemberServiceFactory(uow.session).create()
-            chat_member = await chat_member_service.get_by_user_and_chat_tg_ids(
+        # Почти всегда участник не анрегнут, поэтому проверка идёт по реплике
+        # одним запросом, а в основную базу пишем только когда есть что удалять
+        async with ro_uow_factory() as uow:
+            chat_member_unreg_service = CallPluginChatMemberUnregServiceFactory(uow.session).create()
+            unreg = await chat_member_unreg_service.get_by_tg_ids(
                 user_tg_id=message.from_user.id,
                 chat_tg_id=message.chat.id
             )
-            chat_member_unreg_service = CallPluginChatMemberUnregServiceFactory(uow.session).create()
 
-            if chat_member:
-                await chat_member_unreg_service.remove(chat_member.id)
-            else:
-                print("WARNING: CallMiddleware: chat_member not found")
+        if unreg is not None:
+            async with uow_factory() as uow:
+                chat_member_unreg_service = CallPluginChatMemberUnregServiceFactory(uow.session).create()
+                await chat_member_unreg_service.remove(unreg.chat_member_id)
 
         # Обработка сообщения
         result = await handler(message, data)
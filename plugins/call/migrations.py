@@ -0,0 +1,10 @@
+from plugins.db_manager import Migration, create_indexes, model_index
+
+from .models.call import CallPluginChatEnabled, CallPluginChatMemberUnregModel
+
+MIGRATIONS = [
+    Migration(1, "index unreg and enabled chats lookups", create_indexes(
+        model_index(CallPluginChatMemberUnregModel, "ix_call__chat_members_unreg_chat_member_id"),
+        model_index(CallPluginChatEnabled, "ix_call__chats_enabled_chat_id")
+    )),
+]
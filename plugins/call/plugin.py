@@ -1,10 +1,10 @@
-import tomllib
 from pathlib import Path
 
 from zuki.plugin import Plugin
 from plugins.db_manager import UnitOfWork
 
 from .middlewares.message import CallMiddleware
+from .migrations import MIGRATIONS
 from .router import router
 
 class CallPlugin(Plugin):
@@ -19,24 +19,33 @@ class CallPlugin(Plugin):
     async def on_load(self):
         self.config_manager.ensure_plugin_configs(self)
         self.config_path = self.config_manager.get_plugin_config_path(self.name)
-        self.config = await self.load_call_settings_from_config()
+        self.config = self.config_manager.load_config(
+            self.name, "config.toml", self.call_settings_from_config
+        )
+
+        self.app.get_service("db_manager:migrations").register(self.name, MIGRATIONS)
 
+        self.middleware = CallMiddleware(
+            message_skipper=self.app.get_service("skip_updates:messages_update_skipper"),
+            **self.config
+        )
         self.app.include_router(router)
         self.app.add_router_middleware(
             router,
-            CallMiddleware(
-                message_skipper=self.app.get_service("skip_updates:messages_update_skipper"),
-                **self.config
-            ),
+            self.middleware,
             update_types=["message"]
         )
 
-    async def load_config(self, conf_file_path: str):
-        with open(self.config_path / conf_file_path, "rb") as file:
-            return tomllib.load(file)
+        self.config_manager.watch(
+            self.name, "config.toml", self.apply_config, self.call_settings_from_config
+        )
+
+    def apply_config(self, config: dict):
+        self.config = config
+        self.middleware.configure(**config)
 
-    async def load_call_settings_from_config(self):
-        config = await self.load_config("config.toml")
+    @staticmethod
+    def call_settings_from_config(config: dict) -> dict:
         result = {}
 
         result["users_tag_per_line"] = config.get("users_tag_per_line", 5)
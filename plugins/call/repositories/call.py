@@ -1,30 +1,50 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm.interfaces import ORMOption
+from plugins.db_manager import read_only
 from ..models.call import CallPluginChatMemberUnregModel, CallPluginChatEnabled
+from plugins.telegram_info_collect.models.chat import Chat
 from plugins.telegram_info_collect.models.chat_member import ChatMember
+from plugins.telegram_info_collect.models.user import User
 
 
 class CallPluginChatMemberUnregRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, id: int) -> Optional[CallPluginChatMemberUnregModel]:
         result = await self.session.execute(
             select(CallPluginChatMemberUnregModel).where(CallPluginChatMemberUnregModel.id == id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_chat_member_id(self, chat_member_id: int) -> Optional[CallPluginChatMemberUnregModel]:
         result = await self.session.execute(
             select(CallPluginChatMemberUnregModel).where(CallPluginChatMemberUnregModel.chat_member_id == chat_member_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
+    async def get_by_tg_ids(self, user_tg_id: int, chat_tg_id: int) -> Optional[CallPluginChatMemberUnregModel]:
+        """Анрег участника по tg_id пользователя и чата одним запросом"""
+        result = await self.session.execute(
+            select(CallPluginChatMemberUnregModel)
+            .join(ChatMember, CallPluginChatMemberUnregModel.chat_member_id == ChatMember.id)
+            .join(User, User.id == ChatMember.user_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(User.tg_id == user_tg_id, Chat.tg_id == chat_tg_id)
+        )
+        return result.scalar_one_or_none()
+
+    @read_only
     async def list(self) -> List[CallPluginChatMemberUnregModel]:
         result = await self.session.execute(select(CallPluginChatMemberUnregModel))
         return result.scalars().all()
 
+    @read_only
     async def list_unreg_by_chat_ids(self, chat_ids: List[int]) -> List[CallPluginChatMemberUnregModel]:
         """Получить всех анрегнутых участников по списку ID чатов"""
         result = await self.session.execute(
@@ -35,18 +55,24 @@ class CallPluginChatMemberUnregRepository:
         )
         return result.scalars().all()
 
-    async def list_not_unreg_by_chat_ids(self, chat_ids: List[int], statuses: List[str] = []) -> List[CallPluginChatMemberUnregModel]:
-        """Получить всех неанрегнутых участников по списку ID чатов"""
+    @read_only
+    async def list_not_unreg_by_chat_ids(
+        self,
+        chat_ids: List[int],
+        statuses: List[str] = [],
+        options: Sequence[ORMOption] = ()
+    ) -> List[ChatMember]:
+        """Получить всех неанрегнутых участников по списку ID чатов, options — опции загрузки связей участника"""
         subquery = select(CallPluginChatMemberUnregModel.chat_member_id)
         stmt = select(ChatMember).where(
                 ChatMember.chat_id.in_(chat_ids),
                 ChatMember.id.not_in(subquery)
-            )
+            ).options(*options)
 
         if statuses:
             stmt = stmt.where(ChatMember.status.in_(statuses))
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return result.scalars().unique().all()
 
     async def add(self, chat_member_id: int) -> CallPluginChatMemberUnregModel:
         obj = CallPluginChatMemberUnregModel(chat_member_id=chat_member_id)
@@ -60,18 +86,21 @@ class CallPluginChatEnabledRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, id: int) -> Optional[CallPluginChatEnabled]:
         result = await self.session.execute(
             select(CallPluginChatEnabled).where(CallPluginChatEnabled.id == id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_chat_id(self, chat_id: int) -> Optional[CallPluginChatEnabled]:
         result = await self.session.execute(
             select(CallPluginChatEnabled).where(CallPluginChatEnabled.chat_id == chat_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def list(self) -> List[CallPluginChatEnabled]:
         result = await self.session.execute(select(CallPluginChatEnabled))
         return result.scalars().all()
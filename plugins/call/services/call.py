@@ -1,4 +1,8 @@
 from typing import Optional, List
+
+from sqlalchemy.orm import joinedload
+
+from plugins.telegram_info_collect.models.chat_member import ChatMember
 from ..models.call import CallPluginChatMemberUnregModel, CallPluginChatEnabled
 from ..repositories.call import (
     CallPluginChatMemberUnregRepository,
@@ -24,6 +28,9 @@ class CallPluginChatMemberUnregService:
     async def get_by_chat_member_id(self, chat_member_id: int) -> Optional[CallPluginChatMemberUnregModel]:
         return await self.repo.get_by_chat_member_id(chat_member_id)
 
+    async def get_by_tg_ids(self, user_tg_id: int, chat_tg_id: int) -> Optional[CallPluginChatMemberUnregModel]:
+        return await self.repo.get_by_tg_ids(user_tg_id, chat_tg_id)
+
     async def add(self, chat_member_id: int) -> CallPluginChatMemberUnregModel:
         obj = await self.get_by_chat_member_id(chat_member_id)
         if obj:
@@ -36,9 +43,15 @@ class CallPluginChatMemberUnregService:
     async def list_unreg_by_chat_ids(self, chat_ids: List[int]) -> List[CallPluginChatMemberUnregModel]:
         return await self.repo.list_unreg_by_chat_ids(chat_ids)
 
-    async def list_not_unreg_by_chat_ids(self, chat_ids: List[int], statuses: List[str] = []) -> List[CallPluginChatMemberUnregModel]:
+    async def list_not_unreg_by_chat_ids(self, chat_ids: List[int], statuses: List[str] = []) -> List[ChatMember]:
         return await self.repo.list_not_unreg_by_chat_ids(chat_ids, statuses)
 
+    async def list_not_unreg_by_chat_ids_with_users(self, chat_ids: List[int], statuses: List[str] = []) -> List[ChatMember]:
+        """
+        Неанрегнутые участники с загруженными member.user одним запросом
+        """
+        return await self.repo.list_not_unreg_by_chat_ids(chat_ids, statuses, options=[joinedload(ChatMember.user)])
+
     async def remove(self, chat_member_id: int) -> None:
         obj = await self.get_by_chat_member_id(chat_member_id)
         if obj:
@@ -2,6 +2,7 @@ from aiogram import Bot
 from plugins.telegram_info_collect.factories.chat_member import ChatMemberServiceFactory
 from plugins.telegram_info_collect.factories.user import UserServiceFactory
 from plugins.db_manager import UnitOfWork
+from plugins.telegram_adapters.adapters.chat_member_mapper import TelegramChatMemberMapper
 
 async def sync_chat_admins_job(
     bot: Bot,
@@ -33,7 +34,7 @@ async def sync_chat_admins_job(
                 await chat_member_service.put(
                     user_tg_id=admin.user.id,
                     chat_tg_id=chat_id,
-                    status=admin.status,
+                    status=TelegramChatMemberMapper.to_internal_status(admin.status),
                     title=getattr(admin, "custom_title", None),
                     role_id=5
                 )
@@ -41,6 +42,6 @@ async def sync_chat_admins_job(
             await chat_member_service.put(
                 user_tg_id=admin.user.id,
                 chat_tg_id=chat_id,
-                status=admin.status,
+                status=TelegramChatMemberMapper.to_internal_status(admin.status),
                 title=getattr(admin, "custom_title", None)
             )
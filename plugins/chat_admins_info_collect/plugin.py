@@ -17,25 +17,34 @@ class ChatAdminInfoCollectPlugin(Plugin):
         self.chat_ids = []
         self.iteration = 0
         self.uow: UnitOfWork = None
+        self.scheduler: AsyncIOScheduler = None
 
     async def on_startup(self):
-        scheduler = AsyncIOScheduler()
+        # Синхронизация общая для всех воркеров, её выполняет один процесс
+        if not self.app.is_primary:
+            return
+
+        self.scheduler = AsyncIOScheduler()
 
         self.uow = self.app.get_service("db_manager:uow_factory")
         if self.uow is None:
             raise RuntimeError("UnitOfWork factory is not available")
 
-        scheduler.add_job(
+        self.scheduler.add_job(
             self.job,
             "interval",
             max_instances=1,
             minutes=10
         )
 
-        scheduler.start()
+        self.scheduler.start()
 
         # apscheduler.schedulers.SchedulerAlreadyRunningError
 
+    async def on_shutdown(self):
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
     async def update_chat_ids(self):
         async with self.uow() as uow:
             chat_service = ChatServiceFactory(uow.session).create()
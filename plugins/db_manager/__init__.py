@@ -1,7 +1,30 @@
 from .plugin import DBManager, UnitOfWork, Base
+from .migrations import Migration, create_indexes, model_index
+from .query_tracker import QueryBudgetExceeded, QueryTracker
+from .read_only import ReadOnlyError, read_only
+from .uow import ReadOnlyUnitOfWork, SavepointUnitOfWork, SharedUnitOfWork, UpdateUnitOfWork
+from .types import BigIntegerPK, ValueEnum
+from .upsert import dialect_insert, upsert_statement, upsert_many, upsert_select
 
 __all__ = [
     "DBManager",
     "Base",
-    "UnitOfWork"
+    "UnitOfWork",
+    "ReadOnlyUnitOfWork",
+    "UpdateUnitOfWork",
+    "SharedUnitOfWork",
+    "SavepointUnitOfWork",
+    "Migration",
+    "create_indexes",
+    "model_index",
+    "QueryTracker",
+    "QueryBudgetExceeded",
+    "ReadOnlyError",
+    "read_only",
+    "BigIntegerPK",
+    "ValueEnum",
+    "dialect_insert",
+    "upsert_statement",
+    "upsert_many",
+    "upsert_select"
 ]
\ No newline at end of file
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import Column, DateTime, String, Text, delete
+
+from .base import Base
+from .uow import UnitOfWork
+from .upsert import dialect_insert
+
+
+class FSMStateModel(Base):
+    __tablename__ = "db_manager__fsm_states"
+
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=False, default="{}")
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class FSMRecord:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+
+
+class SQLStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в базе данных db_manager.
+    Чтение идёт из ограниченного LRU-кэша, который пополняется
+    только зафиксированными значениями: запись убирает ключ из кэша
+    и возвращает его туда после commit.
+    Состояния, не менявшиеся дольше ttl секунд, считаются устаревшими
+    и удаляются фоновой задачей
+    """
+    def __init__(
+        self,
+        uow_factory: Callable[[], UnitOfWork],
+        *,
+        ttl: Optional[float] = 86400,
+        cache_size: int = 10000,
+        sweep_interval: float = 600,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        self.uow_factory = uow_factory
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.sweep_interval = sweep_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._cache: "OrderedDict[str, FSMRecord]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        record = await self._get(storage_key)
+        state = state.state if isinstance(state, State) else state
+        await self._save(storage_key, FSMRecord(state, record.data, time.time()))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._get(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        storage_key = self.key_builder.build(key)
+        record = await self._get(storage_key)
+        await self._save(storage_key, FSMRecord(record.state, data.copy(), time.time()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._get(self.key_builder.build(key))).data.copy()
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        self._cache.clear()
+
+    def start_sweeper(self):
+        if self.ttl and self._sweeper is None and not self._closed:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def sweep(self) -> int:
+        """
+        Удаляет устаревшие состояния из кэша и базы, возвращает число удалённых записей
+        """
+        cutoff = time.time() - self.ttl
+        for storage_key in [k for k, record in self._cache.items() if record.updated_at < cutoff]:
+            del self._cache[storage_key]
+
+        async with self.uow_factory() as uow:
+            result = await uow.session.execute(
+                delete(FSMStateModel).where(
+                    FSMStateModel.updated_at < datetime.fromtimestamp(cutoff, tz=timezone.utc)
+                )
+            )
+        return result.rowcount or 0
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep()
+            except Exception as e:
+                print(f"Failed to remove expired FSM states: {e}")
+                continue
+            if removed:
+                print(f"Removed {removed} expired FSM states")
+
+    def _is_expired(self, updated_at: float) -> bool:
+        return bool(self.ttl) and updated_at < time.time() - self.ttl
+
+    async def _get(self, storage_key: str) -> FSMRecord:
+        record = self._cache.get(storage_key)
+        if record is not None:
+            if not self._is_expired(record.updated_at):
+                self._cache.move_to_end(storage_key)
+                return record
+            return FSMRecord(None, {}, time.time())
+
+        async with self.uow_factory() as uow:
+            # В общей сессии апдейта объект мог остаться от чтения до upsert
+            row = await uow.session.get(FSMStateModel, storage_key, populate_existing=True)
+            if row is not None:
+                updated_at = row.updated_at
+                if updated_at.tzinfo is None:
+                    # SQLite не хранит часовой пояс, значения всегда записываются в UTC
+                    updated_at = updated_at.replace(tzinfo=timezone.utc)
+                record = FSMRecord(row.state, json.loads(row.data), updated_at.timestamp())
+
+            if record is None or self._is_expired(record.updated_at):
+                record = FSMRecord(None, {}, time.time())
+            # Значение, прочитанное до чужого commit, не вытесняет записанное им
+            uow.after_commit(lambda: self._remember(storage_key, record, replace=False))
+        return record
+
+    async def _save(self, storage_key: str, record: FSMRecord):
+        # До commit ключ читается из базы: в сессии апдейта видно новое значение,
+        # а при откате в кэше не останется незафиксированного
+        self._cache.pop(storage_key, None)
+        async with self.uow_factory() as uow:
+            if record.state is None and not record.data:
+                await uow.session.execute(
+                    delete(FSMStateModel).where(FSMStateModel.key == storage_key)
+                )
+            else:
+                values = {
+                    "key": storage_key,
+                    "state": record.state,
+                    "data": json.dumps(record.data, ensure_ascii=False, separators=(",", ":")),
+                    "updated_at": datetime.fromtimestamp(record.updated_at, tz=timezone.utc)
+                }
+                await self._upsert(uow, values)
+            uow.after_commit(lambda: self._remember(storage_key, record))
+
+    @staticmethod
+    async def _upsert(uow: UnitOfWork, values: Dict[str, Any]):
+        insert = dialect_insert(uow.session)
+        if insert is None:
+            await uow.session.merge(FSMStateModel(**values))
+            return
+
+        statement = insert(FSMStateModel).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[FSMStateModel.key],
+            set_={
+                "state": statement.excluded.state,
+                "data": statement.excluded.data,
+                "updated_at": statement.excluded.updated_at
+            }
+        )
+        await uow.session.execute(statement)
+
+    def _remember(self, storage_key: str, record: FSMRecord, replace: bool = True):
+        if self._closed or (not replace and storage_key in self._cache):
+            return
+        self._cache[storage_key] = record
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,126 @@
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from zuki.metrics import MetricsRegistry
+
+
+def instrument_engine(engine: AsyncEngine, registry: MetricsRegistry):
+    """
+    Считает количество и время SQL-запросов движка по типу операции
+    """
+    queries = registry.counter(
+        "db_manager_queries_total",
+        "SQL statements executed",
+        ("operation",)
+    )
+    latency = registry.histogram(
+        "db_manager_query_seconds",
+        "SQL statement execution time",
+        ("operation",)
+    )
+
+    def operation_of(statement: str) -> str:
+        words = statement.split(None, 1)
+        return words[0].upper() if words else "UNKNOWN"
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        operation = operation_of(statement)
+        queries.inc(operation=operation)
+        latency.observe(time.perf_counter() - start, operation=operation)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        stack = context.connection.info.get("query_start") if context.connection else None
+        if stack:
+            stack.pop()
+        queries.inc(operation="ERROR")
+
+
+class PoolMonitor:
+    """
+    Следит за пулом соединений движка: сколько соединений выдано,
+    сколько ждали выдачи и сколько раз пул выходил за pool_size
+    """
+    def __init__(self, engine: AsyncEngine, registry: MetricsRegistry):
+        self.pool = engine.sync_engine.pool
+        self.checked_out = 0
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+        self._checked_out = registry.gauge("db_manager_pool_checked_out", "Connections currently checked out")
+        self._checkouts = registry.counter("db_manager_pool_checkouts_total", "Connection checkouts")
+        self._overflow = registry.counter(
+            "db_manager_pool_overflow_total",
+            "Checkouts that found more than pool_size connections in use"
+        )
+        self._timeouts = registry.counter(
+            "db_manager_pool_timeouts_total",
+            "Checkouts that gave up waiting for a connection"
+        )
+        self._wait = registry.histogram("db_manager_pool_wait_seconds", "Time spent waiting for a connection")
+
+        event.listen(self.pool, "checkout", self._on_checkout)
+        event.listen(self.pool, "checkin", self._on_checkin)
+        self._wrap_do_get()
+
+    def stats(self) -> dict:
+        """
+        Текущее состояние пула и накопленные счётчики
+        """
+        size = getattr(self.pool, "size", None)
+        overflow = getattr(self.pool, "overflow", None)
+        return {
+            "pool": type(self.pool).__name__,
+            "size": size() if size else None,
+            "overflow": overflow() if overflow else None,
+            "checked_out": self.checked_out,
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_seconds,
+        }
+
+    def _wrap_do_get(self):
+        # Событий начала ожидания у пула нет, поэтому время выдачи
+        # меряется вокруг _do_get — метода, через который пул выдаёт соединение
+        do_get = self.pool._do_get
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            except exc.TimeoutError:
+                self.timeouts += 1
+                self._timeouts.inc()
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                self.wait_seconds += elapsed
+                self._wait.observe(elapsed)
+
+        self.pool._do_get = timed_do_get
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checked_out += 1
+        self.checkouts += 1
+        self._checked_out.set(self.checked_out)
+        self._checkouts.inc()
+
+        size = getattr(self.pool, "size", None)
+        if size and self.checked_out > size():
+            self.overflow_checkouts += 1
+            self._overflow.inc()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.checked_out = max(0, self.checked_out - 1)
+        self._checked_out.set(self.checked_out)
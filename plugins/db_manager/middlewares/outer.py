@@ -1,10 +1,15 @@
-from typing import Callable, Awaitable, Any
+from typing import Callable, Awaitable, Any, Optional
 
 from aiogram import BaseMiddleware
 
+from ..uow import UpdateUnitOfWork, current_update_uow
+
 class OuterMiddleware(BaseMiddleware):
-    def __init__(self, uow_factory):
+    def __init__(self, uow_factory, ro_uow_factory, update_uow_factory: Optional[Callable[[], UpdateUnitOfWork]] = None, share_reads: bool = False):
         self.uow_factory = uow_factory
+        self.ro_uow_factory = ro_uow_factory
+        self.update_uow_factory = update_uow_factory
+        self.share_reads = share_reads
 
     async def __call__(
         self,
@@ -12,6 +17,26 @@ class OuterMiddleware(BaseMiddleware):
         event: Any,
         data: dict,
     ) -> Any:
-        data["db_manager:uow_factory"] = self.uow_factory
-        result = await handler(event, data)
-        return result
\ No newline at end of file
+        if self.update_uow_factory is None:
+            data["db_manager:uow_factory"] = self.uow_factory
+            data["db_manager:ro_uow_factory"] = self.ro_uow_factory
+            result = await handler(event, data)
+            return result
+
+        # Все блоки UnitOfWork апдейта работают в одной сессии,
+        # фиксируемой после обработки
+        uow = self.update_uow_factory()
+        data["db_manager:uow"] = uow
+        data["db_manager:uow_factory"] = uow
+        data["db_manager:ro_uow_factory"] = uow.read_only if self.share_reads else self.ro_uow_factory
+
+        token = current_update_uow.set(uow)
+        try:
+            result = await handler(event, data)
+        except BaseException as e:
+            await uow.finish(e)
+            raise
+        finally:
+            current_update_uow.reset(token)
+        await uow.finish()
+        return result
@@ -0,0 +1,132 @@
+import hashlib
+from typing import Callable, Dict, Iterable, List
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .base import Base
+
+
+class SchemaMigration(Base):
+    __tablename__ = "db_manager__schema_migrations"
+    plugin = Column(String, primary_key=True)
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class SchemaState(Base):
+    __tablename__ = "db_manager__schema_state"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    metadata_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class Migration:
+    """
+    Шаг миграции схемы плагина. upgrade получает синхронное соединение
+    и выполняется в одной транзакции с записью о применении
+    """
+    def __init__(self, version: int, name: str, upgrade: Callable[[Connection], None]):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def model_index(model, name: str) -> Index:
+    """
+    Индекс модели по имени. Миграция перечисляет свои индексы явно:
+    индекс, добавленный в модель позже, попадает в новую версию миграции,
+    а не в уже применённую
+    """
+    for index in model.__table__.indexes:
+        if index.name == name:
+            return index
+    raise LookupError(f"Index {name} is not declared on {model.__table__.name}")
+
+
+def create_indexes(*indexes: Index) -> Callable[[Connection], None]:
+    """
+    upgrade, создающий индексы, которых ещё нет. Индексы объявляются
+    в __table_args__ моделей, так что в новой базе их создаёт create_all,
+    а миграция добавляет их в уже существующие таблицы
+    """
+    def upgrade(connection: Connection):
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+    return upgrade
+
+
+def metadata_hash(metadata: MetaData) -> str:
+    """
+    Отпечаток описанной в моделях схемы: таблицы, столбцы, индексы и ограничения
+    """
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}".encode())
+        parts = [f"index:{index.name}:{[column.name for column in index.columns]}" for index in table.indexes]
+        parts += [
+            f"constraint:{constraint.name}:{type(constraint).__name__}:{[column.name for column in constraint.columns]}"
+            for constraint in table.constraints
+        ]
+        for part in sorted(parts):
+            digest.update(part.encode())
+    return digest.hexdigest()
+
+
+class MigrationRunner:
+    """
+    Создаёт таблицы моделей и применяет миграции плагинов по порядку версий.
+    create_all, проверяющий каждую таблицу в базе, выполняется только
+    при изменении схемы моделей с прошлого запуска
+    """
+    def __init__(self, engine: AsyncEngine, metadata: MetaData = Base.metadata):
+        self.engine = engine
+        self.metadata = metadata
+        self._migrations: Dict[str, List[Migration]] = {}
+
+    def register(self, plugin: str, migrations: Iterable[Migration]):
+        migrations = sorted(migrations, key=lambda migration: migration.version)
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError(f"Duplicate migration versions for {plugin}: {versions}")
+        self._migrations[plugin] = migrations
+
+    async def run(self):
+        async with self.engine.begin() as connection:
+            await connection.run_sync(self._run)
+
+    def _run(self, connection: Connection):
+        for table in (SchemaMigration.__table__, SchemaState.__table__):
+            table.create(connection, checkfirst=True)
+
+        current_hash = metadata_hash(self.metadata)
+        stored_hash = connection.scalar(select(SchemaState.metadata_hash).where(SchemaState.id == 1))
+        if stored_hash != current_hash:
+            print("Model schema changed, creating missing tables")
+            self.metadata.create_all(connection)
+
+        applied = set(connection.execute(select(SchemaMigration.plugin, SchemaMigration.version)).all())
+        for plugin, migrations in self._migrations.items():
+            for migration in migrations:
+                if (plugin, migration.version) in applied:
+                    continue
+                print(f"Applying migration {plugin}:{migration.version} {migration.name}")
+                migration.upgrade(connection)
+                connection.execute(SchemaMigration.__table__.insert().values(
+                    plugin=plugin,
+                    version=migration.version,
+                    name=migration.name
+                ))
+
+        if stored_hash is None:
+            connection.execute(SchemaState.__table__.insert().values(id=1, metadata_hash=current_hash))
+        elif stored_hash != current_hash:
+            connection.execute(
+                SchemaState.__table__.update()
+                .where(SchemaState.id == 1)
+                .values(metadata_hash=current_hash, updated_at=func.now())
+            )
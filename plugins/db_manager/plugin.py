@@ -1,12 +1,19 @@
-import tomllib
+import itertools
 from pathlib import Path
 
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 from zuki.plugin import Plugin
 from .base import Base
+from .fsm import SQLStorage
+from .metrics import PoolMonitor, instrument_engine
 from .middlewares.outer import OuterMiddleware
-from .uow import UnitOfWork
+from .migrations import MigrationRunner
+from .query_tracker import QueryTracker, QueryTrackingMiddleware
+from .read_only import GuardedSession
+from .sqlite import SQLiteSession, SQLiteWriteLock, apply_pragmas, is_memory_sqlite, is_sqlite
+from .uow import ReadOnlyUnitOfWork, UnitOfWork, UpdateUnitOfWork, current_update_uow
 
 class DBManager(Plugin):
     name = "db_manager"
@@ -17,39 +24,149 @@ class DBManager(Plugin):
     async def on_load(self):
         self.config_manager.ensure_plugin_configs(self)
         self.config_path = self.config_manager.get_plugin_config_path(self.name)
-        self.config = await self.load_config("config.toml")
+        self.config = self.config_manager.load_config(self.name, "config.toml")
 
-        self.engine = create_async_engine(
-            await self._assemble_connection(),
-            future=True
-        )
+        url = await self._assemble_connection()
+        if is_sqlite(make_url(url)) and self.app.worker_index is not None:
+            # Очередь писателей SQLiteWriteLock существует только внутри процесса
+            raise ValueError("SQLite is not supported with several worker processes, use PostgreSQL or WORKERS=1")
+        database_config = self.config.get("database", {})
+        uow_config = self.config.get("unit_of_work", {})
+        # Запись фиксируется до ответов пользователю, фиксация в конце апдейта — по выбору
+        self.commit_per_block = uow_config.get("commit_per_block", True)
+        self.query_tracker = self._create_query_tracker(self.config.get("query_tracker", {}))
+        self.engine = self._create_engine(url, database_config)
+        self.pool_monitor = PoolMonitor(self.engine, self.app.metrics)
         self.sessionmaker = async_sessionmaker(
             self.engine,
             autoflush=False,
-            expire_on_commit=False
+            expire_on_commit=False,
+            sync_session_class=GuardedSession,
+            **self._sqlite_session_options(url, database_config.get("sqlite", {}))
         )
 
+        # Реплики только читаются, без них чтение идёт в основную базу
+        self.replica_engines = [
+            self._create_engine(replica_url, database_config)
+            for replica_url in database_config.get("replicas", [])
+        ]
+        replica_sessionmakers = [
+            async_sessionmaker(
+                engine,
+                autoflush=False,
+                expire_on_commit=False,
+                sync_session_class=GuardedSession
+            )
+            for engine in self.replica_engines
+        ]
+        self._replicas = itertools.cycle(replica_sessionmakers or [self.sessionmaker])
+
         self.app.register_service(f"{self.name}:engine", self.engine)
+        self.app.register_service(f"{self.name}:replica_engines", self.replica_engines)
+        self.app.register_service(f"{self.name}:pool_stats", self.pool_monitor.stats)
         self.app.register_service(f"{self.name}:base", Base)
+        self.migrations = MigrationRunner(self.engine, Base.metadata)
+        self.app.register_service(f"{self.name}:migrations", self.migrations)
         self.app.register_service(
             f"{self.name}:uow_factory",
             lambda: UnitOfWork(self.sessionmaker)
         )
+        self.app.register_service(f"{self.name}:ro_uow_factory", self.read_only_uow)
 
+        if self.query_tracker is not None:
+            self.app.register_service(f"{self.name}:query_tracker", self.query_tracker)
+            self.app.add_dispatcher_middleware(QueryTrackingMiddleware(self.query_tracker))
         self.app.add_dispatcher_middleware(
-            OuterMiddleware(lambda: UnitOfWork(self.sessionmaker))
+            OuterMiddleware(
+                lambda: UnitOfWork(self.sessionmaker),
+                self.read_only_uow,
+                self.update_uow if uow_config.get("per_update", True) else None,
+                # Без реплик чтение идёт в ту же базу, отдельное соединение не нужно
+                share_reads=not self.replica_engines
+            )
         )
 
+        self.fsm_storage = None
+        fsm_config = self.config.get("fsm", {})
+        if fsm_config.get("enabled", True):
+            self.fsm_storage = SQLStorage(
+                self.current_uow,
+                ttl=fsm_config.get("ttl_seconds", 86400),
+                cache_size=fsm_config.get("cache_size", 10000),
+                sweep_interval=fsm_config.get("sweep_interval_seconds", 600)
+            )
+            self.app.set_fsm_storage(self.fsm_storage)
+            self.app.register_service(f"{self.name}:fsm_storage", self.fsm_storage)
+
     async def on_startup(self):
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        # Плагины регистрируют миграции в on_load, к старту они уже известны.
+        # В режиме нескольких процессов их применяет воркер 0 до запуска остальных
+        if self.app.is_primary:
+            await self.migrations.run()
+
+        if self.fsm_storage is not None:
+            self.fsm_storage.start_sweeper()
 
-    async def load_config(self, conf_file_path: str):
-        with open(self.config_path / conf_file_path, "rb") as file:
-            return tomllib.load(file)
+    async def on_shutdown(self):
+        if self.fsm_storage is not None:
+            await self.fsm_storage.close()
+        for engine in self.replica_engines:
+            await engine.dispose()
+        await self.engine.dispose()
+
+    def update_uow(self) -> UpdateUnitOfWork:
+        return UpdateUnitOfWork(self.sessionmaker, commit_per_block=self.commit_per_block)
+
+    def current_uow(self):
+        """
+        Блок общего UnitOfWork апдейта, если он обрабатывается, иначе отдельный UnitOfWork.
+        Хранилище FSM пишет в сессии апдейта: иначе при SQLite
+        оно ждало бы блокировку записи, которую держит этот же апдейт
+        """
+        update_uow = current_update_uow.get()
+        if update_uow is not None and not update_uow.closed:
+            return update_uow()
+        return UnitOfWork(self.sessionmaker)
+
+    def read_only_uow(self) -> ReadOnlyUnitOfWork:
+        """
+        UnitOfWork только для чтения на следующей по кругу реплике
+        """
+        return ReadOnlyUnitOfWork(next(self._replicas))
+
+    def _create_engine(self, url: str, database_config: dict):
+        engine = create_async_engine(
+            self._apply_statement_cache(url, database_config.get("pool", {})),
+            future=True,
+            **self._engine_options(url, database_config)
+        )
+        instrument_engine(engine, self.app.metrics)
+        if self.query_tracker is not None:
+            self.query_tracker.instrument(engine)
+        if is_sqlite(make_url(url)):
+            apply_pragmas(engine, database_config.get("sqlite", {}))
+        return engine
+
+    def _create_query_tracker(self, tracker_config: dict):
+        """
+        Учёт запросов по апдейтам из секции [query_tracker]
+        """
+        if not tracker_config.get("enabled", True):
+            return None
+        return QueryTracker(
+            repeat_threshold=tracker_config.get("repeat_threshold", 5),
+            budgets=tracker_config.get("budgets", {}),
+            strict=tracker_config.get("strict", False),
+            metrics=self.app.metrics
+        )
 
     async def _assemble_connection(self):
         database_config = self.config.get("database", {})
+        if database_config.get("url"):
+            return database_config["url"]
+        if database_config.get("sqlite_path"):
+            return f"sqlite+aiosqlite:///{database_config['sqlite_path']}"
+
         async_driver = database_config.get("async_driver", "")
         user = database_config.get("user", "")
         password = database_config.get("password", "")
@@ -57,4 +174,57 @@ class DBManager(Plugin):
         port = database_config.get("port", 5432)
         db_name = database_config.get("db_name", "")
 
-        return f"{async_driver}://{user}:{password}@{host}:{port}/{db_name}"
\ No newline at end of file
+        return f"{async_driver}://{user}:{password}@{host}:{port}/{db_name}"
+
+    @staticmethod
+    def _engine_options(url: str, database_config: dict) -> dict:
+        """
+        Параметры движка из секций [database.pool] и [database.connect_args].
+        База SQLite в памяти существует в рамках одного соединения,
+        которое нельзя безопасно делить между параллельными сессиями,
+        поэтому она не поддерживается
+        """
+        pool_config = database_config.get("pool", {})
+        connect_args = dict(database_config.get("connect_args", {}))
+
+        if is_memory_sqlite(make_url(url)):
+            raise ValueError(
+                "In-memory SQLite is not supported, set [database] sqlite_path "
+                "or a sqlite+aiosqlite:///path/to/file.db url"
+            )
+
+        options = {
+            "pool_size": pool_config.get("size", 5),
+            "max_overflow": pool_config.get("max_overflow", 10),
+            "pool_timeout": pool_config.get("timeout", 30),
+            "pool_recycle": pool_config.get("recycle", -1),
+            "pool_pre_ping": pool_config.get("pre_ping", False),
+            "pool_use_lifo": pool_config.get("use_lifo", False),
+        }
+        if connect_args:
+            options["connect_args"] = connect_args
+        return options
+
+    def _sqlite_session_options(self, url: str, sqlite_config: dict) -> dict:
+        """
+        Для SQLite, если включено, ставит пишущие транзакции в общую очередь
+        """
+        if not is_sqlite(make_url(url)) or not sqlite_config.get("single_writer", True):
+            return {}
+
+        self.write_lock = SQLiteWriteLock(self.app.metrics)
+        return {"class_": SQLiteSession, "write_lock": self.write_lock}
+
+    @staticmethod
+    def _apply_statement_cache(url: str, pool_config: dict):
+        """
+        Размер кэша подготовленных запросов asyncpg на соединение
+        """
+        parsed_url = make_url(url)
+        size = pool_config.get("statement_cache_size")
+        if size is None:
+            return parsed_url
+        if parsed_url.get_driver_name() != "asyncpg":
+            print(f"statement_cache_size is only supported by asyncpg, ignored for {parsed_url.drivername}")
+            return parsed_url
+        return parsed_url.update_query_dict({"prepared_statement_cache_size": str(size)})
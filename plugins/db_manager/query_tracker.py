@@ -0,0 +1,200 @@
+import re
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from zuki.metrics import MetricsRegistry, current_handler
+
+_PARAMETER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Форма запроса: литералы и списки параметров IN заменены на ?,
+    так что запросы, отличающиеся только значениями, совпадают
+    """
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(?)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryScope:
+    """
+    Запросы, выполненные при обработке одного апдейта
+    """
+    def __init__(self, update_type: str):
+        self.update_type = update_type
+        self.handler: Optional[str] = None
+        self.total = 0
+        self.statements: Counter = Counter()
+        self.closed = False
+        self.token = None
+        self.handler_token = None
+
+    @property
+    def name(self) -> str:
+        return self.handler or f"unhandled:{self.update_type}"
+
+    def record(self, statement: str):
+        # Фоновые задачи, созданные во время апдейта, наследуют его контекст,
+        # но их запросы после завершения апдейта ему не принадлежат
+        if self.closed:
+            return
+        self.total += 1
+        self.statements[statement] += 1
+
+    def shapes(self) -> Counter:
+        # Нормализуются только различные тексты запросов и только при закрытии
+        shapes = Counter()
+        for statement, count in self.statements.items():
+            shapes[normalize_statement(statement)] += count
+        return shapes
+
+
+_current_scope: ContextVar[Optional[QueryScope]] = ContextVar("db_manager_query_scope", default=None)
+
+
+class QueryTracker:
+    """
+    Относит SQL-запросы движка к текущему апдейту и его хэндлеру,
+    ищет повторяющиеся формы запросов (N+1) и проверяет бюджет запросов хэндлеров.
+    В строгом режиме превышение бюджета — ошибка обработки апдейта
+    """
+    def __init__(
+        self,
+        *,
+        repeat_threshold: int = 5,
+        budgets: Optional[Dict[str, int]] = None,
+        strict: bool = False,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.repeat_threshold = repeat_threshold
+        self.budgets = dict(budgets or {})
+        self.strict = strict
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._reported: "OrderedDict[tuple, None]" = OrderedDict()
+
+        metrics = metrics or MetricsRegistry()
+        self._queries = metrics.histogram(
+            "db_manager_update_queries",
+            "SQL statements per handled update",
+            ("handler",),
+            buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+        )
+        self._repeated = metrics.counter(
+            "db_manager_repeated_queries_total",
+            "Updates that repeated one statement shape at least repeat_threshold times",
+            ("handler",)
+        )
+        self._over_budget = metrics.counter(
+            "db_manager_query_budget_exceeded_total",
+            "Updates that exceeded their handler query budget",
+            ("handler",)
+        )
+
+    def instrument(self, engine: AsyncEngine):
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            scope = _current_scope.get()
+            if scope is not None:
+                scope.record(statement)
+
+    def start(self, update_type: str) -> QueryScope:
+        scope = QueryScope(update_type)
+        scope.token = _current_scope.set(scope)
+        scope.handler_token = current_handler.set(None)
+        return scope
+
+    def finish(self, scope: QueryScope) -> Optional[QueryBudgetExceeded]:
+        """
+        Закрывает область апдейта, пишет метрики и отчёт о повторах.
+        Возвращает ошибку превышения бюджета, если включён строгий режим
+        """
+        scope.handler = current_handler.get()
+        current_handler.reset(scope.handler_token)
+        _current_scope.reset(scope.token)
+        scope.closed = True
+
+        name = scope.name
+        stats = self._stats.setdefault(name, {"updates": 0, "queries": 0, "max_queries": 0, "repeated": {}})
+        stats["updates"] += 1
+        stats["queries"] += scope.total
+        stats["max_queries"] = max(stats["max_queries"], scope.total)
+        self._queries.observe(scope.total, handler=name)
+
+        repeated = {shape: count for shape, count in scope.shapes().items() if count >= self.repeat_threshold}
+        if repeated:
+            self._repeated.inc(handler=name)
+        for shape, count in repeated.items():
+            stats["repeated"][shape] = max(stats["repeated"].get(shape, 0), count)
+            self._report(name, shape, count)
+
+        budget = self.budgets.get(name)
+        if budget is not None and scope.total > budget:
+            self._over_budget.inc(handler=name)
+            message = f"{name} executed {scope.total} SQL statements, budget is {budget}"
+            print(f"WARNING: {message}")
+            if self.strict:
+                return QueryBudgetExceeded(message)
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        По хэндлерам: число апдейтов, запросов, максимум запросов на апдейт
+        и повторявшиеся формы запросов с наибольшим числом повторов
+        """
+        return {
+            name: {**stats, "avg_queries": stats["queries"] / stats["updates"]}
+            for name, stats in self._stats.items()
+        }
+
+    def reset(self):
+        self._stats.clear()
+        self._reported.clear()
+
+    def _report(self, name: str, shape: str, count: int):
+        # О каждой форме запроса в хэндлере сообщаем один раз
+        key = (name, shape)
+        if key in self._reported:
+            return
+        self._reported[key] = None
+        while len(self._reported) > 1000:
+            self._reported.popitem(last=False)
+        print(f"WARNING: possible N+1 in {name}: {count} x {shape}")
+
+
+class QueryTrackingMiddleware(BaseMiddleware):
+    """
+    Открывает область учёта запросов на время обработки апдейта
+    """
+    def __init__(self, tracker: QueryTracker):
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict], Awaitable[Any]],
+        event: Update,
+        data: dict,
+    ) -> Any:
+        scope = self.tracker.start(event.event_type)
+        try:
+            result = await handler(event, data)
+        finally:
+            error = self.tracker.finish(scope)
+        if error is not None:
+            raise error
+        return result
@@ -0,0 +1,52 @@
+import functools
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class ReadOnlyError(Exception):
+    """
+    Попытка записи в сессии или операции, объявленной только для чтения
+    """
+
+
+class GuardedSession(Session):
+    """
+    Сессия, запрещающая изменяющие запросы и flush,
+    пока в session.info выставлен read_only
+    """
+
+
+@event.listens_for(GuardedSession, "do_orm_execute")
+def _forbid_dml(orm_execute_state):
+    if orm_execute_state.session.info.get("read_only") and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        table = getattr(orm_execute_state.statement, "table", None)
+        raise ReadOnlyError(f"Write statement in a read-only session: {orm_execute_state.statement.__visit_name__} {table}")
+
+
+@event.listens_for(GuardedSession, "before_flush")
+def _forbid_flush(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise ReadOnlyError("Flush with pending changes in a read-only session")
+
+
+def read_only(method):
+    """
+    Объявляет метод репозитория операцией только для чтения:
+    пока он выполняется, запись в его сессии запрещена.
+    Такие методы можно вызывать из ReadOnlyUnitOfWork
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        info = self.session.info
+        depth = info.get("read_only", 0)
+        info["read_only"] = depth + 1
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            info["read_only"] = depth
+
+    wrapper.__read_only__ = True
+    return wrapper
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from zuki.metrics import MetricsRegistry
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "foreign_keys": True,
+    "temp_store": "memory",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+}
+
+
+def is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(url: URL) -> bool:
+    return is_sqlite(url) and url.database in (None, "", ":memory:")
+
+
+def apply_pragmas(engine: AsyncEngine, sqlite_config: dict):
+    """
+    Выставляет PRAGMA на каждом новом соединении SQLite.
+    По умолчанию WAL и synchronous=NORMAL: читатели не ждут писателя,
+    а fsync выполняется только при чекпоинте
+    """
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update(sqlite_config.get("pragmas", {}))
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if isinstance(value, bool):
+                value = int(value)
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+class SQLiteWriteLock:
+    """
+    Очередь писателей SQLite: база допускает одну пишущую транзакцию,
+    поэтому сессии ждут её здесь, а не в busy_timeout драйвера
+    """
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
+        self._lock = asyncio.Lock()
+
+        metrics = metrics or MetricsRegistry()
+        self._wait = metrics.histogram(
+            "db_manager_sqlite_write_wait_seconds",
+            "Time spent waiting for the SQLite write lock"
+        )
+        self._waiting = metrics.gauge("db_manager_sqlite_write_waiting", "Sessions waiting for the SQLite write lock")
+
+    async def acquire(self):
+        start = time.perf_counter()
+        self._waiting.inc()
+        try:
+            await self._lock.acquire()
+        finally:
+            self._waiting.dec()
+            self._wait.observe(time.perf_counter() - start)
+
+    def release(self):
+        self._lock.release()
+
+
+class SQLiteSession(AsyncSession):
+    """
+    Сессия, которая перед первой записью в транзакции занимает SQLiteWriteLock
+    и освобождает его после commit или rollback.
+    Драйвер sqlite3 открывает транзакцию только перед первым изменяющим запросом,
+    поэтому пишущие транзакции SQLite выполняются строго по очереди
+    """
+    def __init__(self, *args, write_lock: Optional[SQLiteWriteLock] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_lock = write_lock
+        self._holds_write_lock = False
+
+    async def execute(self, statement, *args, **kwargs):
+        await self._before_statement(statement)
+        return await super().execute(statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        await self._before_statement(statement)
+        return await super().scalars(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        await self._before_statement(statement)
+        return await super().scalar(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        await self._before_flush()
+        await super().flush(objects)
+
+    async def commit(self):
+        await self._before_flush()
+        try:
+            await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self):
+        try:
+            await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            self._release_write_lock()
+
+    async def _before_statement(self, statement):
+        if getattr(statement, "is_dml", False) or (self.autoflush and self._has_changes()):
+            await self._acquire_write_lock()
+
+    async def _before_flush(self):
+        if self._has_changes():
+            await self._acquire_write_lock()
+
+    def _has_changes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def _acquire_write_lock(self):
+        if self.write_lock is not None and not self._holds_write_lock:
+            await self.write_lock.acquire()
+            self._holds_write_lock = True
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            self.write_lock.release()
+
+
+async def begin_before_savepoint(session: AsyncSession):
+    """
+    Драйвер sqlite3 открывает транзакцию только перед изменяющим запросом.
+    SAVEPOINT до него стал бы внешней транзакцией, и его RELEASE
+    зафиксировал бы работу раньше commit, поэтому транзакция открывается явно.
+    Блокировка записи берётся до BEGIN, чтобы чтение внутри savepoint
+    не закрепило снимок базы, который устареет к первой записи
+    """
+    connection = await session.connection()
+    if connection.dialect.name != "sqlite":
+        return
+
+    raw_connection = await connection.get_raw_connection()
+    if raw_connection.driver_connection.in_transaction:
+        return
+    if isinstance(session, SQLiteSession):
+        await session._acquire_write_lock()
+    await connection.exec_driver_sql("BEGIN")
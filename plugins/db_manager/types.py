@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, Enum, Integer
+
+# SQLite автоматически нумерует только столбцы INTEGER PRIMARY KEY,
+# поэтому для него BIGINT первичного ключа заменяется на INTEGER
+BigIntegerPK = BigInteger().with_variant(Integer, "sqlite")
+
+
+def ValueEnum(enum_cls, name: str) -> Enum:
+    """
+    Столбец перечисления, хранящий значения членов enum_cls.
+    В PostgreSQL это нативный тип name, в остальных базах —
+    VARCHAR с ограничением CHECK на допустимые значения
+    """
+    return Enum(
+        enum_cls,
+        name=name,
+        values_callable=lambda cls: [e.value for e in cls],
+        native_enum=True,
+        create_constraint=True
+    )
@@ -1,15 +1,224 @@
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from .sqlite import begin_before_savepoint
+
+
 class UnitOfWork:
     def __init__(self, session_factory):
         self._session_factory = session_factory
         self.session = None
+        self._after_commit: List[Callable[[], None]] = []
 
     async def __aenter__(self):
         self.session = self._session_factory()
         return self
 
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc:
+                await self.session.rollback()
+            else:
+                await self.session.commit()
+        finally:
+            await self.session.close()
+        if not exc:
+            run_after_commit(self._after_commit)
+        self._after_commit.clear()
+
+    def savepoint(self) -> "SavepointUnitOfWork":
+        return SavepointUnitOfWork(self.session)
+
+    def after_commit(self, callback: Callable[[], None]):
+        """
+        Вызывает callback после успешного commit. При откате он отбрасывается
+        """
+        self._after_commit.append(callback)
+
+
+class ReadOnlyUnitOfWork(UnitOfWork):
+    """
+    Сессия только для чтения: запись в ней запрещена,
+    а транзакция при выходе всегда откатывается.
+    Сессия закрывается без rollback, чтобы загруженные объекты
+    не истекали и были доступны после выхода из блока
+    """
+    async def __aenter__(self):
+        self.session = self._session_factory()
+        self.session.info["read_only"] = 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+
+class SavepointUnitOfWork:
+    """
+    Вложенная транзакция (SAVEPOINT) в уже открытой сессии:
+    при ошибке откатывается только работа внутри блока
+    """
+    def __init__(self, session):
+        self.session = session
+        self._transaction = None
+
+    async def __aenter__(self):
+        await begin_before_savepoint(self.session)
+        self._transaction = await self.session.begin_nested()
+        return self
+
     async def __aexit__(self, exc_type, exc, tb):
         if exc:
-            await self.session.rollback()
+            await self._transaction.rollback()
         else:
-            await self.session.commit()
-        await self.session.close()
+            await self._transaction.commit()
+
+
+class SharedUnitOfWork:
+    """
+    Блок работы в общей сессии апдейта. При выходе изменения блока
+    отправляются в базу (flush), а фиксируются один раз в конце апдейта,
+    либо при выходе из внешнего блока, если включён commit_per_block.
+    Ошибка внутри блока откатывает всё незафиксированное, что апдейт успел записать;
+    шаги, которые должны пережить ошибку соседних, используют savepoint().
+    Внешний блок только для чтения при выходе завершает транзакцию чтения,
+    если в ней нет незафиксированной записи, и соединение возвращается в пул
+    """
+    def __init__(self, update_uow: "UpdateUnitOfWork", read_only: bool = False):
+        self._update_uow = update_uow
+        self._read_only = read_only
+        self._read_only_depth = 0
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = self._update_uow.session
+        if self._read_only:
+            self._read_only_depth = self.session.info.get("read_only", 0)
+            self.session.info["read_only"] = self._read_only_depth + 1
+        else:
+            self._update_uow.depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._read_only:
+            self.session.info["read_only"] = self._read_only_depth
+            if not self._read_only_depth:
+                await self._update_uow.release()
+            return
+        self._update_uow.depth -= 1
+        if exc:
+            await self._update_uow.rollback()
+        elif self._update_uow.commit_per_block and self._update_uow.depth == 0:
+            await self._update_uow.commit()
+        else:
+            await self.session.flush()
+            self._update_uow.pending_writes = True
+
+    def savepoint(self) -> SavepointUnitOfWork:
+        return SavepointUnitOfWork(self.session)
+
+    def after_commit(self, callback: Callable[[], None]):
+        self._update_uow.after_commit(callback)
+
+
+class UpdateUnitOfWork:
+    """
+    Одна сессия на апдейт для всех middleware и хэндлеров.
+    Экземпляр вызывается как uow_factory и выдаёт блоки SharedUnitOfWork.
+    Сессия создаётся при первом блоке, соединение берётся из пула
+    при первом запросе. С commit_per_block (по умолчанию) каждый внешний блок
+    фиксируется при выходе из него: ответ пользователю после блока означает,
+    что запись сохранена, а соединение и блокировка записи SQLite
+    не удерживаются, пока апдейт обращается к Bot API.
+    Без него commit выполняется один раз в finish() в конце апдейта
+    """
+    def __init__(self, session_factory, commit_per_block: bool = True):
+        self._session_factory = session_factory
+        self._session = None
+        self._after_commit: List[Callable[[], None]] = []
+        self.commit_per_block = commit_per_block
+        self.depth = 0
+        self.pending_writes = False
+        self.closed = False
+
+    def __call__(self) -> SharedUnitOfWork:
+        return SharedUnitOfWork(self)
+
+    def read_only(self) -> SharedUnitOfWork:
+        """
+        Блок только для чтения в той же сессии
+        """
+        return SharedUnitOfWork(self, read_only=True)
+
+    @property
+    def session(self):
+        if self.closed:
+            raise RuntimeError("Update unit of work is already finished")
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def after_commit(self, callback: Callable[[], None]):
+        """
+        Вызывает callback после фиксации апдейта. При откате он отбрасывается
+        """
+        self._after_commit.append(callback)
+
+    async def commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        self.pending_writes = False
+        if self._session is not None:
+            await self._session.commit()
+        run_after_commit(callbacks)
+
+    async def rollback(self):
+        self._after_commit.clear()
+        self.pending_writes = False
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def release(self):
+        """
+        Завершает транзакцию, в которой апдейт только читал, и возвращает
+        соединение в пул. Commit, а не rollback: загруженные объекты не истекают
+        """
+        if self._session is None or self.depth or self.pending_writes:
+            return
+        if self._session.in_transaction():
+            await self.commit()
+
+    async def finish(self, exc: Optional[BaseException] = None):
+        """
+        Фиксирует работу апдейта или откатывает её при ошибке и закрывает сессию
+        """
+        self.closed = True
+        callbacks, self._after_commit = self._after_commit, []
+        if self._session is None:
+            if exc is None:
+                run_after_commit(callbacks)
+            return
+        try:
+            if exc is None:
+                await self._session.commit()
+            else:
+                await self._session.rollback()
+        finally:
+            await self._session.close()
+        if exc is None:
+            run_after_commit(callbacks)
+
+
+def run_after_commit(callbacks: List[Callable[[], None]]):
+    # Данные уже зафиксированы: ошибка обработчика не должна превращаться в ошибку апдейта
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"After commit callback failed: {e}")
+
+
+# Общий UnitOfWork апдейта, который сейчас обрабатывается
+current_update_uow: ContextVar[Optional[UpdateUnitOfWork]] = ContextVar("db_manager_update_uow", default=None)
@@ -0,0 +1,151 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select as select_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(session: AsyncSession) -> Optional[Callable]:
+    """
+    insert() диалекта базы с поддержкой ON CONFLICT DO UPDATE
+    или None, если диалект его не поддерживает
+    """
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def upsert_statement(
+    session: AsyncSession,
+    model,
+    conflict_columns: Sequence[str],
+    update_columns: Iterable[str],
+    select=None
+):
+    """
+    INSERT ... ON CONFLICT (conflict_columns) DO UPDATE SET update_columns RETURNING model.
+    Без select значения передаются параметрами при выполнении,
+    с select вставляются строки, которые он вернёт.
+    Есть только в PostgreSQL и SQLite, upsert_many и upsert_select
+    работают и в остальных базах
+    """
+    insert = dialect_insert(session)
+    if insert is None:
+        raise NotImplementedError(
+            f"Upsert is not supported for {session.get_bind().dialect.name} databases"
+        )
+
+    statement = insert(model)
+    if select is not None:
+        statement = statement.from_select([column.name for column in select.selected_columns], select)
+
+    set_ = {column: getattr(statement.excluded, column) for column in update_columns}
+    if "updated_at" in model.__table__.c:
+        set_["updated_at"] = func.now()
+
+    return statement.on_conflict_do_update(
+        index_elements=[getattr(model, column) for column in conflict_columns],
+        set_=set_
+    ).returning(model)
+
+
+async def upsert_many(
+    session: AsyncSession,
+    model,
+    rows: List[Dict[str, Any]],
+    conflict_columns: Sequence[str]
+) -> List[Any]:
+    """
+    Вставляет или обновляет строки и возвращает их объекты. Обновляются
+    только переданные в строке столбцы, строки с одинаковым набором столбцов
+    записываются одним запросом. Строки с одинаковым ключом схлопываются
+    в последнюю: база не даёт обновить одну строку дважды в одном запросе
+    """
+    unique_rows = {tuple(row[column] for column in conflict_columns): row for row in rows}
+
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for row in unique_rows.values():
+        groups.setdefault(frozenset(row), []).append(row)
+
+    if dialect_insert(session) is None:
+        update_columns = {column for row in unique_rows.values() for column in row} - set(conflict_columns)
+        return await _merge_rows(session, model, unique_rows, conflict_columns, update_columns)
+
+    upserted = []
+    for columns, group in groups.items():
+        result = await session.scalars(
+            upsert_statement(session, model, conflict_columns, columns - set(conflict_columns)),
+            group,
+            execution_options={"populate_existing": True}
+        )
+        upserted.extend(result.all())
+    return upserted
+
+
+async def upsert_select(
+    session: AsyncSession,
+    model,
+    conflict_columns: Sequence[str],
+    update_columns: Iterable[str],
+    select
+) -> List[Any]:
+    """
+    Вставляет или обновляет строки, которые вернёт select, и возвращает их объекты
+    """
+    if dialect_insert(session) is not None:
+        result = await session.scalars(
+            upsert_statement(session, model, conflict_columns, update_columns, select=select),
+            execution_options={"populate_existing": True}
+        )
+        return result.all()
+
+    rows = {}
+    for row in (await session.execute(select)).mappings():
+        rows[tuple(row[column] for column in conflict_columns)] = dict(row)
+    return await _merge_rows(session, model, rows, conflict_columns, update_columns)
+
+
+async def _merge_rows(
+    session: AsyncSession,
+    model,
+    rows: Dict[Tuple, Dict[str, Any]],
+    conflict_columns: Sequence[str],
+    update_columns: Iterable[str]
+) -> List[Any]:
+    # Для баз без ON CONFLICT: существующие строки читаются одним запросом
+    # и обновляются через ORM, остальные добавляются
+    if not rows:
+        return []
+
+    keys = [getattr(model, column) for column in conflict_columns]
+    if len(keys) == 1:
+        condition = keys[0].in_([key[0] for key in rows])
+    else:
+        condition = tuple_(*keys).in_(list(rows))
+    existing = {
+        tuple(getattr(instance, column) for column in conflict_columns): instance
+        for instance in await session.scalars(select_(model).where(condition))
+    }
+
+    update_columns = list(update_columns)
+    has_updated_at = "updated_at" in model.__table__.c
+    merged = []
+    for key, row in rows.items():
+        instance = existing.get(key)
+        if instance is None:
+            instance = model(**row)
+            session.add(instance)
+        else:
+            for column in update_columns:
+                if column in row:
+                    setattr(instance, column, row[column])
+            if has_updated_at:
+                instance.updated_at = datetime.now(timezone.utc)
+        merged.append(instance)
+    await session.flush()
+    return merged
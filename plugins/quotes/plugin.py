@@ -1,4 +1,4 @@
-import tomllib
+import asyncio
 
 from zuki.plugin import Plugin
 
@@ -19,34 +19,48 @@ class QuotesPlugin(Plugin):
     async def on_load(self):
         self.config_manager.ensure_plugin_configs(self)
         self.config_path = self.config_manager.get_plugin_config_path(self.name)
-        self.config = await self.load_config("config.toml")
+        self.config = self.config_manager.load_config(self.name, "config.toml")
 
-        quote_service = QuoteService(
-            **await self.quote_service_kwargs_from_config()
-        )
-        self.app.register_service(f"{self.name}:quote_service", QuoteService)
+        quote_service = await self.create_quote_service(self.config)
+        self.app.register_service(f"{self.name}:quote_service", quote_service)
 
+        self.middleware = QuoteMiddleware(
+            quote_service=quote_service,
+            message_skipper=self.app.get_service("skip_updates:messages_update_skipper")
+        )
         self.app.add_router_middleware(
             router,
-            QuoteMiddleware(
-                quote_service=quote_service,
-                message_skipper=self.app.get_service("skip_updates:messages_update_skipper")
-            ),
+            self.middleware,
             update_types=["message"]
         )
         self.app.include_router(router)
 
-    async def load_config(self, conf_file_path: str):
-        with open(self.config_path / conf_file_path, "rb") as file:
-            return tomllib.load(file)
+        self.config_manager.watch(self.name, "config.toml", self.apply_config)
+
+    async def apply_config(self, config: dict):
+        """
+        Пересоздаёт сервис с новыми фонами и шрифтами и подменяет его в middleware
+        """
+        quote_service = await self.create_quote_service(config)
+        self.config = config
+        self.middleware.quote_service = quote_service
+        self.app.register_service(f"{self.name}:quote_service", quote_service)
+
+    async def create_quote_service(self, config: dict) -> QuoteService:
+        # Загрузка фонов выполняется в потоке, чтобы не блокировать
+        # параллельную загрузку других плагинов и обработку апдейтов
+        return await asyncio.to_thread(
+            QuoteService,
+            **self.quote_service_kwargs_from_config(config)
+        )
 
-    async def quote_service_kwargs_from_config(self):
+    def quote_service_kwargs_from_config(self, config: dict):
         src_path = self.config_path / "src"
 
-        backgrounds_config = self.config.get("backgrounds")
+        backgrounds_config = config.get("backgrounds")
         if backgrounds_config is None:
             raise ValueError("Backgrounds dir configuration is missing in quotes plugin configuration")
-        font_config = self.config.get("font")
+        font_config = config.get("font")
         if font_config is None:
             raise ValueError("Font configuration is missing in quotes plugin configuration")
 
@@ -72,7 +86,7 @@ class QuotesPlugin(Plugin):
 
         backgrounds = list(backgrounds)[:bg_limit]
 
-        datetime_config = self.config.get("datetime")
+        datetime_config = config.get("datetime")
         timezone_name = ""
         strftime = ""
         if datetime_config:
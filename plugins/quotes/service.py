@@ -4,9 +4,11 @@ import textwrap
 from datetime import datetime, date, timezone
 from pathlib import Path
 from zoneinfo import ZoneInfo
-from typing import List
+from typing import TYPE_CHECKING, List
 
-from PIL import Image, ImageDraw, ImageOps, ImageFont
+if TYPE_CHECKING:
+    # Pillow импортируется при первой работе с изображениями, а не при загрузке плагина
+    from PIL import Image, ImageFont, ImageDraw
 
 
 class QuoteService:
@@ -44,8 +46,10 @@ class QuoteService:
         self.font_size_text = 24
         self.font_size_metadata = 18
 
-    def load_backgrounds(self, bg_path_list: List[Path]) -> list[Image.Image]:
+    def load_backgrounds(self, bg_path_list: List[Path]) -> list["Image.Image"]:
         """Загружает все доступные фоны из заданной директории в оперативную память"""
+        from PIL import Image
+
         if not bg_path_list:
             raise ValueError("No background paths provided to load.")
 
@@ -67,7 +71,7 @@ class QuoteService:
                 raise RuntimeError(f"Ошибка при загрузке или обработке фона {bg_path}: {e}")
         return loaded_images
 
-    async def get_next_background(self) -> Image.Image:
+    async def get_next_background(self) -> "Image.Image":
         """Возвращает следующий фон из списка"""
         if not self.backgrounds:
             raise ValueError("No backgrounds available in QuoteService.")
@@ -81,13 +85,15 @@ class QuoteService:
 
     def create_quote_image(
         self,
-        bg_image: Image.Image,
+        bg_image: "Image.Image",
         avatar_bytes: bytes,
         username: str,
         text: str,
         message_datetime: datetime
     ) -> io.BytesIO:
         """Генерирует изображение с цитатой"""
+        from PIL import ImageDraw, ImageFont
+
         draw = ImageDraw.Draw(bg_image)
 
         # 2. Шрифты
@@ -131,7 +137,7 @@ class QuoteService:
         text_x = avatar_x + self.avatar_size + self.margin * 1.5
         max_width = self.text_area_width
 
-        def wrap_text_by_width(text: str, font: ImageFont.FreeTypeFont, draw: ImageDraw.ImageDraw, max_w: int):
+        def wrap_text_by_width(text: str, font: "ImageFont.FreeTypeFont", draw: "ImageDraw.ImageDraw", max_w: int):
             paragraphs = text.splitlines()
             lines: list[str] = []
 
@@ -207,8 +213,10 @@ class QuoteService:
         output.seek(0)
         return output
 
-    def prepare_avatar(self, image_bytes: bytes) -> Image.Image:
+    def prepare_avatar(self, image_bytes: bytes) -> "Image.Image":
         """Подгатавливает аватарку, превращая в требуемый формат"""
+        from PIL import Image, ImageDraw, ImageOps
+
         im = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
 
         im = im.resize((self.avatar_size, self.avatar_size), Image.Resampling.LANCZOS)
@@ -21,9 +21,9 @@ class Form(StatesGroup):
     confirmed = State()
 
 @router.message(F.text.regexp(r"(?i)^!взять рест$"), F.chat.type.in_({"group", "supergroup"}))
-async def rest_handler(message: Message, state: FSMContext, uow_factory: UnitOfWork, app_tzinfo: tzinfo):
+async def rest_handler(message: Message, state: FSMContext, ro_uow_factory: UnitOfWork, app_tzinfo: tzinfo):
     rests = await get_current_rests(
-        uow_factory=uow_factory,
+        uow_factory=ro_uow_factory,
         tg_user_id=message.from_user.id,
         tg_chat_id=message.chat.id,
         from_date=datetime.now(tz=timezone.utc).date(),
@@ -52,7 +52,7 @@ async def rest_handler(message: Message, state: FSMContext, uow_factory: UnitOfW
 async def active_making_rest_callback_handler(
     callback: CallbackQuery,
     state: FSMContext,
-    uow_factory: UnitOfWork,
+    ro_uow_factory: UnitOfWork,
     app_tzinfo: tzinfo
 ):
     """Обработка выбора вариантов оформления реста"""
@@ -77,7 +77,7 @@ async def active_making_rest_callback_handler(
         await state.update_data(new_rest=new_rest)
 
         rests = await get_current_rests(
-            uow_factory=uow_factory,
+            uow_factory=ro_uow_factory,
             tg_user_id=new_rest["user_id"],
             tg_chat_id=new_rest["chat_id"],
             from_date=datetime.now(tz=timezone.utc).date(),
@@ -162,7 +162,7 @@ async def confirm_rest(callback: CallbackQuery, state: FSMContext, uow_factory:
     await state.clear()
 
 @router.callback_query(F.data == "rest:start", Form.taking_rest)
-async def restart_keyboard(callback: CallbackQuery, state: FSMContext, uow_factory: UnitOfWork, app_tzinfo: tzinfo):
+async def restart_keyboard(callback: CallbackQuery, state: FSMContext, ro_uow_factory: UnitOfWork, app_tzinfo: tzinfo):
     """Возврат к первой клавиатуре оформления реста"""
     data = await state.get_data()
     rest = dict(data.get("new_rest", {}))
@@ -171,7 +171,7 @@ async def restart_keyboard(callback: CallbackQuery, state: FSMContext, uow_facto
         return
 
     rests = await get_current_rests(
-        uow_factory=uow_factory,
+        uow_factory=ro_uow_factory,
         tg_user_id=rest["user_id"],
         tg_chat_id=rest["chat_id"],
         from_date=datetime.now(tz=timezone.utc).date(),
@@ -208,29 +208,35 @@ async def remove_keyboard(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("🟡 Получить более продолжительный рест можно по уважительной причине, уточнив у администрации напрямую.")
 
 @router.message(F.text.regexp(r"(?i)^!выдать рест (\d+) (\d+)$"), F.chat.type.in_({"group", "supergroup"}))
-async def admin_give_rest_handler(message: Message, state: FSMContext, uow_factory: UnitOfWork, app_tzinfo: tzinfo):
+async def admin_give_rest_handler(
+    message: Message,
+    state: FSMContext,
+    uow_factory: UnitOfWork,
+    ro_uow_factory: UnitOfWork,
+    app_tzinfo: tzinfo
+):
     if message.reply_to_message is None:
         await message.answer("❌ Команду необходимо использовать в ответ на сообщение пользователя, которому вы хотите выдать рест.")
         return
     rest_chat_member_tg_id = message.reply_to_message.from_user.id
     rest_giver_tg_id = message.from_user.id
 
-    async with uow_factory() as uow:
+    async with ro_uow_factory() as uow:
         chat_member_service = ChatMemberServiceFactory(uow.session).create()
-        rest_chat_member = await chat_member_service.get_by_user_and_chat_tg_ids(
-            user_tg_id=rest_chat_member_tg_id,
-            chat_tg_id=message.chat.id
-        )
-        rest_giver_chat_member = await chat_member_service.get_by_user_and_chat_tg_ids(
-            user_tg_id=rest_giver_tg_id,
-            chat_tg_id=message.chat.id
-        )
+        chat_members = await chat_member_service.get_many_by_user_and_chat_tg_ids([
+            (rest_chat_member_tg_id, message.chat.id),
+            (rest_giver_tg_id, message.chat.id)
+        ])
+        rest_chat_member = chat_members.get((rest_chat_member_tg_id, message.chat.id))
+        rest_giver_chat_member = chat_members.get((rest_giver_tg_id, message.chat.id))
         if rest_chat_member is None:
             await message.answer("❌ Пользователь не является участником этого чата.")
             return
 
-        rest_giver_chat_member_role = await chat_member_service.get_role(rest_giver_chat_member.id)
-        if rest_giver_chat_member_role.level < 6: # TODO: Создать разрешение на выдачу рестов и проверять через сервис
+        rest_giver_chat_member_role = None
+        if rest_giver_chat_member is not None:
+            rest_giver_chat_member_role = await chat_member_service.get_member_role(rest_giver_chat_member)
+        if rest_giver_chat_member_role is None or rest_giver_chat_member_role.level < 6: # TODO: Создать разрешение на выдачу рестов и проверять через сервис
             await message.answer("❌ У вас недостаточно прав для выдачи рестов.")
             return
 
@@ -255,9 +261,8 @@ async def admin_give_rest_handler(message: Message, state: FSMContext, uow_facto
         rest_service = ChatMemberRestServiceFactory(uow.session).create()
 
         for i in range(2):
-            await rest_service.put(
-                tg_user_id=rest_chat_member_tg_id,
-                tg_chat_id=message.chat.id,
+            await rest_service.put_by_chat_member_id(
+                chat_member_id=rest_chat_member.id,
                 state="blocked" if i else "active",
                 starts_at=rest.starts_at + timedelta(weeks=duration_weeks * i),
                 ends_at=rest.ends_at + timedelta(weeks=duration_weeks * i),
@@ -276,17 +281,16 @@ async def admin_give_rest_handler(message: Message, state: FSMContext, uow_facto
     )
 
 @router.message(F.text.regexp(r"(?i)^рестлист( все| вся)$"), F.chat.type.in_({"group", "supergroup"}))
-async def rest_list_handler(message: Message, app_tzinfo: tzinfo, uow_factory: UnitOfWork):
+async def rest_list_handler(message: Message, app_tzinfo: tzinfo, ro_uow_factory: UnitOfWork):
     """Обработчик команды !рестлист все|вся"""
     match = re.match(r"(?i)^рестлист (все|вся)$", message.text)
     if not match:
         return
 
-    async with uow_factory() as uow:
+    async with ro_uow_factory() as uow:
         rest_service = ChatMemberRestServiceFactory(uow.session).create()
-        chat_member_service = ChatMemberServiceFactory(uow.session).create()
 
-        rests = await rest_service.list(
+        rests = await rest_service.list_with_users(
             chat_id=message.chat.id,
             from_date=datetime.now(tz=app_tzinfo).date(),
             states=["active"]
@@ -298,18 +302,13 @@ async def rest_list_handler(message: Message, app_tzinfo: tzinfo, uow_factory: U
 
         response_lines = ["🗒️ <b>Список всех активных рестов в этом чате:</b>"]
         for rest in rests:
-            chat_member = await chat_member_service.get(rest.chat_member_id)
-            user = await chat_member_service.get_user(chat_member)
+            user = rest.chat_member.user
             if user is None:
-                print("WARNING: User not found for chat member ID", chat_member.id)
-                continue
-            chat = await chat_member_service.get_chat(chat_member)
-            if chat is None or chat.tg_id != message.chat.id:
-
+                print("WARNING: User not found for chat member ID", rest.chat_member_id)
                 continue
             user_link = await get_user_link(
                 user_id=user.tg_id,
-                chat_id=chat.tg_id,
+                chat_id=message.chat.id,
                 bot=message.bot
             )
             starts_at = rest.starts_at.astimezone(app_tzinfo).date()
@@ -321,17 +320,16 @@ async def rest_list_handler(message: Message, app_tzinfo: tzinfo, uow_factory: U
     await message.answer("\n".join(response_lines), parse_mode="HTML", disable_web_page_preview=True)
 
 @router.message(F.text.regexp(r"(?i)^рестлист( неделя| недели)?$"), F.chat.type.in_({"group", "supergroup"}))
-async def rest_list_week_handler(message: Message, app_tzinfo: tzinfo, uow_factory: UnitOfWork):
+async def rest_list_week_handler(message: Message, app_tzinfo: tzinfo, ro_uow_factory: UnitOfWork):
     """Обработчик команды !рестлист неделя|недели"""
     match = re.match(r"(?i)^рестлист( неделя|недели)?$", message.text)
     if not match:
         return
 
-    async with uow_factory() as uow:
+    async with ro_uow_factory() as uow:
         rest_service = ChatMemberRestServiceFactory(uow.session).create()
-        chat_member_service = ChatMemberServiceFactory(uow.session).create()
 
-        rests = await rest_service.list(
+        rests = await rest_service.list_with_users(
             chat_id=message.chat.id,
             from_date=datetime.now(tz=app_tzinfo).date(),
             to_date=(datetime.now(tz=app_tzinfo) + timedelta(weeks=1)).date(),
@@ -344,17 +342,13 @@ async def rest_list_week_handler(message: Message, app_tzinfo: tzinfo, uow_facto
 
         response_lines = ["🗒️ <b>Список рестов на эту неделю в этом чате:</b>"]
         for rest in rests:
-            chat_member = await chat_member_service.get(rest.chat_member_id)
-            user = await chat_member_service.get_user(chat_member)
+            user = rest.chat_member.user
             if user is None:
-                print("WARNING: User not found for chat member ID", chat_member.id)
-                continue
-            chat = await chat_member_service.get_chat(chat_member)
-            if chat is None or chat.tg_id != message.chat.id:
+                print("WARNING: User not found for chat member ID", rest.chat_member_id)
                 continue
             user_link = await get_user_link(
                 user_id=user.tg_id,
-                chat_id=chat.tg_id,
+                chat_id=message.chat.id,
                 bot=message.bot
             )
             response_lines.append(
@@ -364,13 +358,13 @@ async def rest_list_week_handler(message: Message, app_tzinfo: tzinfo, uow_facto
     await message.answer("\n".join(response_lines), parse_mode="HTML", disable_web_page_preview=True)
 
 @router.message(F.text.regexp(r"(?i)^(.)?(мои )?ресты$"), F.chat.type.in_({"group", "supergroup"}))
-async def my_rests_handler(message: Message, app_tzinfo: tzinfo, uow_factory: UnitOfWork):
+async def my_rests_handler(message: Message, app_tzinfo: tzinfo, ro_uow_factory: UnitOfWork):
     """Обработчик команды мои ресты|ресты"""
     match = re.match(r"(?i)^(.)?(мои )?ресты$", message.text)
     if not match:
         return
 
-    async with uow_factory() as uow:
+    async with ro_uow_factory() as uow:
         rest_service = ChatMemberRestServiceFactory(uow.session).create()
 
         rests = await rest_service.get_by_tg_ids(
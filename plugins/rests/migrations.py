@@ -0,0 +1,9 @@
+from plugins.db_manager import Migration, create_indexes, model_index
+
+from .models.rest import ChatMemberRest
+
+MIGRATIONS = [
+    Migration(1, "index chat_member_rests by chat member and end date", create_indexes(
+        model_index(ChatMemberRest, "ix_chat_member_rests_chat_member_id_ends_at")
+    )),
+]
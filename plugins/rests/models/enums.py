@@ -1,15 +1,7 @@
 import enum
 import enum
 
-from sqlalchemy import Enum as SAEnum
-
-def Enum(enum_cls, name: str):
-    return SAEnum(
-        enum_cls,
-        name=name,
-        values_callable=lambda cls: [e.value for e in cls],
-        native_enum=True
-    )
+from plugins.db_manager import ValueEnum as Enum
 
 class RestStateEnum(enum.Enum):
     BLOCKED = "blocked"
@@ -1,16 +1,20 @@
-from sqlalchemy import Column, BigInteger, DateTime, Boolean, Identity, ForeignKey, func
+from sqlalchemy import Column, BigInteger, DateTime, Boolean, Identity, ForeignKey, Index, false, func
 from sqlalchemy.orm import relationship
 
 from .enums import RestStateEnum, Enum
-from plugins.db_manager import Base
+from plugins.db_manager import Base, BigIntegerPK
 
 class ChatMemberRest(Base):
     __tablename__ = "chat_member_rests"
-    id = Column(BigInteger, Identity(start=1, cycle=False), primary_key=True, nullable=False)
+    id = Column(BigIntegerPK, Identity(start=1, cycle=False), primary_key=True, nullable=False)
     chat_member_id = Column(BigInteger, ForeignKey("chat_members.id"), nullable=False)
     state = Column(Enum(RestStateEnum, name="rest_state_enum"), nullable=False)
     starts_at = Column(DateTime(timezone=True), nullable=False)
     ends_at = Column(DateTime(timezone=True), nullable=False)
-    revoked = Column(Boolean, nullable=False, default=False, server_default="false")
+    revoked = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    chat_member = relationship("ChatMember")
+
+    __table_args__ = (Index("ix_chat_member_rests_chat_member_id_ends_at", "chat_member_id", "ends_at"),)
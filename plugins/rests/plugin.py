@@ -1,5 +1,6 @@
 from zuki.plugin import Plugin
 
+from .migrations import MIGRATIONS
 from .router import router
 from .middlewares.middleware import RestMiddleware
 
@@ -9,13 +10,11 @@ class RestsPlugin(Plugin):
     requires = ["db_manager", "telegram_info_collect", "skip_updates"]
 
     async def on_load(self):
-        uow_factory = self.app.get_service("db_manager:uow_factory")
-
+        self.app.get_service("db_manager:migrations").register(self.name, MIGRATIONS)
         self.app.include_router(router)
         self.app.add_router_middleware(
             router,
             RestMiddleware(
-                uow_factory=uow_factory,
                 app_tzinfo=self.app.timezone,
                 message_skipper=self.app.get_service("skip_updates:messages_update_skipper")
             ),
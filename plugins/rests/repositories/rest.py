@@ -1,30 +1,97 @@
-from typing import List, Optional
-from datetime import datetime, date
+from typing import List, Optional, Sequence
+from datetime import datetime, date, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
+from sqlalchemy.orm.interfaces import ORMOption
+from plugins.db_manager import read_only
+from plugins.telegram_info_collect.models.chat import Chat
+from plugins.telegram_info_collect.models.chat_member import ChatMember
+from plugins.telegram_info_collect.models.user import User
 from ..models.rest import ChatMemberRest, RestStateEnum
 
 class ChatMemberRestRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, rest_id: int) -> Optional[ChatMemberRest]:
         result = await self.session.execute(
             select(ChatMemberRest).where(ChatMemberRest.id == rest_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_chat_member_id(
         self,
         chat_member_id: int,
         states: List[str] = [],
         from_date: Optional[date] = None,
         to_date: Optional[date] = None,
+        options: Sequence[ORMOption] = (),
     ) -> List[ChatMemberRest]:
         query = select(ChatMemberRest).where(
             ChatMemberRest.chat_member_id == chat_member_id
+        ).options(*options)
+        result = await self.session.execute(self._filter(query, states, from_date, to_date))
+        return result.scalars().unique().all()
+
+    @read_only
+    async def get_by_tg_ids(
+        self,
+        tg_user_id: int,
+        tg_chat_id: int,
+        states: List[str] = [],
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        options: Sequence[ORMOption] = (),
+    ) -> List[ChatMemberRest]:
+        """
+        Ресты участника по tg_id пользователя и чата одним запросом.
+        Неизвестный участник даёт пустой список
+        """
+        query = (
+            select(ChatMemberRest)
+            .join(ChatMember, ChatMember.id == ChatMemberRest.chat_member_id)
+            .join(User, User.id == ChatMember.user_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(User.tg_id == tg_user_id, Chat.tg_id == tg_chat_id)
+            .options(*options)
         )
+        result = await self.session.execute(self._filter(query, states, from_date, to_date))
+        return result.scalars().unique().all()
 
+    @read_only
+    async def list_by_chat_tg_id(
+        self,
+        tg_chat_id: int,
+        states: List[str] = [],
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        options: Sequence[ORMOption] = (),
+    ) -> List[ChatMemberRest]:
+        """
+        Ресты чата, которые не закончились до from_date и начинаются не позже to_date
+        """
+        query = (
+            select(ChatMemberRest)
+            .join(ChatMember, ChatMember.id == ChatMemberRest.chat_member_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(Chat.tg_id == tg_chat_id)
+            .order_by(ChatMemberRest.id)
+            .options(*options)
+        )
+        if states:
+            query = query.where(ChatMemberRest.state.in_(states))
+        if from_date:
+            query = query.where(ChatMemberRest.ends_at >= from_date)
+        if to_date:
+            query = query.where(ChatMemberRest.starts_at < to_date + timedelta(days=1))
+
+        result = await self.session.execute(query)
+        return result.scalars().unique().all()
+
+    @staticmethod
+    def _filter(query, states: List[str], from_date: Optional[date], to_date: Optional[date]):
         if states:
             query = query.where(ChatMemberRest.state.in_(states))
 
@@ -35,13 +102,12 @@ class ChatMemberRestRepository:
             date_conditions.append(ChatMemberRest.starts_at <= to_date)
         if date_conditions:
             query = query.where(or_(*date_conditions))
+        return query
 
-        result = await self.session.execute(query)
-        return result.scalars().all()
-
-    async def list(self) -> List[ChatMemberRest]:
-        result = await self.session.execute(select(ChatMemberRest))
-        return result.scalars().all()
+    @read_only
+    async def list(self, options: Sequence[ORMOption] = ()) -> List[ChatMemberRest]:
+        result = await self.session.execute(select(ChatMemberRest).options(*options))
+        return result.scalars().unique().all()
 
     async def add(
         self,
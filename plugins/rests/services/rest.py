@@ -1,5 +1,9 @@
 from typing import List, Optional
 from datetime import date
+
+from sqlalchemy.orm import joinedload
+
+from plugins.telegram_info_collect.models.chat_member import ChatMember
 from ..models.rest import ChatMemberRest
 from ..models.enums import RestStateEnum
 from ..repositories.rest import ChatMemberRestRepository
@@ -28,12 +32,13 @@ class ChatMemberRestsService:
         from_date: Optional[date] = None,
         to_date: Optional[date] = None,
     ) -> List[ChatMemberRest]:
-        chat_member = await self.chat_member_service.get_by_user_and_chat_tg_ids(tg_user_id, tg_chat_id)
-        if not chat_member:
-            return None
-
-        return await self.rests_repo.get_by_chat_member_id(
-            chat_member_id=chat_member.id,
+        """
+        Ресты участника по tg_id пользователя и чата.
+        Для участника, которого нет в базе, — пустой список, а не None
+        """
+        return await self.rests_repo.get_by_tg_ids(
+            tg_user_id=tg_user_id,
+            tg_chat_id=tg_chat_id,
             states=states,
             from_date=from_date,
             to_date=to_date,
@@ -46,21 +51,33 @@ class ChatMemberRestsService:
         from_date: Optional[date] = None,
         to_date: Optional[date] = None,
     ) -> List[ChatMemberRest]:
-        raw_result = await self.rests_repo.list()
-        result = []
-        for rest in raw_result:
-            chat_member = await self.chat_member_service.get(rest.chat_member_id)
-            chat = await self.chat_member_service.get_chat(chat_member)
-            if chat.tg_id != chat_id:
-                continue
-            if states and rest.state.value not in states:
-                continue
-            if from_date and rest.ends_at.date() < from_date:
-                continue
-            if to_date and rest.starts_at.date() > to_date:
-                continue
-            result.append(rest)
-        return result
+        """
+        Ресты чата по его tg_id, отбор выполняется в базе
+        """
+        return await self.rests_repo.list_by_chat_tg_id(
+            tg_chat_id=chat_id,
+            states=states,
+            from_date=from_date,
+            to_date=to_date,
+        )
+
+    async def list_with_users(
+        self,
+        chat_id: int,
+        states: List[str] = [],
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+    ) -> List[ChatMemberRest]:
+        """
+        То же с загруженными rest.chat_member.user одним запросом
+        """
+        return await self.rests_repo.list_by_chat_tg_id(
+            tg_chat_id=chat_id,
+            states=states,
+            from_date=from_date,
+            to_date=to_date,
+            options=[joinedload(ChatMemberRest.chat_member).joinedload(ChatMember.user)],
+        )
 
     async def put(
         self,
@@ -78,7 +95,7 @@ class ChatMemberRestsService:
         if not chat_member:
             return None
 
-        return await self.rests_repo.add(
+        return await self.put_by_chat_member_id(
             chat_member_id=chat_member.id,
             state=state,
             starts_at=starts_at,
@@ -86,6 +103,25 @@ class ChatMemberRestsService:
             revoked=revoked,
         )
 
+    async def put_by_chat_member_id(
+        self,
+        chat_member_id: int,
+        state: RestStateEnum,
+        starts_at: date,
+        ends_at: date,
+        revoked: bool = False,
+    ) -> ChatMemberRest:
+        """
+        Создать период отдыха для уже найденного участника
+        """
+        return await self.rests_repo.add(
+            chat_member_id=chat_member_id,
+            state=state,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            revoked=revoked,
+        )
+
     async def delete(self, rest: ChatMemberRest) -> None:
         await self.rests_repo.delete(rest)
 
@@ -1,5 +1,3 @@
-import tomllib
-
 from zuki.plugin import Plugin
 
 from .updates.skip_messages import MessagesUpdateSkipper
@@ -12,18 +10,23 @@ class SkipUpdatesPlugin(Plugin):
     async def on_load(self):
         self.config_manager.ensure_plugin_configs(self)
         self.config_path = self.config_manager.get_plugin_config_path(self.name)
-        self.config = await self.skippers_settings_from_config()
+        self.config = self.config_manager.load_config(
+            self.name, "config.toml", self.skippers_settings_from_config
+        )
 
-        message_skipper = MessagesUpdateSkipper(skip_interval_seconds=self.config["message"])
-        self.app.register_service(f"{self.name}:messages_update_skipper", message_skipper)
+        self.message_skipper = MessagesUpdateSkipper(skip_interval_seconds=self.config["message"])
+        self.app.register_service(f"{self.name}:messages_update_skipper", self.message_skipper)
 
-    async def load_config(self, conf_file_path: str):
-        with open(self.config_path / conf_file_path, "rb") as file:
-            return tomllib.load(file)
+        self.config_manager.watch(
+            self.name, "config.toml", self.apply_config, self.skippers_settings_from_config
+        )
 
-    async def skippers_settings_from_config(self):
-        config = await self.load_config("config.toml")
+    def apply_config(self, config: dict):
+        self.config = config
+        self.message_skipper.skip_interval = config["message"]
 
+    @staticmethod
+    def skippers_settings_from_config(config: dict) -> dict:
         message_skip_interval_seconds = config.get("message", 30)
 
         return {
@@ -0,0 +1,10 @@
+class TelegramChatMemberMapper:
+    # Статусы Telegram, которые хранятся под другим именем
+    STATUSES = {
+        "kicked": "banned",
+        "restricted": "resticted",
+    }
+
+    @staticmethod
+    def to_internal_status(status: str) -> str:
+        return TelegramChatMemberMapper.STATUSES.get(status, status)
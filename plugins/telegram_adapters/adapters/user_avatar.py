@@ -1,6 +1,5 @@
 import io
 from typing import Optional
-from PIL import Image
 from aiogram import Bot
 from aiogram.types import Message
 
@@ -18,6 +17,9 @@ async def fetch_last_avatar(user_id: int, bot: Bot) -> Optional[bytes]:
             await bot.download_file(file_info.file_path, avatar_io)
             avatar_bytes = avatar_io.getvalue()
         else:
+            # Pillow импортируется только при первом обращении
+            from PIL import Image
+
             with Image.open("src/img/photo_img_default.png") as img:
                 b_io = io.BytesIO()
                 img.save(b_io, format="PNG")
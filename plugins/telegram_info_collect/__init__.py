@@ -1,2 +1,3 @@
 from . import models
-from .plugin import UserInfo
\ No newline at end of file
+from .plugin import UserInfo
+from . import handler
\ No newline at end of file
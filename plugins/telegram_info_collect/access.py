@@ -0,0 +1,174 @@
+import asyncio
+import time
+from types import MappingProxyType
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .repositories.chat_member import ChatMemberPermissionRepository, ChatMemberRoleRepository
+
+
+class RoleRecord:
+    """
+    Неизменяемая копия строки chat_member_roles
+    """
+    __slots__ = ("id", "name", "level")
+
+    def __init__(self, id: int, name: str, level: int):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "level", level)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"RoleRecord(id={self.id}, name={self.name!r}, level={self.level})"
+
+
+class PermissionRecord:
+    """
+    Неизменяемая копия строки chat_member_permissions
+    """
+    __slots__ = ("id", "category", "name", "level")
+
+    def __init__(self, id: int, category: str, name: str, level: int):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "category", category)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "level", level)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"PermissionRecord(category={self.category!r}, name={self.name!r}, level={self.level})"
+
+
+class AccessSnapshot:
+    """
+    Роли и разрешения на момент загрузки. Уровни разрешений собраны
+    в матрицу (категория, имя) -> уровень, а разрешения каждой роли
+    посчитаны заранее, так что проверки прав не обращаются к базе
+    """
+    def __init__(self, roles: Iterable[RoleRecord], permissions: Iterable[PermissionRecord]):
+        roles = sorted(roles, key=lambda role: role.level)
+        permissions = sorted(permissions, key=lambda permission: (permission.level, permission.category, permission.name))
+
+        self.roles: Tuple[RoleRecord, ...] = tuple(roles)
+        self.permissions: Tuple[PermissionRecord, ...] = tuple(permissions)
+        self._roles_by_id = MappingProxyType({role.id: role for role in roles})
+        self._roles_by_name = MappingProxyType({role.name: role for role in roles})
+        self._permissions_by_id = MappingProxyType({permission.id: permission for permission in permissions})
+        self._permissions_by_key = MappingProxyType({
+            (permission.category, permission.name): permission
+            for permission in permissions
+        })
+        self.levels = MappingProxyType({key: permission.level for key, permission in self._permissions_by_key.items()})
+        self._role_permissions = MappingProxyType({
+            role.id: tuple(permission for permission in permissions if role.level >= permission.level)
+            for role in roles
+        })
+
+    def role(self, role_id: int) -> Optional[RoleRecord]:
+        return self._roles_by_id.get(role_id)
+
+    def role_by_name(self, name: str) -> Optional[RoleRecord]:
+        return self._roles_by_name.get(name)
+
+    def permission(self, permission_id: int) -> Optional[PermissionRecord]:
+        return self._permissions_by_id.get(permission_id)
+
+    def permission_by_name(self, category: str, name: str) -> Optional[PermissionRecord]:
+        return self._permissions_by_key.get((category, name))
+
+    def is_allowed(self, role_id: int, category: str, name: str) -> bool:
+        """
+        Есть ли у роли разрешение. Неизвестные роль или разрешение — запрет
+        """
+        role = self._roles_by_id.get(role_id)
+        level = self.levels.get((category, name))
+        if role is None or level is None:
+            return False
+        return role.level >= level
+
+    def role_permissions(self, role_id: int) -> Tuple[PermissionRecord, ...]:
+        return self._role_permissions.get(role_id, ())
+
+
+class AccessCache:
+    """
+    Общий для процесса снимок ролей и разрешений. Загружается при старте плагина
+    и перечитывается после записи через сервисы ролей и разрешений.
+    invalidate() действует только в своём процессе, поэтому снимок
+    перечитывается и по возрасту: изменения из других воркеров
+    становятся видны не позже чем через max_age секунд
+    """
+    def __init__(self, max_age: Optional[float] = 60):
+        self.snapshot: Optional[AccessSnapshot] = None
+        self.max_age = max_age
+        self._stale = True
+        self._loaded_at = 0.0
+        # Номер инвалидации: снимок, загрузка которого началась до invalidate(),
+        # не считается свежим
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: AsyncSession) -> AccessSnapshot:
+        """
+        Текущий снимок, при необходимости перечитанный через session.
+        Одновременные запросы ждут одной загрузки
+        """
+        if self._needs_refresh():
+            async with self._lock:
+                if self._needs_refresh():
+                    await self._load(session)
+        return self.snapshot
+
+    async def refresh(self, session: AsyncSession) -> AccessSnapshot:
+        async with self._lock:
+            return await self._load(session)
+
+    async def _load(self, session: AsyncSession) -> AccessSnapshot:
+        # Снимок и время загрузки меняются только после успешного чтения,
+        # при ошибке прежний снимок остаётся устаревшим
+        generation = self._generation
+        started_at = time.monotonic()
+        roles = await ChatMemberRoleRepository(session).list()
+        permissions = await ChatMemberPermissionRepository(session).list()
+        self.snapshot = AccessSnapshot(
+            (RoleRecord(role.id, role.name, role.level) for role in roles),
+            (
+                PermissionRecord(permission.id, permission.category, permission.name, permission.level)
+                for permission in permissions
+            )
+        )
+        self._loaded_at = started_at
+        self._stale = generation != self._generation
+        return self.snapshot
+
+    def invalidate(self, session: Optional[AsyncSession] = None):
+        """
+        Отмечает снимок устаревшим. С session — ещё раз после её commit,
+        чтобы снимок, перечитанный другой сессией до commit, не пережил его
+        """
+        self._mark_stale()
+        if session is not None:
+            event.listen(session.sync_session, "after_commit", self._on_commit, once=True)
+
+    def _on_commit(self, session):
+        self._mark_stale()
+
+    def _mark_stale(self):
+        self._stale = True
+        self._generation += 1
+
+    def _needs_refresh(self) -> bool:
+        return self._stale or self.snapshot is None or self._expired()
+
+    def _expired(self) -> bool:
+        return self.max_age is not None and time.monotonic() - self._loaded_at > self.max_age
+
+
+access_cache = AccessCache()
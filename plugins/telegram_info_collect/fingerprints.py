@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from zuki.metrics import MetricsRegistry
+
+
+class FingerprintCache:
+    """
+    Отпечатки последних записанных в базу версий строк.
+    Совпадающий свежий отпечаток значит, что запись в базу ничего не изменит.
+    Отпечаток устаревает через ttl секунд, чтобы строка время от времени
+    перезаписывалась и расхождения с базой не жили вечно
+    """
+    def __init__(self, *, ttl: float = 3600, max_size: int = 100000, metrics: Optional[MetricsRegistry] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, float]]" = OrderedDict()
+
+        metrics = metrics or MetricsRegistry()
+        self._requests = metrics.counter(
+            "telegram_info_collect_fingerprint_requests_total",
+            "Fingerprint cache lookups by result",
+            ("table", "result")
+        )
+        self._size = metrics.gauge("telegram_info_collect_fingerprint_entries", "Cached row fingerprints")
+
+    @staticmethod
+    def fingerprint(values: tuple) -> int:
+        return hash(values)
+
+    def is_fresh(self, table: str, key: Hashable, fingerprint: int) -> bool:
+        """
+        True, если в базе уже лежит эта версия строки и она записана недавно
+        """
+        entry = self._entries.get((table, key))
+        if entry is None:
+            self._requests.inc(table=table, result="miss")
+            return False
+
+        stored, stored_at = entry
+        if stored_at + self.ttl <= time.monotonic():
+            del self._entries[(table, key)]
+            self._size.set(len(self._entries))
+            self._requests.inc(table=table, result="expired")
+            return False
+        if stored != fingerprint:
+            self._requests.inc(table=table, result="changed")
+            return False
+
+        self._entries.move_to_end((table, key))
+        self._requests.inc(table=table, result="hit")
+        return True
+
+    def store(self, table: str, key: Hashable, fingerprint: int):
+        self._entries[(table, key)] = (fingerprint, time.monotonic())
+        self._entries.move_to_end((table, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._size.set(len(self._entries))
+
+    def forget(self, table: str, key: Hashable):
+        self._entries.pop((table, key), None)
+        self._size.set(len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        self._size.set(0)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Число обращений по результатам и доля попаданий по таблицам
+        """
+        stats: Dict[str, Dict[str, float]] = {}
+        for (table, result), value in self._requests.values.items():
+            stats.setdefault(table, {})[result] = value
+        for table_stats in stats.values():
+            total = sum(table_stats.values())
+            table_stats["hit_rate"] = table_stats.get("hit", 0) / total if total else 0.0
+        return stats
@@ -0,0 +1,47 @@
+from aiogram.types import ChatMemberUpdated
+
+from plugins.db_manager import UnitOfWork
+from plugins.telegram_adapters.adapters.chat_member_mapper import TelegramChatMemberMapper
+
+from .factories.chat_member import ChatMemberServiceFactory
+from .ingest import IngestQueue
+from .router import router
+
+OWNER_ROLE_ID = 5
+DEFAULT_ROLE_ID = 0
+
+@router.chat_member()
+@router.my_chat_member()
+async def chat_member_updated_handler(event: ChatMemberUpdated, uow_factory: UnitOfWork, ingest: IngestQueue):
+    """
+    Применяет изменение статуса и звания участника чата
+    """
+    tg_chat_member = event.new_chat_member
+    tg_user = tg_chat_member.user
+
+    # Владелец получает роль владельца, бывший владелец теряет её
+    role_id = None
+    if tg_chat_member.status == "creator":
+        role_id = OWNER_ROLE_ID
+    elif event.old_chat_member.status == "creator":
+        role_id = DEFAULT_ROLE_ID
+
+    # Записи пользователя и чата нужны до записи участника
+    ingest.add_user(tg_user)
+    ingest.add_chat(event.chat)
+    await ingest.flush()
+
+    async with uow_factory() as uow:
+        chat_member_service = ChatMemberServiceFactory(uow.session).create()
+        await chat_member_service.put(
+            user_tg_id=tg_user.id,
+            chat_tg_id=event.chat.id,
+            status=TelegramChatMemberMapper.to_internal_status(tg_chat_member.status),
+            title=getattr(tg_chat_member, "custom_title", None),
+            role_id=role_id
+        )
+
+        if tg_chat_member.status in ("left", "kicked"):
+            ingest.forget_member(event.chat.id, tg_user.id)
+        else:
+            uow.after_commit(lambda: ingest.remember_member(event.chat.id, tg_user.id))
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.types import Chat as TelegramChat, User as TelegramUser
+
+from plugins.db_manager import UnitOfWork
+from plugins.telegram_adapters.adapters.chat_mapper import TelegramChatMapper
+from zuki.metrics import MetricsRegistry
+
+from .factories.chat import ChatServiceFactory
+from .factories.user import UserServiceFactory
+from .fingerprints import FingerprintCache
+
+
+class IngestQueue:
+    """
+    Отложенная запись пользователей и чатов из входящих апдейтов.
+    Повторные изменения одной записи в пределах окна схлопываются в последнее,
+    накопленное записывается пачкой раз в flush_interval секунд,
+    при накоплении flush_size записей и при остановке плагина.
+    Записи, не изменившиеся с последней записи в базу, в очередь не попадают
+    """
+    def __init__(
+        self,
+        uow_factory: Callable[[], UnitOfWork],
+        *,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        cache_size: int = 100000,
+        cache_ttl: float = 3600,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.uow_factory = uow_factory
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self._chats: Dict[int, Dict[str, Any]] = {}
+
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._background_flush: Optional[asyncio.Task] = None
+
+        metrics = metrics or MetricsRegistry()
+        self.fingerprints = FingerprintCache(ttl=cache_ttl, max_size=cache_size, metrics=metrics)
+        self._rows = metrics.counter(
+            "telegram_info_collect_ingest_rows_total",
+            "Rows written by the ingest queue",
+            ("table",)
+        )
+        self._coalesced = metrics.counter(
+            "telegram_info_collect_ingest_coalesced_total",
+            "Queued rows replaced by a newer version before being written",
+            ("table",)
+        )
+        self._pending = metrics.gauge("telegram_info_collect_ingest_pending", "Rows waiting to be written")
+        self._flush_seconds = metrics.histogram(
+            "telegram_info_collect_ingest_flush_seconds",
+            "Duration of ingest queue flushes"
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._users) + len(self._chats)
+
+    def add_user(self, user: TelegramUser):
+        self._put(self._users, "users", user.id, {
+            "tg_id": user.id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_bot": user.is_bot,
+        })
+
+    def add_chat(self, chat: TelegramChat):
+        self._put(self._chats, "chats", chat.id, {
+            "tg_id": chat.id,
+            "name": chat.full_name,
+            "type": TelegramChatMapper.to_internal_type(chat),
+        })
+
+    def is_member_known(self, chat_tg_id: int, user_tg_id: int) -> bool:
+        """
+        True, если запись участника недавно проверялась и активна
+        """
+        return self.fingerprints.is_fresh("chat_members", (chat_tg_id, user_tg_id), 0)
+
+    def remember_member(self, chat_tg_id: int, user_tg_id: int):
+        self.fingerprints.store("chat_members", (chat_tg_id, user_tg_id), 0)
+
+    def forget_member(self, chat_tg_id: int, user_tg_id: int):
+        self.fingerprints.forget("chat_members", (chat_tg_id, user_tg_id))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """
+        Останавливает фоновую запись и сохраняет всё накопленное
+        """
+        for task in (self._task, self._background_flush):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = None
+        self._background_flush = None
+
+        await self.flush()
+
+    async def flush(self):
+        """
+        Записывает накопленное. После возврата в базе есть все записи,
+        добавленные до вызова
+        """
+        async with self._lock:
+            users, self._users = self._users, {}
+            chats, self._chats = self._chats, {}
+            self._pending.set(self.pending)
+            if not users and not chats:
+                return
+
+            start = time.perf_counter()
+            try:
+                async with self.uow_factory() as uow:
+                    await UserServiceFactory(uow.session).create().put_many(list(users.values()))
+                    await ChatServiceFactory(uow.session).create().put_many(list(chats.values()))
+            except Exception:
+                # Возвращаем в очередь то, что не успело смениться более новой версией
+                for pending, failed in ((self._users, users), (self._chats, chats)):
+                    for key, row in failed.items():
+                        pending.setdefault(key, row)
+                self._pending.set(self.pending)
+                raise
+            finally:
+                self._flush_seconds.observe(time.perf_counter() - start)
+
+            for table, rows in (("users", users), ("chats", chats)):
+                for key, row in rows.items():
+                    self.fingerprints.store(table, key, self._fingerprint(row))
+                self._rows.inc(len(rows), table=table)
+
+    @staticmethod
+    def _fingerprint(row: Dict[str, Any]) -> int:
+        return FingerprintCache.fingerprint(tuple(row.values()))
+
+    def _put(self, pending: Dict[int, Dict[str, Any]], table: str, key: int, row: Dict[str, Any]):
+        if key in pending:
+            # Ждущая записи версия могла отличаться от записанной: заменяем её в любом случае
+            self._coalesced.inc(table=table)
+        elif self.fingerprints.is_fresh(table, key, self._fingerprint(row)):
+            return
+        pending[key] = row
+        self._pending.set(self.pending)
+
+        if self.pending >= self.flush_size and (self._background_flush is None or self._background_flush.done()):
+            self._background_flush = asyncio.create_task(self._flush_safely())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_safely()
+
+    async def _flush_safely(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Failed to write ingest queue, {self.pending} rows will be retried: {e}")
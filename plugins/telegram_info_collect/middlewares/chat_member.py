@@ -0,0 +1,21 @@
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import ChatMemberUpdated
+
+from ..ingest import IngestQueue
+
+
+class ChatMemberUpdatedMiddleware(BaseMiddleware):
+    def __init__(self, ingest: IngestQueue):
+        self.ingest = ingest
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: ChatMemberUpdated,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["uow_factory"] = data["db_manager:uow_factory"]
+        data["ingest"] = self.ingest
+        return await handler(event, data)
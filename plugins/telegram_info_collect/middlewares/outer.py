@@ -3,14 +3,18 @@ from typing import Callable, Awaitable, Any
 from aiogram import BaseMiddleware
 from aiogram.types import Message, Update
 
-from plugins.db_manager import UnitOfWork
-from plugins.telegram_adapters.adapters.chat_mapper import TelegramChatMapper
+from plugins.telegram_adapters.adapters.chat_member_mapper import TelegramChatMemberMapper
 
 from ..factories.chat_member import ChatMemberServiceFactory
-from ..factories.user import UserServiceFactory
-from ..factories.chat import ChatServiceFactory
+from ..ingest import IngestQueue
+from ..models.enums import ChatMemberStatusEnum
+
+INACTIVE_STATUSES = (ChatMemberStatusEnum.LEFT, ChatMemberStatusEnum.BANNED)
 
 class OuterMiddleware(BaseMiddleware):
+    def __init__(self, ingest: IngestQueue):
+        self.ingest = ingest
+
     async def __call__(
         self,
         handler: Callable[[Any, dict], Awaitable[Any]],
@@ -19,52 +23,50 @@ class OuterMiddleware(BaseMiddleware):
     ) -> Any:
         uow_factory = data["db_manager:uow_factory"]
 
-        if isinstance(event.event, Message):
+        if isinstance(event.event, Message) and event.event.from_user is not None:
             message: Message = event.event
 
-            user = None
-            chat = None
-
-            async with uow_factory() as uow:
-                user_service = UserServiceFactory(uow.session).create()
-                user = await user_service.put(
-                    tg_id=message.from_user.id,
-                    username=message.from_user.username,
-                    first_name=message.from_user.first_name,
-                    last_name=message.from_user.last_name,
-                    is_bot=message.from_user.is_bot
-                )
-
-            async with uow_factory() as uow:
-                chat_service = ChatServiceFactory(uow.session).create()
-                chat_type = TelegramChatMapper.to_internal_type(message.chat)
-
-                chat = await chat_service.put(
-                    tg_id=message.chat.id,
-                    name=message.chat.full_name,
-                    type=chat_type
-                )
-
-            async with uow_factory() as uow:
-                if user and chat:
-                    tg_chat_member = await message.bot.get_chat_member(
-                        chat_id=message.chat.id,
-                        user_id=message.from_user.id
-                    )
-                    chat_member_service = ChatMemberServiceFactory(uow.session).create()
+            # Профили пользователя и чата записываются в фоне
+            self.ingest.add_user(message.from_user)
+            self.ingest.add_chat(message.chat)
+
+            if not self.ingest.is_member_known(message.chat.id, message.from_user.id):
+                # Участник встретился впервые: его запись нужна обработчикам сразу,
+                # а для неё — записи пользователя и чата
+                await self.ingest.flush()
 
-                    role_id=None
-                    if tg_chat_member.status in ["creator"]:
-                        role_id=5
+                chat_tg_id, user_tg_id = message.chat.id, message.from_user.id
+                async with uow_factory() as uow:
+                    # Участник запоминается только после фиксации его записи:
+                    # ошибка дальше по апдейту откатит и её
+                    uow.after_commit(lambda: self.ingest.remember_member(chat_tg_id, user_tg_id))
 
-                    await chat_member_service.put(
+                    chat_member_service = ChatMemberServiceFactory(uow.session).create()
+                    chat_member = await chat_member_service.get_by_user_and_chat_tg_ids(
                         user_tg_id=message.from_user.id,
-                        chat_tg_id=message.chat.id,
-                        status=tg_chat_member.status,
-                        title=getattr(tg_chat_member, "custom_title", None),
-                        role_id=role_id
+                        chat_tg_id=message.chat.id
                     )
 
+                    # Статус известных участников обновляется по апдейтам chat_member,
+                    # Bot API запрашивается только для новых и вернувшихся участников
+                    if chat_member is None or chat_member.status in INACTIVE_STATUSES:
+                        tg_chat_member = await message.bot.get_chat_member(
+                            chat_id=message.chat.id,
+                            user_id=message.from_user.id
+                        )
+
+                        role_id=None
+                        if tg_chat_member.status in ["creator"]:
+                            role_id=5
+
+                        await chat_member_service.put(
+                            user_tg_id=message.from_user.id,
+                            chat_tg_id=message.chat.id,
+                            status=TelegramChatMemberMapper.to_internal_status(tg_chat_member.status),
+                            title=getattr(tg_chat_member, "custom_title", None),
+                            role_id=role_id
+                        )
+
         # Обработка сообщения
         result = await handler(event, data)
 
@@ -0,0 +1,9 @@
+from plugins.db_manager import Migration, create_indexes, model_index
+
+from .models.chat_member import ChatMember
+
+MIGRATIONS = [
+    Migration(1, "index chat_members by chat and status", create_indexes(
+        model_index(ChatMember, "ix_chat_members_chat_id_status")
+    )),
+]
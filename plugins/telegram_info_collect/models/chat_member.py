@@ -1,7 +1,7 @@
-from sqlalchemy import Column, BigInteger, Integer, String, DateTime, UniqueConstraint, ForeignKey, Identity, func
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, UniqueConstraint, ForeignKey, Identity, Index, func
 from sqlalchemy.orm import relationship
 
-from plugins.db_manager import Base
+from plugins.db_manager import Base, BigIntegerPK
 from .enums import Enum, ChatMemberStatusEnum
 
 class ChatMemberRole(Base):
@@ -27,7 +27,7 @@ class ChatMemberPermission(Base):
 
 class ChatMember(Base):
     __tablename__ = "chat_members"
-    id = Column(BigInteger, Identity(start=1, cycle=False), primary_key=True, nullable=False)
+    id = Column(BigIntegerPK, Identity(start=1, cycle=False), primary_key=True, nullable=False)
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"))
     chat_id = Column(BigInteger, ForeignKey("chats.id", ondelete="CASCADE"))
     status = Column(
@@ -43,4 +43,7 @@ class ChatMember(Base):
     chat = relationship("Chat", back_populates="members")
     role = relationship("ChatMemberRole", back_populates="chat_members")
 
-    __table_args__ = (UniqueConstraint("user_id", "chat_id", name="uq_user_chat"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "chat_id", name="uq_user_chat"),
+        Index("ix_chat_members_chat_id_status", "chat_id", "status"),
+    )
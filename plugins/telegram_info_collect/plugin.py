@@ -1,6 +1,11 @@
 from zuki.plugin import Plugin
 
+from .access import access_cache
+from .ingest import IngestQueue
 from .middlewares.outer import OuterMiddleware
+from .middlewares.chat_member import ChatMemberUpdatedMiddleware
+from .migrations import MIGRATIONS
+from .router import router
 from . import seeds
 
 class UserInfo(Plugin):
@@ -8,5 +13,54 @@ class UserInfo(Plugin):
     requires = ["db_manager", "telegram_adapters"]
 
     async def on_load(self):
+        self.config_manager.ensure_plugin_configs(self)
+        self.config = self.config_manager.load_config(
+            self.name, "config.toml", self.ingest_settings_from_config
+        )
 
-        self.app.add_dispatcher_middleware(OuterMiddleware())
+        self.app.get_service("db_manager:migrations").register(self.name, MIGRATIONS)
+        uow_factory = self.uow_factory = self.app.get_service("db_manager:uow_factory")
+        self.app.register_service(f"{self.name}:access", access_cache)
+        self.ingest = IngestQueue(uow_factory, metrics=self.app.metrics, **self.config)
+        self.app.register_service(f"{self.name}:ingest", self.ingest)
+
+        self.app.add_dispatcher_middleware(OuterMiddleware(self.ingest))
+
+        self.app.include_router(router)
+        self.app.add_router_middleware(
+            router,
+            ChatMemberUpdatedMiddleware(self.ingest),
+            update_types=["chat_member", "my_chat_member"]
+        )
+
+        self.config_manager.watch(
+            self.name, "config.toml", self.apply_config, self.ingest_settings_from_config
+        )
+
+    async def on_startup(self):
+        # Таблицы и начальные роли создаются при старте db_manager
+        async with self.uow_factory() as uow:
+            await access_cache.refresh(uow.session)
+        self.ingest.start()
+
+    async def on_shutdown(self):
+        # Накопленные записи сохраняются до остановки db_manager
+        await self.ingest.close()
+
+    def apply_config(self, config: dict):
+        self.config = config
+        self.ingest.flush_size = config["flush_size"]
+        self.ingest.flush_interval = config["flush_interval"]
+        self.ingest.fingerprints.max_size = config["cache_size"]
+        self.ingest.fingerprints.ttl = config["cache_ttl"]
+
+    @staticmethod
+    def ingest_settings_from_config(config: dict) -> dict:
+        ingest = config.get("ingest", {})
+
+        return {
+            "flush_size": max(1, ingest.get("flush_size", 500)),
+            "flush_interval": ingest.get("flush_interval", 1.0),
+            "cache_size": ingest.get("cache_size", 100000),
+            "cache_ttl": ingest.get("cache_ttl", 3600)
+        }
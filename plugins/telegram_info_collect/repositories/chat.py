@@ -1,6 +1,8 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from plugins.db_manager import read_only, upsert_many
+
 from ..models.chat import Chat
 
 
@@ -8,18 +10,21 @@ class ChatRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, chat_id: int) -> Optional[Chat]:
         result = await self.session.execute(
             select(Chat).where(Chat.id == chat_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_tg_id(self, tg_id: int) -> Optional[Chat]:
         result = await self.session.execute(
             select(Chat).where(Chat.tg_id == tg_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def list(self) -> List[Chat]:
         result = await self.session.execute(select(Chat))
         return result.scalars().all()
@@ -42,5 +47,26 @@ class ChatRepository:
         self.session.add(chat)
         return chat
 
+    @read_only
+    async def get_ids_by_tg_ids(self, tg_ids: List[int]) -> Dict[int, int]:
+        """
+        Внутренние id по tg_id для уже сохранённых записей
+        """
+        result = await self.session.execute(
+            select(Chat.tg_id, Chat.id).where(Chat.tg_id.in_(tg_ids))
+        )
+        return dict(result.all())
+
+    async def upsert(self, tg_id: int, **values: Any) -> Chat:
+        """
+        Создать или обновить чат одним запросом.
+        Обновляются только переданные поля
+        """
+        chats = await self.upsert_many([{"tg_id": tg_id, **values}])
+        return chats[0]
+
+    async def upsert_many(self, rows: List[Dict[str, Any]]) -> List[Chat]:
+        return await upsert_many(self.session, Chat, rows, ("tg_id",))
+
     async def delete(self, chat: Chat) -> None:
         await self.session.delete(chat)
\ No newline at end of file
@@ -1,25 +1,32 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlalchemy import delete, select, literal, tuple_
+from plugins.db_manager import read_only, upsert_many, upsert_select
 from ..models.chat_member import ChatMember, ChatMemberRole, ChatMemberPermission
+from ..models.chat import Chat
+from ..models.user import User
 from ..models.enums import ChatMemberStatusEnum
 
 class ChatMemberRoleRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, role_id: int) -> Optional[ChatMemberRole]:
         result = await self.session.execute(
             select(ChatMemberRole).where(ChatMemberRole.id == role_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_name(self, name: str) -> Optional[ChatMemberRole]:
         result = await self.session.execute(
             select(ChatMemberRole).where(ChatMemberRole.name == name)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def list(self) -> list[ChatMemberRole]:
         result = await self.session.execute(select(ChatMemberRole))
         return result.scalars().all()
@@ -36,6 +43,10 @@ class ChatMemberRoleRepository:
     async def delete(self, role: ChatMemberRole) -> None:
         await self.session.delete(role)
 
+    async def delete_by_id(self, role_id: int) -> None:
+        await self.session.execute(delete(ChatMemberRole).where(ChatMemberRole.id == role_id))
+
+    @read_only
     async def get_members(self, role_id: int) -> List[ChatMember]:
         """Получить всех участников, с этой ролью по relationship"""
         result = await self.session.execute(
@@ -47,12 +58,14 @@ class ChatMemberPermissionRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, permission_id: int) -> Optional[ChatMemberPermission]:
         result = await self.session.execute(
             select(ChatMemberPermission).where(ChatMemberPermission.id == permission_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_name(self, category: str, name: str) -> Optional[ChatMemberPermission]:
         result = await self.session.execute(
             select(ChatMemberPermission).where(
@@ -62,23 +75,34 @@ class ChatMemberPermissionRepository:
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def list(self) -> List[ChatMemberPermission]:
         result = await self.session.execute(select(ChatMemberPermission))
         return result.scalars().all()
 
+    async def add(self, category: str, name: str, level: int) -> ChatMemberPermission:
+        permission = ChatMemberPermission(category=category, name=name, level=level)
+        self.session.add(permission)
+        return permission
+
     async def delete(self, permission: ChatMemberPermission) -> None:
         await self.session.delete(permission)
 
+    async def delete_by_id(self, permission_id: int) -> None:
+        await self.session.execute(delete(ChatMemberPermission).where(ChatMemberPermission.id == permission_id))
+
 class ChatMemberRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, member_id: int) -> Optional[ChatMember]:
         result = await self.session.execute(
             select(ChatMember).where(ChatMember.id == member_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_user_and_chat(self, user_id: int, chat_id: int) -> Optional[ChatMember]:
         result = await self.session.execute(
             select(ChatMember).where(
@@ -88,13 +112,54 @@ class ChatMemberRepository:
         )
         return result.scalar_one_or_none()
 
-    async def list_by_chat(self, chat_id: int, statuses: List[str] = []) -> List[ChatMember]:
-        chat_members = select(ChatMember).where(ChatMember.chat_id == chat_id)
+    @read_only
+    async def get_by_tg_ids(self, user_tg_id: int, chat_tg_id: int) -> Optional[ChatMember]:
+        """
+        Участник по tg_id пользователя и чата одним запросом
+        """
+        result = await self.session.execute(
+            select(ChatMember)
+            .join(User, User.id == ChatMember.user_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(User.tg_id == user_tg_id, Chat.tg_id == chat_tg_id)
+        )
+        return result.scalar_one_or_none()
+
+    @read_only
+    async def get_many_by_tg_ids(self, pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], ChatMember]:
+        """
+        Участники по парам (tg_id пользователя, tg_id чата) одним запросом.
+        Пар без участника в результате нет
+        """
+        pairs = list(set(pairs))
+        if not pairs:
+            return {}
+
+        result = await self.session.execute(
+            select(ChatMember, User.tg_id, Chat.tg_id)
+            .join(User, User.id == ChatMember.user_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(tuple_(User.tg_id, Chat.tg_id).in_(pairs))
+        )
+        return {(user_tg_id, chat_tg_id): member for member, user_tg_id, chat_tg_id in result.all()}
+
+    @read_only
+    async def list_by_chat(
+        self,
+        chat_id: int,
+        statuses: List[str] = [],
+        options: Sequence[ORMOption] = ()
+    ) -> List[ChatMember]:
+        """
+        options — опции загрузки связей, например joinedload(ChatMember.user)
+        """
+        chat_members = select(ChatMember).where(ChatMember.chat_id == chat_id).options(*options)
         if statuses:
             chat_members = chat_members.where(ChatMember.status.in_(statuses))
         result = await self.session.execute(chat_members)
-        return result.scalars().all()
+        return result.scalars().unique().all()
 
+    @read_only
     async def list_by_user(self, user_id: int) -> List[ChatMember]:
         result = await self.session.execute(
             select(ChatMember).where(ChatMember.user_id == user_id)
@@ -119,9 +184,51 @@ class ChatMemberRepository:
         self.session.add(member)
         return member
 
+    async def upsert_by_tg_ids(
+        self,
+        user_tg_id: int,
+        chat_tg_id: int,
+        status: ChatMemberStatusEnum = ChatMemberStatusEnum.MEMBER,
+        role_id: Optional[int] = None,
+        title: Optional[str] = None,
+    ) -> Optional[ChatMember]:
+        """
+        Создать или обновить участника одним запросом INSERT ... SELECT по tg_id
+        пользователя и чата. Без role_id роль существующего участника не меняется.
+        Возвращает None, если пользователя или чата нет в базе
+        """
+        columns = ChatMember.__table__.c
+        values = [
+            User.id.label("user_id"),
+            Chat.id.label("chat_id"),
+            literal(status, columns.status.type).label("status"),
+            literal(title, columns.title.type).label("title"),
+        ]
+        if role_id is not None:
+            values.append(literal(role_id, columns.role_id.type).label("role_id"))
+
+        rows = select(*values).join(Chat, Chat.tg_id == chat_tg_id).where(User.tg_id == user_tg_id)
+        update_columns = ["status", "title"] + (["role_id"] if role_id is not None else [])
+
+        members = await upsert_select(self.session, ChatMember, ("user_id", "chat_id"), update_columns, rows)
+        return members[0] if members else None
+
+    async def upsert_many(self, rows: List[Dict[str, Any]]) -> List[ChatMember]:
+        """
+        Строки содержат user_id и chat_id, без role_id роль не меняется
+        """
+        return await upsert_many(self.session, ChatMember, rows, ("user_id", "chat_id"))
+
     async def delete(self, member: ChatMember) -> None:
         await self.session.delete(member)
 
+    @read_only
+    async def get_role_id(self, member_id: int) -> Optional[int]:
+        return await self.session.scalar(
+            select(ChatMember.role_id).where(ChatMember.id == member_id)
+        )
+
+    @read_only
     async def get_role(self, member_id: int) -> Optional[ChatMemberRole]:
         result = await self.session.execute(
             select(ChatMemberRole).join(ChatMember).where(ChatMember.id == member_id)
@@ -1,26 +1,31 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from plugins.db_manager import read_only, upsert_many
+
 from ..models.user import User
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @read_only
     async def get(self, user_id: int) -> Optional[User]:
         result = await self.session.execute(
             select(User).where(User.id == user_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def get_by_tg_id(self, tg_id: int) -> Optional[User]:
         result = await self.session.execute(
             select(User).where(User.tg_id == tg_id)
         )
         return result.scalar_one_or_none()
 
+    @read_only
     async def list(self) -> List[User]:
         result = await self.session.execute(select(User))
         return result.scalars().all()
@@ -45,6 +50,27 @@ class UserRepository:
         self.session.add(user)
         return user
 
+    @read_only
+    async def get_ids_by_tg_ids(self, tg_ids: List[int]) -> Dict[int, int]:
+        """
+        Внутренние id по tg_id для уже сохранённых записей
+        """
+        result = await self.session.execute(
+            select(User.tg_id, User.id).where(User.tg_id.in_(tg_ids))
+        )
+        return dict(result.all())
+
+    async def upsert(self, tg_id: int, **values: Any) -> User:
+        """
+        Создать или обновить пользователя одним запросом.
+        Обновляются только переданные поля
+        """
+        users = await self.upsert_many([{"tg_id": tg_id, **values}])
+        return users[0]
+
+    async def upsert_many(self, rows: List[Dict[str, Any]]) -> List[User]:
+        return await upsert_many(self.session, User, rows, ("tg_id",))
+
     async def delete(self, user: User) -> None:
         await self.session.delete(user)
 
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from ..models.chat import Chat
 from ..repositories.chat import ChatRepository
 
@@ -18,33 +18,34 @@ class ChatService:
     async def list(self) -> List[Chat]:
         return await self.chat_repo.list()
 
+    async def get_ids_by_tg_ids(self, tg_ids: List[int]) -> Dict[int, int]:
+        return await self.chat_repo.get_ids_by_tg_ids(tg_ids)
+
     async def put(
         self,
         tg_id: int,
         name: str,
         type,
         link: Optional[str] = None,
-        activated: bool = False,
+        activated: Optional[bool] = None,
     ) -> Chat:
         """
-        Создать чат, если его нет, иначе обновить существующий
+        Создать чат, если его нет, иначе обновить существующий.
+        Без link и activated эти поля существующего чата не меняются
+        """
+        values = dict(name=name, type=type)
+        if link is not None:
+            values["link"] = link
+        if activated is not None:
+            values["activated"] = activated
+        return await self.chat_repo.upsert(tg_id, **values)
+
+    async def put_many(self, rows: List[Dict[str, Any]]) -> List[Chat]:
+        """
+        Создать или обновить чаты пачкой.
+        Обновляются только переданные поля
         """
-        chat = await self.get_by_tg_id(tg_id)
-        if chat:
-            chat.name = name
-            chat.link = link
-            chat.type = type
-            chat.activated = activated
-            # flush/commit будет на уровне UnitOfWork
-            return chat
-
-        return await self.chat_repo.add(
-            tg_id=tg_id,
-            name=name,
-            link=link,
-            type=type,
-            activated=activated,
-        )
+        return await self.chat_repo.upsert_many(rows)
 
     async def delete(self, chat: Chat) -> None:
         await self.chat_repo.delete(chat)
\ No newline at end of file
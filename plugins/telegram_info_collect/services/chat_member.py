@@ -1,5 +1,9 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Tuple, Union
 
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.interfaces import ORMOption
+
+from ..access import AccessCache, AccessSnapshot, PermissionRecord, RoleRecord, access_cache
 from ..models.chat_member import ChatMember, ChatMemberRole, ChatMemberPermission
 from ..models.enums import ChatMemberStatusEnum
 from ..repositories.chat_member import (
@@ -11,21 +15,26 @@ from ..services.chat import ChatService
 
 class ChatMemberRoleService:
     """
-    Сервис ролей участников чата
+    Сервис ролей участников чата. Роли читаются из общего снимка,
+    запись помечает снимок устаревшим
     """
-    def __init__(self, chat_member_role_repo: ChatMemberRoleRepository):
+    def __init__(self, chat_member_role_repo: ChatMemberRoleRepository, access: AccessCache = access_cache):
         self.chat_member_role_repo = chat_member_role_repo
+        self.access = access
+
+    async def snapshot(self) -> AccessSnapshot:
+        return await self.access.get(self.chat_member_role_repo.session)
 
-    async def get(self, role_id: int) -> Optional[ChatMemberRole]:
-        return await self.chat_member_role_repo.get(role_id)
+    async def get(self, role_id: int) -> Optional[RoleRecord]:
+        return (await self.snapshot()).role(role_id)
 
-    async def get_by_name(self, name: str) -> Optional[ChatMemberRole]:
-        return await self.chat_member_role_repo.get_by_name(name)
+    async def get_by_name(self, name: str) -> Optional[RoleRecord]:
+        return (await self.snapshot()).role_by_name(name)
 
-    async def list(self) -> List[ChatMemberRole]:
-        return await self.chat_member_role_repo.list()
+    async def list(self) -> List[RoleRecord]:
+        return list((await self.snapshot()).roles)
 
-    async def put(self, name: str, level: int) -> ChatMemberRole:
+    async def put(self, name: str, level: int) -> Union[RoleRecord, ChatMemberRole]:
         """
         Создать роль, если её ещё нет, иначе вернуть существующую
         """
@@ -34,10 +43,13 @@ class ChatMemberRoleService:
             return role
 
         role = await self.chat_member_role_repo.add(name=name, level=level)
+        await self.chat_member_role_repo.session.flush()
+        self.access.invalidate(self.chat_member_role_repo.session)
         return role
 
-    async def delete(self, role: ChatMemberRole) -> None:
-        await self.chat_member_role_repo.delete(role)
+    async def delete(self, role: Union[RoleRecord, ChatMemberRole]) -> None:
+        await self.chat_member_role_repo.delete_by_id(role.id)
+        self.access.invalidate(self.chat_member_role_repo.session)
 
     async def get_members(self, role_id: int) -> List[ChatMember]:
         """
@@ -47,21 +59,26 @@ class ChatMemberRoleService:
 
 class ChatMemberPermissionService:
     """
-    Сервис разрешений для участников чата
+    Сервис разрешений для участников чата. Разрешения читаются из общего снимка,
+    запись помечает снимок устаревшим
     """
-    def __init__(self, chat_member_permission_repo: ChatMemberPermissionRepository):
+    def __init__(self, chat_member_permission_repo: ChatMemberPermissionRepository, access: AccessCache = access_cache):
         self.chat_member_permission_repo = chat_member_permission_repo
+        self.access = access
+
+    async def snapshot(self) -> AccessSnapshot:
+        return await self.access.get(self.chat_member_permission_repo.session)
 
-    async def get(self, permission_id: int) -> Optional[ChatMemberPermission]:
-        return await self.chat_member_permission_repo.get(permission_id)
+    async def get(self, permission_id: int) -> Optional[PermissionRecord]:
+        return (await self.snapshot()).permission(permission_id)
 
-    async def get_by_name(self, category: str, name: str) -> Optional[ChatMemberPermission]:
-        return await self.chat_member_permission_repo.get_by_name(category, name)
+    async def get_by_name(self, category: str, name: str) -> Optional[PermissionRecord]:
+        return (await self.snapshot()).permission_by_name(category, name)
 
-    async def list(self) -> List[ChatMemberPermission]:
-        return await self.chat_member_permission_repo.list()
+    async def list(self) -> List[PermissionRecord]:
+        return list((await self.snapshot()).permissions)
 
-    async def put(self, category: str, name: str, level: int) -> ChatMemberPermission:
+    async def put(self, category: str, name: str, level: int) -> Union[PermissionRecord, ChatMemberPermission]:
         """
         Создать разрешение, если его нет, иначе вернуть существующее
         """
@@ -69,12 +86,16 @@ class ChatMemberPermissionService:
         if permission:
             return permission
 
-        return await self.chat_member_permission_repo.add(category, name, level)
+        permission = await self.chat_member_permission_repo.add(category, name, level)
+        await self.chat_member_permission_repo.session.flush()
+        self.access.invalidate(self.chat_member_permission_repo.session)
+        return permission
 
-    async def delete(self, permission: ChatMemberPermission) -> None:
-        await self.chat_member_permission_repo.delete(permission)
+    async def delete(self, permission: Union[PermissionRecord, ChatMemberPermission]) -> None:
+        await self.chat_member_permission_repo.delete_by_id(permission.id)
+        self.access.invalidate(self.chat_member_permission_repo.session)
 
-    async def is_allowed(self, permission: ChatMemberPermission, role_level: int) -> bool:
+    async def is_allowed(self, permission: Union[PermissionRecord, ChatMemberPermission], role_level: int) -> bool:
         """
         Проверка: доступна ли роль с данным уровнем к разрешению
         """
@@ -103,15 +124,31 @@ class ChatMemberService:
         return await self.chat_member_repo.get(member_id)
 
     async def get_by_user_and_chat_tg_ids(self, user_tg_id: int, chat_tg_id: int) -> Optional[ChatMember]:
-        user = await self.user_service.get_by_tg_id(user_tg_id)
-        chat = await self.chat_service.get_by_tg_id(chat_tg_id)
-        if not user or not chat:
-            return None
-        return await self.chat_member_repo.get_by_user_and_chat(user.id, chat.id)
+        return await self.chat_member_repo.get_by_tg_ids(user_tg_id, chat_tg_id)
 
-    async def list_by_chat_tg_id(self, chat_tg_id: int, statuses: List[str]) -> List[ChatMember]:
+    async def get_many_by_user_and_chat_tg_ids(
+        self,
+        pairs: Iterable[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], ChatMember]:
+        """
+        Участники по парам (user_tg_id, chat_tg_id) одним запросом
+        """
+        return await self.chat_member_repo.get_many_by_tg_ids(pairs)
+
+    async def list_by_chat_tg_id(
+        self,
+        chat_tg_id: int,
+        statuses: List[str],
+        options: Sequence[ORMOption] = ()
+    ) -> List[ChatMember]:
         chat = await self.chat_service.get_by_tg_id(chat_tg_id)
-        return await self.chat_member_repo.list_by_chat(chat_id=chat.id, statuses=statuses)
+        return await self.chat_member_repo.list_by_chat(chat_id=chat.id, statuses=statuses, options=options)
+
+    async def list_by_chat_tg_id_with_users(self, chat_tg_id: int, statuses: List[str]) -> List[ChatMember]:
+        """
+        То же с загруженными member.user, без запроса на каждого участника
+        """
+        return await self.list_by_chat_tg_id(chat_tg_id, statuses, options=[joinedload(ChatMember.user)])
 
     async def list_by_user_tg_id(self, user_tg_id: int) -> List[ChatMember]:
         user = await self.user_service.get_by_tg_id(user_tg_id)
@@ -124,34 +161,51 @@ class ChatMemberService:
         status: ChatMemberStatusEnum = ChatMemberStatusEnum.MEMBER,
         role_id: Optional[int] = None,
         title: Optional[str] = None,
-    ) -> ChatMember:
-        member = await self.get_by_user_and_chat_tg_ids(user_tg_id, chat_tg_id)
-        if role_id is None:
-            if member:
-                role = await self.get_role(member.id)
-                if role is None:
-                    role_id = 0
-                else:
-                    role_id = role.id
-
-        if member:
-            member.status = status
-            member.role_id = role_id
-            member.title = title
-            await self.chat_member_repo.session.flush()
-            return member
-        user = await self.user_service.get_by_tg_id(user_tg_id)
-        chat = await self.chat_service.get_by_tg_id(chat_tg_id)
-        return await self.chat_member_repo.add(user.id, chat.id, status, role_id, title)
+    ) -> Optional[ChatMember]:
+        """
+        Создать участника, если его нет, иначе обновить статус и звание.
+        Без role_id роль существующего участника не меняется.
+        Пользователь и чат должны быть уже сохранены
+        """
+        return await self.chat_member_repo.upsert_by_tg_ids(
+            user_tg_id=user_tg_id,
+            chat_tg_id=chat_tg_id,
+            status=status,
+            role_id=role_id,
+            title=title
+        )
+
+    async def put_many(self, rows: List[Dict[str, Any]]) -> List[ChatMember]:
+        """
+        Создать или обновить участников пачкой. Строки содержат user_tg_id и chat_tg_id
+        вместо внутренних id, участники несохранённых пользователей и чатов пропускаются
+        """
+        user_ids = await self.user_service.get_ids_by_tg_ids(list({row["user_tg_id"] for row in rows}))
+        chat_ids = await self.chat_service.get_ids_by_tg_ids(list({row["chat_tg_id"] for row in rows}))
+
+        members = []
+        for row in rows:
+            row = dict(row)
+            user_id = user_ids.get(row.pop("user_tg_id"))
+            chat_id = chat_ids.get(row.pop("chat_tg_id"))
+            if user_id is not None and chat_id is not None:
+                members.append({"user_id": user_id, "chat_id": chat_id, **row})
+        return await self.chat_member_repo.upsert_many(members)
 
     async def delete(self, member: ChatMember) -> None:
         await self.chat_member_repo.delete(member)
 
     # --- Работа с ролями ---
-    async def get_role(self, member_id: int) -> Optional[ChatMemberRole]:
-        member = await self.get(member_id)
-        if not member:
+    async def get_role(self, member_id: int) -> Optional[RoleRecord]:
+        role_id = await self.chat_member_repo.get_role_id(member_id)
+        if role_id is None:
             return None
+        return await self.role_service.get(role_id)
+
+    async def get_member_role(self, member: ChatMember) -> Optional[RoleRecord]:
+        """
+        Роль уже загруженного участника, без запросов к базе
+        """
         return await self.role_service.get(member.role_id)
 
     async def set_role(self, member_id: int, role_id: int) -> Optional[ChatMember]:
@@ -167,21 +221,25 @@ class ChatMemberService:
         """
         Проверка: есть ли у участника право по категории/имени
         """
-        role = await self.get_role(member_id)
-        permission = await self.permission_service.get_by_name(category, name)
-        if not role:
+        role_id = await self.chat_member_repo.get_role_id(member_id)
+        if role_id is None:
             return False
-        return await self.permission_service.is_allowed(permission, role.level)
+        return (await self.role_service.snapshot()).is_allowed(role_id, category, name)
 
-    async def list_permissions(self, member_id: int) -> List[ChatMemberPermission]:
+    async def member_has_permission(self, member: ChatMember, category: str, name: str) -> bool:
+        """
+        То же для уже загруженного участника, без запросов к базе
+        """
+        return (await self.role_service.snapshot()).is_allowed(member.role_id, category, name)
+
+    async def list_permissions(self, member_id: int) -> List[PermissionRecord]:
         """
         Получить все разрешения, доступные участнику по его уровню роли
         """
-        role = await self.get_role(member_id)
-        if not role:
+        role_id = await self.chat_member_repo.get_role_id(member_id)
+        if role_id is None:
             return []
-        all_permissions = await self.permission_service.list()
-        return [perm for perm in all_permissions if role.level >= perm.level]
+        return list((await self.role_service.snapshot()).role_permissions(role_id))
 
     async def get_user(self, chat_member: ChatMember):
         user = await self.user_service.get(chat_member.user_id)
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from ..models.user import User
 from ..repositories.user import UserRepository
 
@@ -18,6 +18,9 @@ class UserService:
     async def list(self) -> List[User]:
         return await self.user_repo.list()
 
+    async def get_ids_by_tg_ids(self, tg_ids: List[int]) -> Dict[int, int]:
+        return await self.user_repo.get_ids_by_tg_ids(tg_ids)
+
     async def put(
         self,
         tg_id: int,
@@ -25,25 +28,23 @@ class UserService:
         first_name: Optional[str],
         last_name: Optional[str],
         is_bot: bool,
-        is_superuser: bool = False,
+        is_superuser: Optional[bool] = None,
     ) -> User:
-        user = await self.get_by_tg_id(tg_id)
-        if user:
-            user.username = username
-            user.first_name = first_name
-            user.last_name = last_name
-            user.is_bot = is_bot
-            user.is_superuser = is_superuser
-            return user
-
-        return await self.user_repo.add(
-            tg_id=tg_id,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            is_bot=is_bot,
-            is_superuser=is_superuser,
-        )
+        """
+        Создать пользователя, если его нет, иначе обновить существующего.
+        Без is_superuser флаг существующего пользователя не меняется
+        """
+        values = dict(username=username, first_name=first_name, last_name=last_name, is_bot=is_bot)
+        if is_superuser is not None:
+            values["is_superuser"] = is_superuser
+        return await self.user_repo.upsert(tg_id, **values)
+
+    async def put_many(self, rows: List[Dict[str, Any]]) -> List[User]:
+        """
+        Создать или обновить пользователей пачкой.
+        Обновляются только переданные поля
+        """
+        return await self.user_repo.upsert_many(rows)
 
     async def delete(self, user: User) -> None:
         await self.user_repo.delete(user)
\ No newline at end of file
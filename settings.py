@@ -1,3 +1,5 @@
+from typing import Optional, List
+
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict, ConfigDict
 
@@ -8,4 +10,48 @@ class Settings(BaseSettings):
 
     timezone: str = "Europe/Moscow"
 
-settings = Settings()
\ No newline at end of file
+    # Список включённых плагинов (зависимости включаются автоматически),
+    # по умолчанию загружаются все найденные плагины
+    enabled_plugins: Optional[List[str]] = None
+
+    # Адрес Bot API сервера (например, локального), по умолчанию api.telegram.org
+    bot_api_server: Optional[str] = None
+
+    # Webhook включается, если задан webhook_url, иначе используется polling
+    webhook_url: Optional[str] = None
+    webhook_path: str = "/webhook"
+    webhook_secret: Optional[str] = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_workers: int = 4
+
+    # Количество процессов-воркеров. Больше одного — апдейты принимает процесс-супервизор
+    # и распределяет их между воркерами по id чата
+    workers: int = 1
+
+    # Планировщик апдейтов: очереди по чатам с общим ограничением одновременной обработки.
+    # Включается, если задан scheduler_concurrency.
+    # scheduler_overflow: wait, drop_oldest или drop_newest. drop_oldest выбрасывает
+    # старейший апдейт чата, а при достижении scheduler_max_pending — старейший среди всех чатов
+    scheduler_concurrency: Optional[int] = None
+    scheduler_per_chat_concurrency: int = 1
+    scheduler_queue_size: int = 100
+    scheduler_max_pending: int = 10000
+    scheduler_overflow: str = "wait"
+
+    # Лимиты отправки сообщений: всего в секунду и в одну группу в минуту
+    sender_global_rate: float = 30
+    sender_group_per_minute: float = 20
+
+    # Сколько секунд хранить ответы getChatMember и getChatAdministrators
+    api_cache_member_ttl: float = 60
+    api_cache_administrators_ttl: float = 300
+
+    # Порт HTTP-эндпоинта /metrics в формате Prometheus, по умолчанию выключен
+    metrics_host: str = "0.0.0.0"
+    metrics_port: Optional[int] = None
+
+    # Сколько секунд при остановке ждать завершения обработки полученных апдейтов
+    shutdown_timeout: float = 30
+
+settings = Settings()
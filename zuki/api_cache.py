@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import ChatMemberUpdated, Message, Update
+
+from .metrics import MetricsRegistry
+
+ChatId = Union[int, str]
+
+
+class ApiCacheConfig:
+    def __init__(
+        self,
+        *,
+        chat_member_ttl: float = 60,
+        chat_administrators_ttl: float = 300,
+        chat_ttl: float = 300,
+        max_size: int = 10000,
+    ):
+        self.ttls = {
+            "getChatMember": chat_member_ttl,
+            "getChatAdministrators": chat_administrators_ttl,
+            "getChat": chat_ttl,
+        }
+        self.max_size = max_size
+
+
+class BotApiCache(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: кэширует ответы getChatMember, getChatAdministrators
+    и getChat на ttl секунд. Одинаковые запросы, пришедшие одновременно,
+    выполняются одним запросом к Bot API. Записи чата сбрасываются
+    при изменении состава участников (см. ApiCacheInvalidationMiddleware)
+    """
+    def __init__(self, config: ApiCacheConfig, metrics: Optional[MetricsRegistry] = None):
+        self.config = config
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[Hashable, ...], asyncio.Future] = {}
+
+        metrics = metrics or MetricsRegistry()
+        self._requests = metrics.counter(
+            "zuki_api_cache_requests_total",
+            "Cacheable Bot API requests by cache result",
+            ("method", "result")
+        )
+        self._size = metrics.gauge("zuki_api_cache_entries", "Cached Bot API responses")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Число попаданий, промахов и объединённых запросов по методам
+        """
+        stats: Dict[str, Dict[str, float]] = {}
+        for (method, result), value in self._requests.values.items():
+            stats.setdefault(method, {})[result] = value
+        return stats
+
+    async def __call__(self, make_request, bot, method):
+        api_method = method.__api_method__
+        ttl = self.config.ttls.get(api_method)
+        if not ttl:
+            return await make_request(bot, method)
+
+        key = self._key(api_method, method)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._requests.inc(method=api_method, result="hit")
+                return self._copy(value)
+            del self._entries[key]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._requests.inc(method=api_method, result="coalesced")
+            try:
+                return self._copy(await asyncio.shield(in_flight))
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # Отменён исходный запрос, а не этот: выполняем запрос сами
+                return await make_request(bot, method)
+
+        self._requests.inc(method=api_method, result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await make_request(bot, method)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получают только объединённые запросы
+            future.exception()
+            raise
+        else:
+            # Запись могла быть сброшена, пока шёл запрос: тогда ответ не кэшируется
+            if self._in_flight.get(key) is future:
+                self._store(key, value, ttl)
+                if api_method == "getChatAdministrators":
+                    self._store_administrators(method.chat_id, value)
+            future.set_result(value)
+            return self._copy(value)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def invalidate(self, chat_id: ChatId, user_id: Optional[int] = None):
+        """
+        Сбрасывает кэш участника чата (и списка администраторов чата),
+        без user_id — все записи чата
+        """
+        if user_id is None:
+            stale = [key for key in self._entries if key[1] == chat_id]
+        else:
+            stale = [("getChatMember", chat_id, user_id), ("getChatAdministrators", chat_id)]
+
+        for key in stale:
+            self._entries.pop(key, None)
+            self._in_flight.pop(key, None)
+        self._size.set(len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        self._in_flight.clear()
+        self._size.set(0)
+
+    @staticmethod
+    def _key(api_method: str, method) -> Tuple[Hashable, ...]:
+        if api_method == "getChatMember":
+            return (api_method, method.chat_id, method.user_id)
+        return (api_method, method.chat_id)
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        # Объекты aiogram неизменяемы, копировать нужно только списки
+        return list(value) if isinstance(value, list) else value
+
+    def _store(self, key: Tuple[Hashable, ...], value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_size:
+            self._entries.popitem(last=False)
+        self._size.set(len(self._entries))
+
+    def _store_administrators(self, chat_id: ChatId, administrators: list):
+        # Список администраторов заодно отвечает на getChatMember для каждого из них
+        ttl = self.config.ttls["getChatMember"]
+        if not ttl:
+            return
+        for member in administrators:
+            self._store(("getChatMember", chat_id, member.user.id), member, ttl)
+
+
+class ApiCacheInvalidationMiddleware(BaseMiddleware):
+    """
+    Сбрасывает кэш Bot API при изменении участников чата
+    """
+    def __init__(self, cache: BotApiCache):
+        self.cache = cache
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict], Awaitable[Any]],
+        event: Update,
+        data: dict,
+    ) -> Any:
+        update = event.event
+
+        if isinstance(update, ChatMemberUpdated):
+            self.cache.invalidate(update.chat.id, update.new_chat_member.user.id)
+        elif isinstance(update, Message):
+            for user in update.new_chat_members or ():
+                self.cache.invalidate(update.chat.id, user.id)
+            if update.left_chat_member is not None:
+                self.cache.invalidate(update.chat.id, update.left_chat_member.id)
+            if update.migrate_to_chat_id is not None:
+                self.cache.invalidate(update.chat.id)
+
+        return await handler(event, data)
@@ -1,10 +1,33 @@
-from typing import Optional, List
+import asyncio
+import signal
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Optional, List
 
 from aiogram import Bot, Dispatcher, Router, BaseMiddleware
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.base import BaseStorage
+from aiogram.types import Update
 from zoneinfo import ZoneInfo
 
+from .api_cache import ApiCacheConfig, ApiCacheInvalidationMiddleware, BotApiCache
+from .metrics import (
+    MetricsRegistry, MetricsServer, TimedMiddleware,
+    HandlerTimingMiddleware, BotApiMetricsMiddleware
+)
 from .middleware import OuterMiddleware
+from .scheduler import COMPLETION_KEY, SchedulerConfig, SchedulerMiddleware, UpdateScheduler
+from .sender import OutboundSender, SenderConfig
+from .updates import UpdateTracker
+from .webhook import WebhookConfig, WebhookServer
+
+# Плагин, чей on_load сейчас выполняется: его роутеры и middleware
+# откладываются до конца загрузки уровня
+loading_plugin: ContextVar[Optional[str]] = ContextVar("zuki_loading_plugin", default=None)
 
 
 class App:
@@ -13,20 +36,84 @@ class App:
         *,
         bot_token: str,
         bot_storage: Optional[BaseStorage],
-        timezone: str = "Etc/UTC"
+        timezone: str = "Etc/UTC",
+        api_server: Optional[str] = None,
+        bot_session: Optional[BaseSession] = None,
+        checkpoint_path: Optional[Path] = None,
+        metrics_host: str = "0.0.0.0",
+        metrics_port: Optional[int] = None,
+        scheduler: Optional[SchedulerConfig] = None,
+        sender: Optional[SenderConfig] = None,
+        api_cache: Optional[ApiCacheConfig] = None,
+        worker_index: Optional[int] = None
     ):
-        self.bot = Bot(token=bot_token)
-        if bot_storage is None:
-            self.dp = Dispatcher(storage=BaseStorage())
-        else:
-            self.dp = Dispatcher()
+        session = bot_session
+        if api_server:
+            session = session or AiohttpSession()
+            session.api = TelegramAPIServer.from_base(api_server)
+
+        self.bot = Bot(token=bot_token, session=session)
+        self.dp = Dispatcher(storage=bot_storage)
 
         self._services = {}
+        self._routers: List[Router] = []
         self.plugins = {}
+        self.worker_index = worker_index
+        self._deferred: Optional[Dict[str, List[Callable[[], None]]]] = None
+
+        self.updates = UpdateTracker(checkpoint_path)
+        self._webhook_server: Optional[WebhookServer] = None
+        self._polling = False
+        self._closed = False
+
+        self.metrics = MetricsRegistry()
+        self._metrics_server: Optional[MetricsServer] = None
+        if metrics_port is not None:
+            self._metrics_server = MetricsServer(self.metrics, metrics_host, metrics_port)
+        self._middleware_seconds = self.metrics.histogram(
+            "zuki_middleware_seconds",
+            "Own execution time of middlewares, excluding nested handlers",
+            ("middleware", "update_type")
+        )
+        self._handler_seconds = self.metrics.histogram(
+            "zuki_handler_seconds",
+            "Handler execution time",
+            ("handler", "update_type")
+        )
+        self._handlers_instrumented = False
+
+        # Кэш и ограничитель отправки подключаются первыми, чтобы ответы из кэша
+        # и ожидание токена не попадали во время запросов к Bot API
+        self.api_cache: Optional[BotApiCache] = None
+        if api_cache is not None:
+            self.api_cache = BotApiCache(api_cache, self.metrics)
+            self.bot.session.middleware(self.api_cache)
+
+        self.sender: Optional[OutboundSender] = None
+        if sender is not None:
+            self.sender = OutboundSender(sender, self.metrics)
+            self.bot.session.middleware(self.sender)
+        self.bot.session.middleware(BotApiMetricsMiddleware(self.metrics))
 
         self.timezone = ZoneInfo(timezone)
 
+        self.scheduler: Optional[UpdateScheduler] = None
+        if scheduler is not None:
+            self.scheduler = UpdateScheduler(scheduler, tracker=self.updates, metrics=self.metrics)
+            # Внешний middleware: очередь чата стоит перед всеми остальными middleware
+            self.dp.update.outer_middleware(SchedulerMiddleware(self.scheduler))
+
         self.add_dispatcher_middleware(OuterMiddleware(self))
+        if self.api_cache is not None:
+            self.add_dispatcher_middleware(ApiCacheInvalidationMiddleware(self.api_cache))
+
+    @property
+    def is_primary(self) -> bool:
+        """
+        Процесс, который выполняет разовую работу при старте (миграции)
+        и фоновые задачи плагинов: единственный процесс или воркер 0
+        """
+        return not self.worker_index
 
     def register_service(self, name, service):
         self._services[name] = service
@@ -34,15 +121,197 @@ class App:
     def get_service(self, name):
         return self._services[name]
 
+    def set_fsm_storage(self, storage: BaseStorage):
+        """
+        Заменяет хранилище состояний FSM, например на постоянное хранилище плагина
+        """
+        self.dp.fsm.storage = storage
+
     def include_router(self, router):
-        self.dp.include_router(router)
+        def include():
+            self._routers.append(router)
+            self.dp.include_router(router)
+        self._register(include)
 
     def add_dispatcher_middleware(self, middleware):
-        self.dp.update.middleware(middleware)
+        self._register(lambda: self.dp.update.middleware(
+            TimedMiddleware(middleware, self._middleware_seconds, "update")
+        ))
 
     def add_router_middleware(self, router: Router, middleware: BaseMiddleware, update_types: List[str]):
-        for update_type in update_types:
-            getattr(router, update_type).middleware(middleware)
+        def add():
+            for update_type in update_types:
+                getattr(router, update_type).middleware(
+                    TimedMiddleware(middleware, self._middleware_seconds, update_type)
+                )
+        self._register(add)
+
+    def defer_registrations(self):
+        """
+        Плагины одного уровня загружаются параллельно. До apply_registrations
+        их роутеры и middleware собираются по плагинам, чтобы подключиться
+        в порядке манифеста, а не в порядке завершения on_load
+        """
+        self._deferred = {}
+
+    def apply_registrations(self, order: List[str]):
+        deferred, self._deferred = self._deferred or {}, None
+        for name in order:
+            for register in deferred.pop(name, []):
+                register()
+
+    def _register(self, register: Callable[[], None]):
+        plugin = loading_plugin.get()
+        if self._deferred is not None and plugin is not None:
+            self._deferred.setdefault(plugin, []).append(register)
+        else:
+            register()
+
+    def instrument_handlers(self):
+        """
+        Подключает измерение времени хэндлеров последним middleware
+        каждого роутера, чтобы оно оказалось ближайшим к хэндлеру
+        """
+        if self._handlers_instrumented:
+            return
+        self._handlers_instrumented = True
+
+        for router in self.dp.chain_tail:
+            for update_type, observer in router.observers.items():
+                if update_type in ("update", "error") or not observer.handlers:
+                    continue
+                observer.middleware(HandlerTimingMiddleware(self._handler_seconds, update_type))
+
+    def resolve_allowed_updates(self) -> List[str]:
+        """
+        Типы апдейтов, для которых плагины зарегистрировали хэндлеры
+        """
+        allowed_updates = set()
+        for router in self._routers:
+            allowed_updates.update(router.resolve_used_update_types())
+        return sorted(allowed_updates)
+
+    async def feed_update(self, update: Update):
+        return await self.dp.feed_update(self.bot, update)
+
+    async def process_update(self, update: Update) -> bool:
+        """
+        Обрабатывает апдейт и ждёт окончания обработки: с планировщиком
+        feed_update возвращается, как только апдейт встал в очередь.
+        Возвращает False, если планировщик выбросил апдейт
+        """
+        if self.scheduler is None:
+            await self.feed_update(update)
+            return True
+
+        completion = asyncio.get_running_loop().create_future()
+        await self.dp.feed_update(self.bot, update, **{COMPLETION_KEY: completion})
+        return await completion
+
+    async def run(
+        self,
+        webhook: Optional[WebhookConfig] = None,
+        allowed_updates: Optional[List[str]] = None
+    ):
+        if allowed_updates is None:
+            allowed_updates = self.resolve_allowed_updates()
+        print("Allowed updates:", ', '.join(allowed_updates))
+
+        self.instrument_handlers()
+        if self._metrics_server is not None:
+            await self._metrics_server.start()
+            print(f"Metrics available on {self._metrics_server.host}:{self._metrics_server.port}/metrics")
+
+        if webhook is None:
+            self._polling = True
+            # Сессия бота закрывается в close(), после завершения обработки апдейтов
+            # С планировщиком апдейты передаются ему по одному, чтобы при
+            # заполненных очередях polling ждал, а не копил задачи
+            await self.dp.start_polling(
+                self.bot,
+                allowed_updates=allowed_updates,
+                handle_as_tasks=self.scheduler is None,
+                close_bot_session=False
+            )
+        else:
+            await self.run_webhook(webhook, allowed_updates)
+
+    async def run_webhook(self, config: WebhookConfig, allowed_updates: List[str]):
+        server = WebhookServer(
+            self.bot, config, self.feed_update,
+            tracker=self.updates,
+            metrics=self.metrics
+        )
+        self._webhook_server = server
+        stop_event = asyncio.Event()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, stop_event.set)
+
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+        await server.start(allowed_updates)
+        print(f"Webhook server listening on {config.host}:{config.port}{config.path}")
+        try:
+            await stop_event.wait()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """
+        Прекращает приём новых апдейтов
+        """
+        if self._webhook_server is not None:
+            await self._webhook_server.stop_receiving()
+            return
+
+        with suppress(RuntimeError):
+            await self.dp.stop_polling()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Ожидает завершения обработки полученных апдейтов не дольше timeout секунд
+        """
+        deadline = time.monotonic() + timeout
+        drained = True
+        if self._webhook_server is not None:
+            drained = await self._webhook_server.drain(timeout)
+        if self.scheduler is not None:
+            drained = await self.scheduler.join(deadline - time.monotonic()) and drained
+
+        drained = await self.updates.wait_idle(deadline - time.monotonic()) and drained
+        if not drained:
+            print(f"Shutdown deadline exceeded, {self.updates.in_flight} updates still in progress")
+        return drained
+
+    async def close(self):
+        """
+        Сохраняет смещение обработанных апдейтов и освобождает ресурсы бота
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._webhook_server is not None:
+            await self._webhook_server.close()
+        if self.scheduler is not None:
+            await self.scheduler.close()
+        if self._webhook_server is not None:
+            await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
+
+        offset = self.updates.save()
+        if offset is not None and self._polling:
+            # Подтверждаем Telegram обработанные апдейты,
+            # чтобы следующий процесс не получил их повторно
+            try:
+                await self.bot.get_updates(offset=offset + 1, limit=1, timeout=0)
+            except Exception as e:
+                print(f"Failed to confirm update offset {offset}: {e}")
+
+        if self._metrics_server is not None:
+            await self._metrics_server.stop()
 
-    async def run(self):
-        await self.dp.start_polling(self.bot)
\ No newline at end of file
+        if self.sender is not None:
+            await self.sender.close()
+        await self.bot.session.close()
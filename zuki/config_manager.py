@@ -1,17 +1,41 @@
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+import asyncio
+import inspect
+import json
 import shutil
 import sys
+import tomllib
 
 from .plugin import Plugin
 
+T = TypeVar("T")
+ConfigParser = Callable[[dict], T]
+ConfigCallback = Callable[[T], Union[None, Awaitable[None]]]
+
+CONFIG_READERS: Dict[str, Callable[[bytes], dict]] = {
+    ".toml": lambda content: tomllib.loads(content.decode("utf-8")),
+    ".json": json.loads,
+}
+
+class ConfigWatch:
+    def __init__(self, mtime: int):
+        self.mtime = mtime
+        self.callbacks: List[Tuple[ConfigCallback, Optional[ConfigParser]]] = []
+
 class ConfigManager:
-    def __init__(self, *, project_root: Path, configs_dir: Path):
+    def __init__(self, *, project_root: Path, configs_dir: Path, watch_interval: float = 2.0):
         self.project_root = project_root
         self.configs_root = project_root / configs_dir
         self.configs_root.mkdir(parents=True, exist_ok=True)
 
         self.configs_root.mkdir(exist_ok=True)
 
+        self.watch_interval = watch_interval
+        self._cache: Dict[Tuple[Path, Optional[ConfigParser]], Tuple[int, Any]] = {}
+        self._watches: Dict[Path, ConfigWatch] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
     def ensure_plugin_configs(self, plugin: Plugin):
         """
         Гарантирует, что у плагина есть конфиги
@@ -34,6 +58,91 @@ class ConfigManager:
     def get_plugin_config_path(self, plugin_name: str) -> Path:
         return self.configs_root / plugin_name
 
+    def load_config(self, plugin_name: str, file_name: str, parser: Optional[ConfigParser] = None) -> Any:
+        """
+        Прочитанный и разобранный конфиг плагина. Результат кэшируется,
+        пока не изменилось время модификации файла
+        """
+        return self._load(self.get_plugin_config_path(plugin_name) / file_name, parser)
+
+    def watch(
+        self,
+        plugin_name: str,
+        file_name: str,
+        callback: ConfigCallback,
+        parser: Optional[ConfigParser] = None
+    ):
+        """
+        Вызывает callback с новым конфигом, разобранным parser,
+        после каждого изменения файла
+        """
+        path = self.get_plugin_config_path(plugin_name) / file_name
+        watch = self._watches.get(path)
+        if watch is None:
+            watch = self._watches[path] = ConfigWatch(path.stat().st_mtime_ns)
+        watch.callbacks.append((callback, parser))
+
+    def start_watching(self):
+        if self._watch_task is None and self._watches:
+            self._watch_task = asyncio.create_task(self._watch_loop())
+
+    async def stop_watching(self):
+        if self._watch_task is None:
+            return
+        self._watch_task.cancel()
+        try:
+            await self._watch_task
+        except asyncio.CancelledError:
+            pass
+        self._watch_task = None
+
+    async def check_changes(self):
+        # Callback может добавить новое наблюдение, поэтому обход идёт по копии
+        for path, watch in list(self._watches.items()):
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if mtime == watch.mtime:
+                continue
+            watch.mtime = mtime
+
+            print(f"Config changed: {path}")
+            for callback, parser in list(watch.callbacks):
+                # При ошибке в новом конфиге плагин продолжает работать со старым
+                try:
+                    result = callback(self._load(path, parser))
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    print(f"Failed to apply config {path}: {e}")
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            # Ошибка одной проверки не должна останавливать наблюдение
+            try:
+                await self.check_changes()
+            except Exception as e:
+                print(f"Failed to check config changes: {e}")
+
+    def _load(self, path: Path, parser: Optional[ConfigParser]) -> Any:
+        mtime = path.stat().st_mtime_ns
+        cached = self._cache.get((path, parser))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        reader = CONFIG_READERS.get(path.suffix)
+        if reader is None:
+            raise ValueError(f"Unsupported config format: {path.name}")
+
+        config = reader(path.read_bytes())
+        if parser is not None:
+            config = parser(config)
+
+        self._cache[(path, parser)] = (mtime, config)
+        return config
+
     def _get_plugin_default_config_dir(self, plugin: Plugin) -> Path | None:
         if plugin.default_config_dir is None:
             return None
@@ -0,0 +1,210 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+import ast
+import importlib
+import json
+import sys
+import time
+
+from .plugin import Plugin
+
+
+class PluginSpec:
+    """
+    Описание плагина, достаточное для разрешения зависимостей
+    без импорта его модуля
+    """
+    def __init__(
+        self,
+        *,
+        name: str,
+        requires: List[str],
+        module: str,
+        class_name: str,
+        plugin_cls: Optional[type] = None
+    ):
+        self.name = name
+        self.requires = list(requires)
+        self.module = module
+        self.class_name = class_name
+        self.plugin_cls = plugin_cls
+
+        self.import_time = 0.0
+        self.imported_modules = 0
+
+    @classmethod
+    def from_class(cls, plugin_cls: type) -> "PluginSpec":
+        return cls(
+            name=plugin_cls.name,
+            requires=plugin_cls.requires,
+            module=plugin_cls.__module__,
+            class_name=plugin_cls.__name__,
+            plugin_cls=plugin_cls
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.plugin_cls is not None
+
+    def load(self) -> type:
+        if self.plugin_cls is not None:
+            return self.plugin_cls
+
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        module = importlib.import_module(self.module)
+        self.import_time = time.perf_counter() - start
+        self.imported_modules = len(sys.modules) - modules_before
+
+        plugin_cls = getattr(module, self.class_name)
+        if plugin_cls.name != self.name or list(plugin_cls.requires) != self.requires:
+            raise RuntimeError(
+                f"Plugin manifest is out of date for {self.module}.{self.class_name}"
+            )
+
+        self.plugin_cls = plugin_cls
+        return plugin_cls
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "requires": self.requires,
+            "module": self.module,
+            "class_name": self.class_name
+        }
+
+
+class PluginManifest:
+    """
+    Кэш обнаруженных плагинов. Запись модуля `plugin.py` переиспользуется,
+    пока не изменилось время его модификации
+    """
+    version = 1
+
+    def __init__(self, cache_path: Optional[Path] = None):
+        self.cache_path = cache_path
+        self._entries: Dict[str, dict] = self._read_cache()
+        self._changed = False
+
+    def discover(self, package_name: str) -> List[PluginSpec]:
+        package = importlib.import_module(package_name)
+        specs = []
+        seen = set()
+
+        # Как и при импорте, из одноимённых подпакетов берётся первый найденный
+        for package_path in package.__path__:
+            for plugin_file in sorted(Path(package_path).glob("*/plugin.py")):
+                if plugin_file.parent.name in seen:
+                    continue
+                seen.add(plugin_file.parent.name)
+
+                module_name = f"{package.__name__}.{plugin_file.parent.name}.plugin"
+                specs.extend(self._get_specs(module_name, plugin_file))
+
+        self.save()
+        return specs
+
+    def save(self):
+        if self.cache_path is None or not self._changed:
+            return
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as file:
+            json.dump({"version": self.version, "modules": self._entries}, file, indent=2)
+        self._changed = False
+
+    def _read_cache(self) -> Dict[str, dict]:
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if cache.get("version") != self.version:
+            return {}
+        return cache.get("modules", {})
+
+    def _get_specs(self, module_name: str, plugin_file: Path) -> List[PluginSpec]:
+        mtime = plugin_file.stat().st_mtime_ns
+        entry = self._entries.get(module_name)
+
+        if entry is None or entry["mtime"] != mtime:
+            try:
+                plugins = self._parse_plugins(module_name, plugin_file)
+            except ModuleNotFoundError as e:
+                print(f"Failed to import {module_name}: {e}")
+                return []
+
+            entry = {"mtime": mtime, "plugins": plugins}
+            self._entries[module_name] = entry
+            self._changed = True
+
+        return [PluginSpec(**plugin) for plugin in entry["plugins"]]
+
+    def _parse_plugins(self, module_name: str, plugin_file: Path) -> List[dict]:
+        """
+        Читает атрибуты плагинов из исходника без импорта модуля.
+        Если их нельзя определить статически, модуль импортируется
+        """
+        tree = ast.parse(plugin_file.read_text(encoding="utf-8"), str(plugin_file))
+        plugins = []
+
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef) or not self._is_plugin_class(node):
+                continue
+
+            attributes = {"name": node.name.lower(), "requires": []}
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                    target, value = statement.targets[0], statement.value
+                elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+                    target, value = statement.target, statement.value
+                else:
+                    continue
+
+                if isinstance(target, ast.Name) and target.id in attributes:
+                    try:
+                        attributes[target.id] = ast.literal_eval(value)
+                    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+                        # Значение не литерал: класс импортируется, атрибуты берутся у него
+                        return self._import_plugins(module_name)
+
+            if not isinstance(attributes["name"], str) or not isinstance(attributes["requires"], (list, tuple)):
+                return self._import_plugins(module_name)
+
+            plugins.append({
+                "name": attributes["name"],
+                "requires": list(attributes["requires"]),
+                "module": module_name,
+                "class_name": node.name
+            })
+
+        if not plugins:
+            return self._import_plugins(module_name)
+        return plugins
+
+    @staticmethod
+    def _is_plugin_class(node: ast.ClassDef) -> bool:
+        for base in node.bases:
+            if isinstance(base, ast.Name) and base.id == "Plugin":
+                return True
+            if isinstance(base, ast.Attribute) and base.attr == "Plugin":
+                return True
+        return False
+
+    @staticmethod
+    def _import_plugins(module_name: str) -> List[dict]:
+        module = importlib.import_module(module_name)
+        return [
+            PluginSpec.from_class(obj).to_dict()
+            for obj in module.__dict__.values()
+            if (
+                isinstance(obj, type)
+                and issubclass(obj, Plugin)
+                and obj is not Plugin
+                and obj.__module__ == module_name
+            )
+        ]
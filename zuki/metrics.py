@@ -0,0 +1,286 @@
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # ключ -> (счётчики по бакетам, сумма, количество)
+        self.values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for key, (bucket_counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик приложения. Повторная регистрация метрики
+    с тем же именем возвращает уже существующую
+    """
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get_or_create(self, metric_cls, name: str, help: str, labelnames: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_cls(name, help, labelnames, **kwargs)
+        elif not isinstance(metric, metric_cls):
+            raise ValueError(f"Metric {name} has already been registered as {metric.type}")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# Хэндлер, выбранный для текущего апдейта. Выставляется HandlerTimingMiddleware
+# и остаётся видимым внешним middleware после возврата из хэндлера
+current_handler: ContextVar[Optional[str]] = ContextVar("zuki_current_handler", default=None)
+
+
+def qualified_name(obj: Any) -> str:
+    if not hasattr(obj, "__qualname__"):
+        obj = type(obj)
+    return f"{obj.__module__}.{obj.__qualname__}"
+
+
+class TimedMiddleware(BaseMiddleware):
+    """
+    Обёртка над middleware, измеряющая собственное время middleware
+    без учёта времени вложенных обработчиков
+    """
+    def __init__(self, middleware: BaseMiddleware, histogram: Histogram, update_type: str):
+        self.middleware = middleware
+        self.histogram = histogram
+        self.update_type = update_type
+        self.name = qualified_name(middleware)
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        inner_time = 0.0
+
+        async def timed_handler(event: Any, data: Dict[str, Any]) -> Any:
+            nonlocal inner_time
+            start = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                inner_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            self.histogram.observe(
+                time.perf_counter() - start - inner_time,
+                middleware=self.name,
+                update_type=self.update_type
+            )
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """
+    Самое внутреннее middleware роутера: измеряет время выполнения хэндлера
+    """
+    def __init__(self, histogram: Histogram, update_type: str):
+        self.histogram = histogram
+        self.update_type = update_type
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = qualified_name(handler_object.callback) if handler_object else "unknown"
+        current_handler.set(name)
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.histogram.observe(
+                time.perf_counter() - start,
+                handler=name,
+                update_type=self.update_type
+            )
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    def __init__(self, registry: MetricsRegistry):
+        self.requests = registry.counter(
+            "zuki_bot_api_requests_total",
+            "Bot API requests",
+            ("method", "status")
+        )
+        self.latency = registry.histogram(
+            "zuki_bot_api_request_seconds",
+            "Bot API request latency",
+            ("method",)
+        )
+
+    async def __call__(self, make_request, bot, method):
+        api_method = method.__api_method__
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as e:
+            status = type(e).__name__
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start, method=api_method)
+            self.requests.inc(method=api_method, status=status)
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host: str = "0.0.0.0", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            charset="utf-8"
+        )
+
+    async def start(self):
+        application = web.Application()
+        application.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(application)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
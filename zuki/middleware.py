@@ -1,3 +1,5 @@
+import time
+from datetime import datetime, timezone
 from typing import Callable, Awaitable, Any
 
 from aiogram import BaseMiddleware
@@ -7,6 +9,22 @@ class OuterMiddleware(BaseMiddleware):
     def __init__(self, app):
         self.app = app
 
+        self.update_seconds = app.metrics.histogram(
+            "zuki_update_seconds",
+            "Total update processing time",
+            ("update_type",)
+        )
+        self.update_lag = app.metrics.histogram(
+            "zuki_update_lag_seconds",
+            "Delay between the event date and the start of its processing",
+            ("update_type",),
+            buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+        )
+        self.in_flight = app.metrics.gauge(
+            "zuki_updates_in_flight",
+            "Updates currently being processed"
+        )
+
     async def __call__(
         self,
         handler: Callable[[Any, dict], Awaitable[Any]],
@@ -14,5 +32,28 @@ class OuterMiddleware(BaseMiddleware):
         data: dict,
     ) -> Any:
         data["app"] = self.app
-        result = await handler(event, data)
+
+        updates = self.app.updates
+        if updates.is_processed(event.update_id):
+            # Апдейт уже обработан предыдущим процессом. Очередь вебхука
+            # и планировщик сами вызовут done для своих begin
+            return None
+
+        update_type = event.event_type
+        event_date = getattr(event.event, "date", None)
+        if isinstance(event_date, datetime):
+            self.update_lag.observe(
+                (datetime.now(tz=timezone.utc) - event_date).total_seconds(),
+                update_type=update_type
+            )
+
+        updates.begin(event.update_id)
+        self.in_flight.set(updates.in_flight)
+        start = time.perf_counter()
+        try:
+            result = await handler(event, data)
+        finally:
+            self.update_seconds.observe(time.perf_counter() - start, update_type=update_type)
+            updates.done(event.update_id)
+            self.in_flight.set(updates.in_flight)
         return result
\ No newline at end of file
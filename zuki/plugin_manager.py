@@ -1,10 +1,12 @@
-from typing import Dict, Optional, List
-import importlib
-import pkgutil
+from pathlib import Path
+from typing import Dict, Optional, List, Iterable
+import asyncio
+import time
 
 from .plugin import Plugin
-from .app import App
+from .app import App, loading_plugin
 from .config_manager import ConfigManager
+from .manifest import PluginManifest, PluginSpec
 
 
 class PluginManager:
@@ -12,12 +14,16 @@ class PluginManager:
         self,
         *,
         app: App,
-        config_manager: Optional[ConfigManager] = None
+        config_manager: Optional[ConfigManager] = None,
+        manifest_path: Optional[Path] = None
     ):
         self.app: App = app
         self.config_manager = config_manager
-        self.plugins: Dict[str, Plugin] = {}
+        self.manifest = PluginManifest(manifest_path)
+        self.plugins: Dict[str, PluginSpec] = {}
         self.order: List[str] = []
+        self.levels: List[List[str]] = []
+        self.timings: Dict[str, Dict[str, float]] = {}
 
     def register(self, plugin_cls: Plugin):
         if not issubclass(plugin_cls, Plugin):
@@ -26,93 +32,197 @@ class PluginManager:
         if not plugin_cls.name:
             raise ValueError("Plugin must have name")
 
-        if self.plugins.get(plugin_cls.name) is not None:
-            raise ValueError(f"Plugin with this name {plugin_cls.name} has already been registered")
+        self.register_spec(PluginSpec.from_class(plugin_cls))
 
-        self.plugins[plugin_cls.name] = plugin_cls
+    def register_spec(self, spec: PluginSpec):
+        if self.plugins.get(spec.name) is not None:
+            raise ValueError(f"Plugin with this name {spec.name} has already been registered")
 
-    def register_all_from_package(self, package_name: str):
-        package = importlib.import_module(package_name)
-
-        for _, subpkg_name, is_pkg in pkgutil.iter_modules(package.__path__):
-            if not is_pkg:
-                continue
-
-            plugin_module_name = f"{package.__name__}.{subpkg_name}.plugin"
+        self.plugins[spec.name] = spec
 
-            try:
-                module = importlib.import_module(plugin_module_name)
-            except ModuleNotFoundError as e:
-                print(f"Failed to import {plugin_module_name}: {e}")
+    def register_all_from_package(self, package_name: str):
+        """
+        Регистрирует плагины пакета по манифесту, не импортируя их модули.
+        Модуль плагина импортируется только при загрузке плагина
+        """
+        for spec in self.manifest.discover(package_name):
+            self.register_spec(spec)
+
+    def select(self, enabled: Iterable[str]):
+        """
+        Оставляет только включённые плагины и их зависимости
+        """
+        selected = set()
+        stack = list(enabled)
+        while stack:
+            name = stack.pop()
+            if name in selected:
                 continue
+            if name not in self.plugins:
+                raise RuntimeError(f"Missing dependency: {name}")
+            selected.add(name)
+            stack.extend(self.plugins[name].requires)
 
-            for obj in module.__dict__.values():
-                if (
-                    isinstance(obj, type)
-                    and issubclass(obj, Plugin)
-                    and obj is not Plugin
-                ):
-                    self.register(obj)
+        self.plugins = {
+            name: spec for name, spec in self.plugins.items()
+            if name in selected
+        }
 
     async def resolve_order(self):
-        resolved = []
-        unresolved = []
-
-        async def resolve(name):
-            if name in resolved:
-                return
-            if name in unresolved:
-                raise RuntimeError(f"Circular dependency: {name}")
-
-            unresolved.append(name)
-            plugin = self.plugins[name]
-
-            for dep in plugin.requires:
+        """
+        Топологическая сортировка (алгоритм Кана) с разбиением на уровни:
+        плагины одного уровня не зависят друг от друга
+        """
+        dependents: Dict[str, List[str]] = {name: [] for name in self.plugins}
+        in_degree: Dict[str, int] = {}
+
+        for name, spec in self.plugins.items():
+            requires = set(spec.requires)
+            for dep in requires:
                 if dep not in self.plugins:
                     raise RuntimeError(f"Missing dependency: {dep}")
-                await resolve(dep)
-
-            unresolved.remove(name)
-            resolved.append(name)
-
-        for name in self.plugins:
-            await resolve(name)
-
-        self.order = resolved
+                dependents[dep].append(name)
+            in_degree[name] = len(requires)
+
+        level = [name for name, degree in in_degree.items() if degree == 0]
+        levels = []
+        while level:
+            levels.append(level)
+            next_level = []
+            for name in level:
+                for dependent in dependents[name]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_level.append(dependent)
+            level = next_level
+
+        resolved_count = sum(len(level) for level in levels)
+        if resolved_count != len(self.plugins):
+            cycle = [name for name, degree in in_degree.items() if degree > 0]
+            raise RuntimeError(f"Circular dependency: {', '.join(cycle)}")
+
+        # Внутри уровня сохраняем порядок регистрации, чтобы роутеры
+        # и middleware подключались детерминированно
+        registration_index = {name: index for index, name in enumerate(self.plugins)}
+        self.levels = [sorted(level, key=registration_index.get) for level in levels]
+        self.order = [name for level in self.levels for name in level]
+
+    async def _run_stage(self, stage: str, name: str, plugin: Plugin):
+        token = loading_plugin.set(name if stage == "load" else None)
+        start = time.perf_counter()
+        try:
+            await getattr(plugin, f"on_{stage}")()
+        except Exception as e:
+            print(f"Failed to {stage} plugin {plugin} ({name}): {e}")
+            raise e
+        finally:
+            loading_plugin.reset(token)
+            self.timings.setdefault(name, {})[stage] = time.perf_counter() - start
 
     async def load_all(self):
         print(f"Plugin found:", ', '.join(self.order))
         print("Loading plugins...")
 
-        for name in self.order:
-            plugin_cls = self.plugins[name]
-            instance = plugin_cls(self.app, self.config_manager)
-            self.app.plugins[name] = instance
+        skipped = set()
+        for level in self.levels:
+            instances = {}
+            for name in level:
+                spec = self.plugins[name]
+                for dep in spec.requires:
+                    if dep in skipped:
+                        raise RuntimeError(f"Missing dependency: {dep}")
+
+                try:
+                    plugin_cls = spec.load()
+                except ModuleNotFoundError as e:
+                    print(f"Failed to import {spec.module}: {e}")
+                    skipped.add(name)
+                    continue
+
+                instances[name] = plugin_cls(self.app, self.config_manager)
+                self.app.plugins[name] = instances[name]
+
+            self.app.defer_registrations()
             try:
-                await instance.on_load()
+                await asyncio.gather(*(
+                    self._run_stage("load", name, instance)
+                    for name, instance in instances.items()
+                ))
+            finally:
+                # Роутеры и middleware подключаются в порядке манифеста внутри уровня
+                self.app.apply_registrations(list(instances))
+            for name, instance in instances.items():
                 print(f"Plugin loaded: {instance} ({name})")
-            except Exception as e:
-                print(f"Failed to load plugin {instance} ({name}): {e}")
-                raise e
+
+        if skipped:
+            self.levels = [
+                [name for name in level if name not in skipped]
+                for level in self.levels
+            ]
+            self.order = [name for name in self.order if name not in skipped]
         print("All plugins loaded")
 
     async def startup_all(self):
         print("Starting plugins...")
 
-        for name in self.order:
-            plugin = self.app.plugins[name]
-            try:
-                await plugin.on_startup()
-                print(f"Plugin started: {plugin} ({name})")
-            except Exception as e:
-                print(f"Failed to start plugin {plugin} ({name}): {e}")
-                raise e
+        for level in self.levels:
+            await asyncio.gather(*(
+                self._run_stage("startup", name, self.app.plugins[name])
+                for name in level
+            ))
+            for name in level:
+                print(f"Plugin started: {self.app.plugins[name]} ({name})")
+
+        if self.config_manager is not None:
+            self.config_manager.start_watching()
         print("All plugins started")
 
-    async def bootstrap(self, package_list: List[str]):
+    async def shutdown_all(self, timeout: float = 30):
+        """
+        Останавливает приём апдейтов, дожидается обработки уже полученных
+        и завершает плагины в порядке, обратном зависимостям
+        """
+        print("Stopping plugins...")
+        if self.config_manager is not None:
+            await self.config_manager.stop_watching()
+        await self.app.stop()
+        await self.app.drain(timeout)
+
+        for level in reversed(self.levels):
+            names = [name for name in level if name in self.app.plugins]
+            # Ошибка одного плагина не должна мешать освобождению ресурсов остальных
+            results = await asyncio.gather(*(
+                self._run_stage("shutdown", name, self.app.plugins[name])
+                for name in names
+            ), return_exceptions=True)
+            for name, result in zip(names, results):
+                if not isinstance(result, Exception):
+                    print(f"Plugin stopped: {self.app.plugins[name]} ({name})")
+
+        await self.app.close()
+        print("All plugins stopped")
+
+    def print_timings(self):
+        print("Plugin boot timings:")
+        for index, level in enumerate(self.levels):
+            for name in level:
+                spec = self.plugins[name]
+                timings = {"import": spec.import_time, **self.timings.get(name, {})}
+                columns = "  ".join(
+                    f"{stage}={timings[stage] * 1000:8.1f}ms"
+                    for stage in ("import", "load", "startup")
+                    if stage in timings
+                )
+                print(f"  [{index}] {name:<28} {columns}  (+{spec.imported_modules} modules)")
+
+    async def bootstrap(self, package_list: List[str], enabled: Optional[Iterable[str]] = None):
         for package_name in package_list:
             self.register_all_from_package(package_name)
 
+        if enabled is not None:
+            self.select(enabled)
+
         await self.resolve_order()
         await self.load_all()
-        await self.startup_all()
\ No newline at end of file
+        await self.startup_all()
+        self.print_timings()
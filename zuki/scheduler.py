@@ -0,0 +1,260 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+from .metrics import MetricsRegistry
+from .updates import UpdateTracker
+
+OVERFLOW_POLICIES = ("wait", "drop_oldest", "drop_newest")
+
+
+def chat_key(update: Update) -> int:
+    """
+    Id чата апдейта, для апдейтов без чата — id пользователя
+    """
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.chat is not None:
+        return context.chat.id
+    if context.user is not None:
+        return context.user.id
+    return update.update_id
+
+
+class SchedulerConfig:
+    def __init__(
+        self,
+        *,
+        concurrency: int = 64,
+        per_chat_concurrency: int = 1,
+        queue_size: int = 100,
+        max_pending: int = 10000,
+        overflow: str = "wait",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected one of {', '.join(OVERFLOW_POLICIES)}")
+
+        self.concurrency = max(1, concurrency)
+        self.per_chat_concurrency = max(1, per_chat_concurrency)
+        self.queue_size = max(1, queue_size)
+        self.max_pending = max(1, max_pending)
+        self.overflow = overflow
+
+
+# Продолжение обработки апдейта, запускаемое планировщиком
+Job = Callable[[], Awaitable[Any]]
+
+# Ключ данных апдейта с future, которая завершается вместе с его обработкой в планировщике
+COMPLETION_KEY = "zuki:scheduler_completion"
+
+
+class ChatQueue:
+    __slots__ = ("items", "running")
+
+    def __init__(self):
+        self.items: Deque[Tuple[Update, Job, float, Optional[asyncio.Future]]] = deque()
+        self.running = 0
+
+
+class UpdateScheduler:
+    """
+    Очереди апдейтов по чатам. Апдейты одного чата запускаются в порядке
+    поступления не более чем по per_chat_concurrency одновременно,
+    всего одновременно обрабатывается не более concurrency апдейтов.
+    При переполнении очереди чата (queue_size) или всех очередей (max_pending):
+    wait — отправитель ждёт освобождения места,
+    drop_oldest — выбрасывается самый старый апдейт очереди чата,
+    а при переполнении всех очередей — самый старый апдейт среди всех чатов,
+    drop_newest — выбрасывается новый апдейт
+    """
+    def __init__(
+        self,
+        config: SchedulerConfig,
+        *,
+        tracker: Optional[UpdateTracker] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.config = config
+        self.tracker = tracker
+
+        self._queues: Dict[int, ChatQueue] = {}
+        self._semaphore = asyncio.Semaphore(config.concurrency)
+        self._space_freed = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.pending = 0
+        self.active = 0
+
+        metrics = metrics or MetricsRegistry()
+        self._queued_gauge = metrics.gauge("zuki_scheduler_queued_updates", "Updates waiting in chat queues")
+        self._active_gauge = metrics.gauge("zuki_scheduler_active_updates", "Updates being processed by the scheduler")
+        self._chats_gauge = metrics.gauge("zuki_scheduler_chats", "Chats with queued or running updates")
+        self._wait_seconds = metrics.histogram(
+            "zuki_scheduler_wait_seconds",
+            "Time updates wait in a chat queue before processing"
+        )
+        self._dropped = metrics.counter(
+            "zuki_scheduler_dropped_total",
+            "Updates dropped because a queue was full",
+            ("policy",)
+        )
+
+    def queue_depth(self, key: int) -> int:
+        queue = self._queues.get(key)
+        return len(queue.items) if queue is not None else 0
+
+    async def submit(self, update: Update, job: Job, completion: Optional[asyncio.Future] = None) -> bool:
+        """
+        Ставит апдейт в очередь его чата. Возвращает False, если апдейт был выброшен.
+        completion получает True после обработки, False, если апдейт выброшен,
+        или ошибку обработки
+        """
+        key = chat_key(update)
+        while True:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = ChatQueue()
+
+            queue_full = len(queue.items) >= self.config.queue_size
+            if not queue_full and self.pending < self.config.max_pending:
+                break
+
+            if self.config.overflow == "wait":
+                await self._space_freed.wait()
+                continue
+
+            if self.config.overflow == "drop_oldest":
+                # Полна очередь чата — выбрасывается её старейший апдейт,
+                # иначе превышен max_pending — старейший апдейт всех очередей
+                dropped_key, dropped_queue = (key, queue) if queue_full else self._oldest_queue()
+                dropped, _, _, dropped_completion = dropped_queue.items.popleft()
+                self.pending -= 1
+                self._drop(dropped, dropped_completion)
+                if dropped_queue is not queue and not dropped_queue.items and not dropped_queue.running:
+                    del self._queues[dropped_key]
+                break
+
+            self._drop(update, completion)
+            if not queue.items and not queue.running:
+                del self._queues[key]
+            return False
+
+        if self.tracker is not None:
+            self.tracker.begin(update.update_id)
+
+        queue.items.append((update, job, time.perf_counter(), completion))
+        self.pending += 1
+        self._idle.clear()
+        self._start(key, queue)
+        self._update_gauges()
+        return True
+
+    async def join(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            for _, _, _, completion in queue.items:
+                if completion is not None and not completion.done():
+                    completion.cancel()
+
+    def _start(self, key: int, queue: ChatQueue):
+        while queue.running < self.config.per_chat_concurrency and queue.running < len(queue.items):
+            queue.running += 1
+            task = asyncio.create_task(self._run(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: int, queue: ChatQueue):
+        try:
+            async with self._semaphore:
+                if not queue.items:
+                    return
+                update, job, queued_at, completion = queue.items.popleft()
+                self.pending -= 1
+                self._notify_space()
+
+                self._wait_seconds.observe(time.perf_counter() - queued_at)
+                self.active += 1
+                self._update_gauges()
+                try:
+                    await job()
+                except Exception as e:
+                    print(f"Failed to process update {update.update_id}: {e}")
+                    if completion is not None and not completion.done():
+                        completion.set_exception(e)
+                except BaseException:
+                    if completion is not None and not completion.done():
+                        completion.cancel()
+                    raise
+                else:
+                    if completion is not None and not completion.done():
+                        completion.set_result(True)
+                finally:
+                    self.active -= 1
+                    if self.tracker is not None:
+                        self.tracker.done(update.update_id)
+        finally:
+            queue.running -= 1
+            if queue.items:
+                self._start(key, queue)
+            elif not queue.running and self._queues.get(key) is queue:
+                del self._queues[key]
+
+            if not self.pending and not self.active:
+                self._idle.set()
+            self._update_gauges()
+
+    def _oldest_queue(self) -> Tuple[int, ChatQueue]:
+        """
+        Очередь, в которой дольше всех ждёт апдейт
+        """
+        return min(
+            ((key, queue) for key, queue in self._queues.items() if queue.items),
+            key=lambda item: item[1].items[0][2]
+        )
+
+    def _drop(self, update: Update, completion: Optional[asyncio.Future] = None):
+        self._dropped.inc(policy=self.config.overflow)
+        if completion is not None and not completion.done():
+            completion.set_result(False)
+        if self.tracker is not None:
+            self.tracker.done(update.update_id)
+
+    def _notify_space(self):
+        self._space_freed.set()
+        self._space_freed = asyncio.Event()
+
+    def _update_gauges(self):
+        self._queued_gauge.set(self.pending)
+        self._active_gauge.set(self.active)
+        self._chats_gauge.set(len(self._queues))
+
+
+class SchedulerMiddleware(BaseMiddleware):
+    """
+    Ставит обработку апдейта в очередь планировщика и сразу возвращает управление.
+    Дождаться самой обработки можно через future в данных под COMPLETION_KEY
+    """
+    def __init__(self, scheduler: UpdateScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict], Awaitable[Any]],
+        event: Update,
+        data: dict,
+    ) -> Any:
+        await self.scheduler.submit(event, lambda: handler(event, data), data.get(COMPLETION_KEY))
@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from .metrics import MetricsRegistry
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Методы Bot API, отправляющие или меняющие сообщения, на них действуют лимиты Telegram
+LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+
+_priority: ContextVar[int] = ContextVar("zuki_sender_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends():
+    """
+    Запросы внутри блока отправляются с низким приоритетом и
+    пропускают вперёд ответы на действия пользователей
+    """
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class SenderConfig:
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30,
+        global_burst: int = 30,
+        group_rate: float = 20 / 60,
+        group_burst: int = 5,
+        private_rate: float = 1,
+        private_burst: int = 3,
+        max_retries: int = 3,
+    ):
+        self.global_rate = global_rate
+        self.global_burst = max(1, global_burst)
+        self.group_rate = group_rate
+        self.group_burst = max(1, group_burst)
+        self.private_rate = private_rate
+        self.private_burst = max(1, private_burst)
+        self.max_retries = max_retries
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "paused_until")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """
+        Через сколько секунд появится токен
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, until: float):
+        # Токены начинают копиться заново после окончания паузы
+        self.paused_until = max(self.paused_until, until)
+        self.updated_at = self.paused_until
+        self.tokens = 0
+
+    def is_idle(self, now: float) -> bool:
+        return now >= self.updated_at and self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class OutboundSender(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: пропускает отправку сообщений через общий
+    и поканальный token bucket. Запросы ждут в очереди по приоритету
+    (сначала интерактивные, затем массовые из bulk_sends()),
+    при TelegramRetryAfter чат (или вся отправка) приостанавливается
+    на retry_after секунд и запрос повторяется
+    """
+    def __init__(self, config: SenderConfig, metrics: Optional[MetricsRegistry] = None):
+        self.config = config
+        self.global_bucket = TokenBucket(config.global_rate, config.global_burst)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+
+        # (priority, seq, chat_id, future)
+        self._waiters: List[Tuple[int, int, Optional[int], asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        metrics = metrics or MetricsRegistry()
+        self._queued = metrics.gauge(
+            "zuki_sender_queued_requests",
+            "Outgoing requests waiting for a rate limit token",
+            ("priority",)
+        )
+        self._wait_seconds = metrics.histogram(
+            "zuki_sender_wait_seconds",
+            "Time outgoing requests wait for a rate limit token",
+            ("priority",)
+        )
+        self._retries = metrics.counter(
+            "zuki_sender_retry_after_total",
+            "Requests retried after a flood control error",
+            ("method",)
+        )
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(chat_id, int):
+            # Каналы по username и inline-сообщения ограничиваются только общим лимитом
+            chat_id = None
+
+        attempt = 0
+        while True:
+            await self.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self._retries.inc(method=method.__api_method__)
+                self._pause(chat_id, e.retry_after)
+                if attempt > self.config.max_retries:
+                    raise
+                print(f"Flood control on {method.__api_method__} in chat {chat_id}, retry in {e.retry_after}s")
+
+    async def acquire(self, chat_id: Optional[int]):
+        priority = _priority.get()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), chat_id, future))
+        self._queued.inc(priority=PRIORITY_NAMES[priority])
+
+        self._ensure_worker()
+        self._wakeup.set()
+
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._forget(future)
+            raise
+        finally:
+            self._wait_seconds.observe(time.perf_counter() - start, priority=PRIORITY_NAMES[priority])
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._grant_loop())
+
+    async def _grant_loop(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._grant()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant(self) -> Optional[float]:
+        """
+        Выдаёт токены ожидающим запросам в порядке приоритета.
+        Возвращает, через сколько секунд проверить очередь снова
+        """
+        now = time.monotonic()
+        next_check = None
+        remaining = []
+        blocked_chats = set()
+
+        for waiter in sorted(self._waiters):
+            priority, _, chat_id, future = waiter
+            if future.done():
+                self._queued.dec(priority=PRIORITY_NAMES[priority])
+                continue
+
+            # Запрос ждёт, пока не отправлены более приоритетные запросы его чата
+            delay = 0 if chat_id not in blocked_chats else None
+            if delay == 0 and chat_id is not None:
+                delay = self._chat_bucket(chat_id).delay(now)
+            if delay == 0:
+                delay = self.global_bucket.delay(now)
+
+            if delay == 0:
+                self.global_bucket.take()
+                if chat_id is not None:
+                    self._chat_buckets[chat_id].take()
+                self._queued.dec(priority=PRIORITY_NAMES[priority])
+                future.set_result(None)
+                continue
+
+            remaining.append(waiter)
+            if chat_id is not None:
+                blocked_chats.add(chat_id)
+            if delay is not None:
+                next_check = delay if next_check is None else min(next_check, delay)
+
+        heapq.heapify(remaining)
+        self._waiters = remaining
+        self._cleanup_buckets(now)
+        return next_check
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.config.group_rate, self.config.group_burst)
+            else:
+                bucket = TokenBucket(self.config.private_rate, self.config.private_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _pause(self, chat_id: Optional[int], retry_after: float):
+        until = time.monotonic() + retry_after
+        if chat_id is None:
+            self.global_bucket.pause(until)
+        else:
+            self._chat_bucket(chat_id).pause(until)
+
+    def _forget(self, future: asyncio.Future):
+        for index, waiter in enumerate(self._waiters):
+            if waiter[3] is future:
+                self._waiters.pop(index)
+                heapq.heapify(self._waiters)
+                self._queued.dec(priority=PRIORITY_NAMES[waiter[0]])
+                return
+
+    def _cleanup_buckets(self, now: float):
+        # Полные корзины ничем не отличаются от новых, их можно не хранить
+        if len(self._chat_buckets) < 1000:
+            return
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.is_idle(now)]:
+            del self._chat_buckets[chat_id]
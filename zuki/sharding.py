@@ -0,0 +1,304 @@
+import asyncio
+import multiprocessing
+import queue
+import signal
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from .app import App
+from .scheduler import chat_key
+
+# Фабрика приложения воркера: по номеру воркера собирает App и загружает плагины.
+# Должна быть функцией уровня модуля, чтобы её можно было передать в дочерний процесс
+WorkerFactory = Callable[[int], Awaitable[Tuple[App, Any]]]
+
+
+def shard_key(update: Update) -> int:
+    """
+    Ключ шардирования: id чата, для апдейтов без чата — id пользователя
+    """
+    return chat_key(update)
+
+
+class ShardRouterMiddleware(BaseMiddleware):
+    """
+    Передаёт апдейт воркеру вместо локальной обработки
+    """
+    def __init__(self, supervisor: "ShardSupervisor"):
+        self.supervisor = supervisor
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict], Awaitable[Any]],
+        event: Update,
+        data: dict,
+    ) -> Any:
+        return await self.supervisor.dispatch(event)
+
+
+class ShardSupervisor:
+    """
+    Режим нескольких процессов: приложение супервизора получает апдейты
+    (polling или webhook) и распределяет их по id чата между воркерами,
+    каждый из которых запускает полный набор плагинов.
+    Апдейты одного чата всегда попадают в один воркер и обрабатываются по порядку.
+    Воркер 0 запускается первым: миграции и фоновые задачи плагинов
+    выполняются только в нём, остальные стартуют после него.
+    Упавший воркер перезапускается, его незавершённые апдейты сразу
+    завершаются ошибкой. Если перезапущенный воркер не смог стартовать,
+    процесс останавливается так же, как по SIGTERM
+    """
+    # Период проверки, что процессы воркеров живы
+    CHECK_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        app: App,
+        *,
+        workers: int,
+        worker_factory: WorkerFactory,
+        shutdown_timeout: float = 30,
+        start_timeout: float = 120
+    ):
+        self.app = app
+        self.workers = max(1, workers)
+        self.worker_factory = worker_factory
+        self.shutdown_timeout = shutdown_timeout
+        self.start_timeout = start_timeout
+
+        self.allowed_updates: List[str] = []
+
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes: List[multiprocessing.Queue] = []
+        self._outbox: Optional[multiprocessing.Queue] = None
+        self._processes: List[multiprocessing.Process] = []
+        self._pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._collector: Optional[asyncio.Task] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.app.add_dispatcher_middleware(ShardRouterMiddleware(self))
+
+    async def start(self):
+        self._outbox = self._context.Queue()
+
+        allowed_updates = set()
+        self._spawn(0)
+        allowed_updates.update(await self._wait_ready(1))
+        for index in range(1, self.workers):
+            self._spawn(index)
+        allowed_updates.update(await self._wait_ready(self.workers - 1))
+
+        self.allowed_updates = sorted(allowed_updates)
+        self._collector = asyncio.create_task(self._collect())
+        self._monitor = asyncio.create_task(self._watch_workers())
+
+    def _spawn(self, index: int):
+        inbox = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.worker_factory, inbox, self._outbox, self.shutdown_timeout),
+            name=f"zuki-worker-{index}"
+        )
+        process.start()
+        if index < len(self._processes):
+            # Замена упавшего воркера: апдейты из старой очереди уже завершены ошибкой
+            self._inboxes[index].cancel_join_thread()
+            self._inboxes[index] = inbox
+            self._processes[index] = process
+        else:
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+    async def _wait_ready(self, count: int) -> set:
+        allowed_updates = set()
+        loop = asyncio.get_running_loop()
+        for _ in range(count):
+            try:
+                message = await loop.run_in_executor(None, self._outbox.get, True, self.start_timeout)
+            except queue.Empty:
+                await self.stop_workers()
+                raise RuntimeError(f"Workers did not start in {self.start_timeout} seconds")
+
+            kind, index, payload = message
+            if kind == "failed":
+                await self.stop_workers()
+                raise RuntimeError(f"Worker {index} failed to start: {payload}")
+            allowed_updates.update(payload)
+            print(f"Worker {index} is ready (pid {self._processes[index].pid})")
+        return allowed_updates
+
+    async def dispatch(self, update: Update) -> Any:
+        key = shard_key(update)
+        index = key % self.workers
+        if not self._processes[index].is_alive():
+            self._check_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[update.update_id] = (index, future)
+
+        raw = update.model_dump_json(exclude_unset=True, by_alias=True)
+        self._inboxes[index].put((key, raw))
+        return await future
+
+    async def stop_workers(self):
+        """
+        Просит воркеров завершить обработку и остановить плагины,
+        воркеры, не успевшие за shutdown_timeout, завершаются принудительно
+        """
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._monitor
+            self._monitor = None
+
+        for inbox in self._inboxes:
+            inbox.put(None)
+
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, self.shutdown_timeout)
+            if process.is_alive():
+                print(f"Worker {process.name} did not stop in time, terminating")
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+
+        if self._collector is not None:
+            self._collector.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._collector
+            self._collector = None
+
+    async def shutdown(self):
+        """
+        Прекращает приём апдейтов, дожидается их обработки воркерами
+        и останавливает воркеров
+        """
+        await self.app.stop()
+        await self.app.drain(self.shutdown_timeout)
+        await self.stop_workers()
+        await self.app.close()
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                message = await loop.run_in_executor(None, self._outbox.get, True, 1.0)
+            except queue.Empty:
+                continue
+
+            kind, update_id, payload = message
+            if kind == "ready":
+                print(f"Worker {update_id} restarted (pid {self._processes[update_id].pid})")
+                continue
+            if kind == "failed":
+                print(f"Worker {update_id} failed to restart: {payload}, stopping")
+                self._stopping = True
+                signal.raise_signal(signal.SIGTERM)
+                continue
+
+            pending = self._pending.pop(update_id, None)
+            if pending is None or pending[1].done():
+                continue
+            if kind == "error":
+                pending[1].set_exception(RuntimeError(payload))
+            else:
+                pending[1].set_result(None)
+
+    async def _watch_workers(self):
+        while True:
+            await asyncio.sleep(self.CHECK_INTERVAL)
+            self._check_workers()
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+
+            lost = [
+                update_id for update_id, (shard, _) in self._pending.items()
+                if shard == index
+            ]
+            for update_id in lost:
+                _, future = self._pending.pop(update_id)
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Worker {index} is not running"))
+
+            if self._stopping:
+                continue
+            print(f"Worker {index} exited with code {process.exitcode}, {len(lost)} updates lost, restarting")
+            self._spawn(index)
+
+
+def _worker_main(
+    index: int,
+    worker_factory: WorkerFactory,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    shutdown_timeout: float
+):
+    # Остановкой воркеров управляет супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(index, worker_factory, inbox, outbox, shutdown_timeout))
+
+
+async def _worker_loop(
+    index: int,
+    worker_factory: WorkerFactory,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    shutdown_timeout: float
+):
+    try:
+        app, pm = await worker_factory(index)
+    except Exception as e:
+        outbox.put(("failed", index, repr(e)))
+        return
+
+    outbox.put(("ready", index, app.resolve_allowed_updates()))
+
+    loop = asyncio.get_running_loop()
+    # Последняя задача каждого чата: следующий апдейт чата ждёт её завершения
+    tails: Dict[int, asyncio.Task] = {}
+
+    def forget(key: int, task: asyncio.Task):
+        if tails.get(key) is task:
+            del tails[key]
+
+    while True:
+        item = await loop.run_in_executor(None, inbox.get)
+        if item is None:
+            break
+
+        key, raw = item
+        task = asyncio.create_task(_process_update(app, raw, tails.get(key), outbox))
+        tails[key] = task
+        task.add_done_callback(lambda task, key=key: forget(key, task))
+
+    await asyncio.gather(*tails.values(), return_exceptions=True)
+    await pm.shutdown_all(timeout=shutdown_timeout)
+
+
+async def _process_update(
+    app: App,
+    raw: str,
+    previous: Optional[asyncio.Task],
+    outbox: multiprocessing.Queue
+):
+    if previous is not None:
+        with suppress(Exception):
+            await previous
+
+    update = Update.model_validate_json(raw, context={"bot": app.bot})
+    try:
+        # С планировщиком воркера апдейт считается обработанным после его задачи,
+        # а не после постановки в очередь
+        await app.process_update(update)
+    except Exception as e:
+        print(f"Failed to process update {update.update_id}: {e}")
+        outbox.put(("error", update.update_id, repr(e)))
+    else:
+        outbox.put(("done", update.update_id, None))
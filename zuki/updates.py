@@ -0,0 +1,93 @@
+import asyncio
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class UpdateTracker:
+    """
+    Отслеживает апдейты в обработке и последний обработанный update_id,
+    чтобы при перезапуске не обрабатывать апдейты повторно.
+    Апдейт держат сразу несколько участников (очередь вебхука, очередь
+    планировщика, обработчик), поэтому begin и done считаются: апдейт
+    в обработке, пока done не вызван столько же раз, сколько begin
+    """
+    # Апдейты предыдущего процесса, которые могут прийти повторно, лежат
+    # сразу под контрольной точкой. Номер намного ниже неё значит, что Telegram
+    # начал нумерацию заново (после долгого простоя или смены токена)
+    REPLAY_WINDOW = 1000
+
+    def __init__(self, checkpoint_path: Optional[Path] = None, replay_window: int = REPLAY_WINDOW):
+        self.checkpoint_path = checkpoint_path
+        self.replay_window = replay_window
+        self.checkpoint: Optional[int] = self._read_checkpoint()
+        self.last_update_id: Optional[int] = self.checkpoint
+
+        self._in_flight: Dict[int, int] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def is_processed(self, update_id: int) -> bool:
+        if self.checkpoint is None:
+            return False
+        if update_id <= self.checkpoint - self.replay_window:
+            print(f"Update ids restarted below checkpoint {self.checkpoint}, resetting it")
+            self.reset()
+            return False
+        return update_id <= self.checkpoint
+
+    def reset(self):
+        """
+        Забывает контрольную точку, когда нумерация апдейтов начата заново
+        """
+        self.checkpoint = None
+        self.last_update_id = None
+
+    def begin(self, update_id: int):
+        self._in_flight[update_id] = self._in_flight.get(update_id, 0) + 1
+        self._idle.clear()
+
+    def done(self, update_id: int):
+        holders = self._in_flight.pop(update_id, 0) - 1
+        if holders > 0:
+            self._in_flight[update_id] = holders
+            return
+        if self.last_update_id is None or update_id > self.last_update_id:
+            self.last_update_id = update_id
+        if not self._in_flight:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def safe_offset(self) -> Optional[int]:
+        """
+        Наибольший update_id, до которого включительно все апдейты обработаны
+        """
+        if self._in_flight:
+            return min(self._in_flight) - 1
+        return self.last_update_id
+
+    def save(self) -> Optional[int]:
+        offset = self.safe_offset()
+        if self.checkpoint_path is None or offset is None:
+            return offset
+
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_path.write_text(str(offset))
+        return offset
+
+    def _read_checkpoint(self) -> Optional[int]:
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return None
+        try:
+            return int(self.checkpoint_path.read_text().strip())
+        except ValueError:
+            return None
@@ -0,0 +1,139 @@
+import asyncio
+import secrets
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.types import Update
+
+from .metrics import MetricsRegistry
+from .updates import UpdateTracker
+
+
+class WebhookConfig:
+    def __init__(
+        self,
+        *,
+        url: str,
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        workers: int = 4,
+        queue_size: int = 1000,
+        drop_pending_updates: bool = False,
+    ):
+        self.url = url.rstrip("/") + path
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.drop_pending_updates = drop_pending_updates
+
+
+class WebhookServer:
+    """
+    Встроенный aiohttp-сервер для приёма апдейтов через webhook.
+    Отвечает Telegram сразу после постановки апдейта в очередь,
+    обработкой занимаются `workers` фоновых задач.
+    """
+    def __init__(
+        self,
+        bot: Bot,
+        config: WebhookConfig,
+        feed_update: Callable[[Update], Awaitable[Any]],
+        tracker: Optional[UpdateTracker] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        self.bot = bot
+        self.config = config
+        self.feed_update = feed_update
+        self.tracker = tracker
+
+        self._queue_seconds = None
+        if metrics is not None:
+            self._queue_seconds = metrics.histogram(
+                "zuki_webhook_queue_seconds",
+                "Time updates wait in the webhook queue"
+            )
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    def build_application(self) -> web.Application:
+        application = web.Application()
+        application.router.add_post(self.config.path, self.handle)
+        return application
+
+    async def start(self, allowed_updates: List[str]):
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.config.workers)
+        ]
+
+        self._runner = web.AppRunner(self.build_application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.config.host, self.config.port)
+        await site.start()
+
+        await self.bot.set_webhook(
+            url=self.config.url,
+            secret_token=self.config.secret_token,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=self.config.drop_pending_updates,
+        )
+
+    async def stop_receiving(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def drain(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.config.secret_token is not None:
+            received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not secrets.compare_digest(received, self.config.secret_token):
+                return web.Response(status=401)
+
+        update = Update.model_validate(await request.json(), context={"bot": self.bot})
+
+        try:
+            self.queue.put_nowait((update, time.perf_counter()))
+        except asyncio.QueueFull:
+            # Telegram повторит доставку позже
+            return web.Response(status=503)
+
+        if self.tracker is not None:
+            self.tracker.begin(update.update_id)
+
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update, received_at = await self.queue.get()
+            if self._queue_seconds is not None:
+                self._queue_seconds.observe(time.perf_counter() - received_at)
+            try:
+                await self.feed_update(update)
+            except Exception as e:
+                print(f"Failed to process update {update.update_id}: {e}")
+            finally:
+                if self.tracker is not None:
+                    self.tracker.done(update.update_id)
+                self.queue.task_done()